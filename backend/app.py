@@ -1,25 +1,45 @@
 # NOTE: Hackathon/dev implementation.
-# In-memory jobs are process-local and ephemeral. In production, use Redis/DB so
-# jobs are shared across workers/instances and survive restarts.
+# Jobs live in the pluggable store from job_store.py (SQLite WAL by default,
+# JOB_STORE=redis for multi-host), so every gunicorn worker sees every job.
 
 import asyncio
+import functools
+import hashlib
+import hmac
 import importlib
 import inspect
+import json
 import logging
 import os
+import re
+import resource
 import threading
 import time
 import traceback
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Any
 
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, send_file, stream_with_context
 from flask_cors import CORS
 
 import pipeline as pipeline_module
+from cancellation import CancellationToken, JobCancelled
+from discovery_cache import get_discovery_cache
+from generation_cache import get_generation_cache, normalize_prompt
+from job_events import JobEventBus
+from job_executor import DEFAULT_PRIORITY, PRIORITY_CLASSES, JobExecutor, QueueFullError
+from job_store import SerializedJobCache, create_job_store
+from kling_agent import CALLBACK_TOKEN as KLING_CALLBACK_TOKEN
+from kling_agent import parse_task_record, record_task_outcome
+from kling_task_log import OWNER_LEASE_SECONDS, RESUME_MAX_AGE_SECONDS, get_task_log
+from kling_tracker import get_tracker
+from media_store import get_media_store, is_valid_digest
 from pipeline import TrendHijackPipeline
+from runtime import get_runtime, run_async
+from stage_limits import stage_limit_stats
+from webhook_delivery import get_webhook_dispatcher, validate_callback_url
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(BASE_DIR, ".env"), override=False)
@@ -66,21 +86,60 @@ logger.info(
     "yes" if SERVICES["twitter"] else "no",
 )
 
-JOBS: dict[str, dict[str, Any]] = {}
-JOBS_LOCK = threading.Lock()
+JOB_STORE = create_job_store()
+JOB_EXECUTOR = JobExecutor()
+JOB_EVENTS = JobEventBus()
+JOB_BODY_CACHE = SerializedJobCache()
+TERMINAL_STATUSES = {"done", "error", "cancelled"}
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_STREAM_SECONDS = int(os.environ.get("SSE_MAX_STREAM_SECONDS", "900"))
+# Each open stream holds a gthread worker thread for its lifetime; past this many
+# per process new streams get 503 and clients poll /api/job/<id> instead, so
+# submissions, polls and health checks always have threads left.
+SSE_MAX_STREAMS = int(os.environ.get("SSE_MAX_STREAMS_PER_WORKER", "4"))
+_SSE_LOCK = threading.Lock()
+_SSE_OPEN = 0
+JOB_MAX_RUNTIME_SECONDS = int(os.environ.get("JOB_MAX_RUNTIME_SECONDS", str(12 * 60)))
+# Identical /api/generate requests attach to a matching job finished this recently (0 disables).
+JOB_REUSE_WINDOW_SECONDS = int(os.environ.get("JOB_REUSE_WINDOW_SECONDS", "300"))
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+JOB_EVICT_INTERVAL_SECONDS = 60
+_LAST_EVICTION = 0.0
+_EVICTION_LOCK = threading.Lock()
+# Cancellation tokens of jobs running in this process; DELETE and the remote
+# watcher (for jobs cancelled through another worker) trip them.
+JOB_CANCEL_TOKENS: dict[str, CancellationToken] = {}
+_CANCEL_LOCK = threading.Lock()
+_CANCEL_WATCHER: threading.Thread | None = None
+CANCEL_POLL_SECONDS = 1.0
+# Most items one /api/generate_batch call may carry.
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "50"))
+# Serialises lookup + create so concurrent duplicates within this worker collapse into one job.
+_SUBMIT_LOCK = threading.Lock()
 
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def _create_job(input_dict: dict[str, Any]) -> str:
+def _touch_job(job: dict[str, Any]) -> None:
+    """Stamp a mutation: every change bumps ``version`` so readers can use it as an ETag."""
+    job["updated_at"] = _now_iso()
+    job["version"] = int(job.get("version", 0)) + 1
+
+
+def _create_job(
+    input_dict: dict[str, Any],
+    fingerprint: str | None = None,
+    idempotency_key: str | None = None,
+) -> str:
     job_id = str(uuid.uuid4())
     job_obj = {
         "id": job_id,
         "status": "queued",
         "created_at": _now_iso(),
         "updated_at": _now_iso(),
+        "version": 1,
         "input": input_dict,
         "progress": {
             "step": "QUEUED",
@@ -89,25 +148,87 @@ def _create_job(input_dict: dict[str, Any]) -> str:
         },
         "result": None,
         "error": None,
+        "variations": [],
+        "fingerprint": fingerprint,
+        "idempotency_key": idempotency_key,
     }
-    with JOBS_LOCK:
-        JOBS[job_id] = job_obj
+    JOB_STORE.create(job_obj)
+    _maybe_evict_jobs()
     return job_id
 
 
+def _maybe_evict_jobs() -> None:
+    """Apply the store's TTL/count retention at most once per JOB_EVICT_INTERVAL_SECONDS."""
+    global _LAST_EVICTION
+    with _EVICTION_LOCK:
+        now = time.monotonic()
+        if now - _LAST_EVICTION < JOB_EVICT_INTERVAL_SECONDS:
+            return
+        _LAST_EVICTION = now
+    try:
+        removed = JOB_STORE.evict()
+    except Exception as exc:
+        logger.warning("Job eviction failed: %s", exc)
+        return
+    if removed:
+        logger.info("Evicted %s finished job(s) past retention", removed)
+
+
+def _job_fingerprint(parsed: dict[str, Any]) -> str:
+    """Stable hash of everything that changes what a generate request produces."""
+    material = {
+        "brand": normalize_prompt(parsed["brand"]),
+        "competitor": normalize_prompt(parsed["competitor"]),
+        "location": normalize_prompt(parsed["location"]),
+        "force_regenerate": parsed.get("force_regenerate", False),
+        "variations": parsed.get("variations", False),
+        "preview": parsed.get("preview", False),
+        "callback_url": parsed.get("callback_url"),
+    }
+    raw = json.dumps(material, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _find_reusable_job(fingerprint: str) -> dict[str, Any] | None:
+    """An in-flight job with this fingerprint, or one that finished inside the reuse window."""
+    if JOB_REUSE_WINDOW_SECONDS <= 0:
+        return None
+    now = datetime.now(timezone.utc)
+    # In-flight jobs can be up to JOB_MAX_RUNTIME_SECONDS old and still be worth joining.
+    created_after = (now - timedelta(seconds=JOB_REUSE_WINDOW_SECONDS + JOB_MAX_RUNTIME_SECONDS)).isoformat()
+    fresh_after = (now - timedelta(seconds=JOB_REUSE_WINDOW_SECONDS)).isoformat()
+    for job in JOB_STORE.find_recent("fingerprint", fingerprint, created_after):
+        if job["status"] in {"queued", "running"}:
+            return job
+        if job["status"] == "done" and job["updated_at"] >= fresh_after:
+            return job
+    return None
+
+
+def _find_idempotent_job(idempotency_key: str) -> dict[str, Any] | None:
+    created_after = (datetime.now(timezone.utc) - timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS)).isoformat()
+    matches = JOB_STORE.find_recent("idempotency_key", idempotency_key, created_after)
+    return matches[0] if matches else None
+
+
 def _set_job_state(
     job_id: str,
     status: str,
     result: dict[str, Any] | None = None,
     error: str | None = None,
     progress: dict[str, Any] | None = None,
+    notify: bool = True,
 ) -> None:
-    with JOBS_LOCK:
-        job = JOBS.get(job_id)
-        if not job:
+    skipped = False
+
+    def _apply(job: dict[str, Any]) -> None:
+        nonlocal skipped
+        if job["status"] == "cancelled":
+            # Cancellation is final; late updates from the winding-down run are dropped.
+            skipped = True
             return
         job["status"] = status
-        job["updated_at"] = _now_iso()
+        _touch_job(job)
         if progress is not None:
             job["progress"] = progress
         if result is not None:
@@ -115,11 +236,140 @@ def _set_job_state(
         if error is not None:
             job["error"] = error
 
+    job = JOB_STORE.update(job_id, _apply)
+    if job is None or skipped:
+        return
+    if status in TERMINAL_STATUSES:
+        JOB_EVENTS.publish(job_id, "snapshot", job, final=True)
+        if notify:
+            _enqueue_job_webhook(job)
+    else:
+        JOB_EVENTS.publish(
+            job_id,
+            "progress",
+            {
+                "status": job["status"],
+                "progress": job.get("progress"),
+                "error": job.get("error"),
+                "updated_at": job["updated_at"],
+            },
+        )
+
+
+def _enqueue_job_webhook(job: dict[str, Any]) -> None:
+    """Queue a signed POST of the finished job to the caller's ``callback_url``, if any."""
+    callback_url = (job.get("input") or {}).get("callback_url")
+    if not callback_url:
+        return
+    event = {"done": "job.completed", "error": "job.failed"}.get(job["status"], f"job.{job['status']}")
+    payload = {
+        "event": event,
+        "job_id": job["id"],
+        "status": job["status"],
+        "result": _sanitize_result(job.get("result")),
+        "variations": _sanitize_result(job.get("variations") or []),
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "finished_at": job.get("updated_at"),
+    }
+    try:
+        get_webhook_dispatcher().enqueue(job["id"], callback_url, event, payload)
+    except Exception as exc:
+        logger.error("Could not queue webhook for job %s: %s", job["id"], exc)
+
+
+def _append_job_variation(job_id: str, variation: dict[str, Any]) -> None:
+    def _apply(job: dict[str, Any]) -> None:
+        job.setdefault("variations", []).append(variation)
+        _touch_job(job)
+
+    job = JOB_STORE.update(job_id, _apply)
+    if job is not None:
+        JOB_EVENTS.publish(job_id, "variation", {"variation": variation, "updated_at": job["updated_at"]})
+
+
+def _set_job_partial(job_id: str, stage: str, data: dict[str, Any]) -> None:
+    """Expose a finished stage's output on the job before the pipeline returns."""
+    skipped = False
+
+    def _apply(job: dict[str, Any]) -> None:
+        nonlocal skipped
+        if job["status"] in TERMINAL_STATUSES:
+            # A late stage of a cancelled or finished run must not rewrite the job.
+            skipped = True
+            return
+        job.setdefault("partial", {})[stage] = data
+        _touch_job(job)
+
+    job = JOB_STORE.update(job_id, _apply)
+    if job is not None and not skipped:
+        JOB_EVENTS.publish(job_id, "partial", {"stage": stage, "data": data, "updated_at": job["updated_at"]})
+
+
+def _attach_job_media(job_id: str, source_url: str, digest: str) -> None:
+    media_url = f"/api/media/{digest}"
+
+    def _apply(job: dict[str, Any]) -> None:
+        result = job.get("result")
+        if isinstance(result, dict) and result.get("video_url") == source_url:
+            result["media_url"] = media_url
+        for variation in job.get("variations") or []:
+            if variation.get("video_url") == source_url:
+                variation["media_url"] = media_url
+        _touch_job(job)
+
+    JOB_STORE.update(job_id, _apply)
+
+
+_MEDIA_URL_RE = re.compile(rb'"/api/media/([0-9a-f]{64})"')
+
+
+def _drop_stale_media(job_id: str, body: bytes) -> dict[str, Any] | None:
+    """Remove ``media_url``s whose file the media store has evicted; the updated job, if any changed."""
+    store = get_media_store()
+    if store is None:
+        return None
+    stale = {
+        f"/api/media/{digest.decode('ascii')}"
+        for digest in set(_MEDIA_URL_RE.findall(body))
+        if not store.has(digest.decode("ascii"))
+    }
+    if not stale:
+        return None
+
+    changed = False
+
+    def _apply(job: dict[str, Any]) -> None:
+        nonlocal changed
+        items = [job.get("result")] + list(job.get("variations") or [])
+        if isinstance(job.get("result"), dict):
+            items += list(job["result"].get("variations") or [])
+        for item in items:
+            if isinstance(item, dict) and item.get("media_url") in stale:
+                # Players fall back to video_url once the cached copy is gone.
+                item.pop("media_url")
+                changed = True
+        if changed:
+            _touch_job(job)
+
+    job = JOB_STORE.update(job_id, _apply)
+    return job if changed else None
+
+
+def _cache_job_media(job_id: str, result: dict[str, Any] | None) -> None:
+    """Queue the finished job's videos for a local copy served from /api/media."""
+    store = get_media_store()
+    if store is None or SMOKE_MODE or not isinstance(result, dict):
+        return
+
+    urls = [result.get("video_url")]
+    urls += [item.get("video_url") for item in result.get("variations") or [] if isinstance(item, dict)]
+    for url in dict.fromkeys(u for u in urls if isinstance(u, str) and u.startswith("http")):
+        store.enqueue(url, on_ready=lambda source_url, digest: _attach_job_media(job_id, source_url, digest))
+
 
 def _get_job(job_id: str) -> dict[str, Any] | None:
-    with JOBS_LOCK:
-        job = JOBS.get(job_id)
-        return dict(job) if job else None
+    return JOB_STORE.get(job_id)
 
 
 def _sanitize_result(payload: Any) -> Any:
@@ -166,7 +416,7 @@ def _sanitize_result(payload: Any) -> Any:
     return payload
 
 
-def _validate_generate_body(body: dict[str, Any]) -> tuple[dict[str, str] | None, str | None]:
+def _validate_generate_body(body: dict[str, Any]) -> tuple[dict[str, Any] | None, str | None]:
     brand = str(body.get("brand", "")).strip()
     competitor = str(body.get("competitor", "")).strip()
     location = str(body.get("location", "")).strip()
@@ -178,11 +428,24 @@ def _validate_generate_body(body: dict[str, Any]) -> tuple[dict[str, str] | None
     if not location:
         return None, "missing location"
 
-    return {
+    parsed = {
         "brand": brand,
         "competitor": competitor,
         "location": location,
-    }, None
+        "force_regenerate": bool(body.get("force_regenerate", False)),
+        "variations": bool(body.get("variations", False)),
+        "preview": bool(body.get("preview", False)),
+        "priority": str(body.get("priority") or DEFAULT_PRIORITY).strip().lower(),
+    }
+    if parsed["priority"] not in PRIORITY_CLASSES:
+        return None, f"priority must be one of {', '.join(PRIORITY_CLASSES)}"
+    callback_url = str(body.get("callback_url") or "").strip()
+    if callback_url:
+        url_error = validate_callback_url(callback_url)
+        if url_error:
+            return None, url_error
+        parsed["callback_url"] = callback_url
+    return parsed, None
 
 
 def _supports_on_progress(func: Any) -> bool:
@@ -193,18 +456,20 @@ def _supports_on_progress(func: Any) -> bool:
     return "on_progress" in signature.parameters
 
 
-def _pipeline_supports_progress_callback() -> bool:
-    runner_func = getattr(pipeline_module, "run_pipeline", None)
-    if callable(runner_func):
-        return _supports_on_progress(runner_func)
-
-    if hasattr(PIPELINE_RUNNER, "run_pipeline"):
-        return _supports_on_progress(getattr(PIPELINE_RUNNER, "run_pipeline"))
+def _supported_kwargs(func: Any, options: dict[str, Any] | None) -> dict[str, Any]:
+    if not options:
+        return {}
+    try:
+        parameters = inspect.signature(func).parameters
+    except Exception:
+        return {}
+    return {key: value for key, value in options.items() if key in parameters}
 
-    if hasattr(PIPELINE_RUNNER, "run"):
-        return _supports_on_progress(getattr(PIPELINE_RUNNER, "run"))
 
-    return False
+def _request_tenant(parsed: dict[str, Any]) -> str:
+    """Who the scheduler shares capacity between: the X-Client-Id caller, else the brand."""
+    client_id = request.headers.get("X-Client-Id", "").strip()[:128]
+    return client_id or normalize_prompt(parsed["brand"])
 
 
 def _invoke_pipeline(
@@ -212,36 +477,39 @@ def _invoke_pipeline(
     competitor: str,
     location: str,
     on_progress: Any | None = None,
+    options: dict[str, Any] | None = None,
 ) -> tuple[dict[str, Any], bool]:
     runner_func = getattr(pipeline_module, "run_pipeline", None)
     callback_supported = False
 
     if callable(runner_func):
+        extra = _supported_kwargs(runner_func, options)
         if _supports_on_progress(runner_func):
             callback_supported = True
-            output = runner_func(brand, competitor, location, on_progress=on_progress)
+            output = runner_func(brand, competitor, location, on_progress=on_progress, **extra)
         else:
-            output = runner_func(brand, competitor, location)
+            output = runner_func(brand, competitor, location, **extra)
         if asyncio.iscoroutine(output):
-            output = asyncio.run(output)
+            output = run_async(output)
     elif hasattr(PIPELINE_RUNNER, "run_pipeline"):
         runner_method = getattr(PIPELINE_RUNNER, "run_pipeline")
+        extra = _supported_kwargs(runner_method, options)
         if _supports_on_progress(runner_method):
             callback_supported = True
-            output = runner_method(brand, competitor, location, on_progress=on_progress)
+            output = runner_method(brand, competitor, location, on_progress=on_progress, **extra)
         else:
-            output = runner_method(brand, competitor, location)
+            output = runner_method(brand, competitor, location, **extra)
         if asyncio.iscoroutine(output):
-            output = asyncio.run(output)
+            output = run_async(output)
     elif hasattr(PIPELINE_RUNNER, "run"):
         # Fallback for current class shape in this repo.
         # Pipeline currently takes competitor query and can read defaults from env.
         runner_method = getattr(PIPELINE_RUNNER, "run")
         if _supports_on_progress(runner_method):
             callback_supported = True
-            output = asyncio.run(runner_method(query=competitor, on_progress=on_progress))
+            output = run_async(runner_method(query=competitor, on_progress=on_progress))
         else:
-            output = asyncio.run(runner_method(query=competitor))
+            output = run_async(runner_method(query=competitor))
     else:
         raise RuntimeError("Pipeline runner does not expose run_pipeline or run")
 
@@ -256,33 +524,92 @@ def _invoke_pipeline(
     return output, callback_supported
 
 
+def _watch_cancellations() -> None:
+    """Trip local tokens of jobs that were cancelled through another worker."""
+    while True:
+        time.sleep(CANCEL_POLL_SECONDS)
+        with _CANCEL_LOCK:
+            running = list(JOB_CANCEL_TOKENS.items())
+        for job_id, token in running:
+            if token.cancelled:
+                continue
+            try:
+                job = JOB_STORE.get(job_id)
+            except Exception as exc:
+                logger.warning("Cancellation check for job %s failed: %s", job_id, exc)
+                continue
+            if job and job.get("status") == "cancelled":
+                logger.info("Job %s was cancelled elsewhere; stopping it", job_id)
+                token.cancel("cancelled")
+
+
+def _ensure_cancel_watcher() -> None:
+    global _CANCEL_WATCHER
+    with _CANCEL_LOCK:
+        if _CANCEL_WATCHER is None or not _CANCEL_WATCHER.is_alive():
+            _CANCEL_WATCHER = threading.Thread(target=_watch_cancellations, name="job-cancel-watcher", daemon=True)
+            _CANCEL_WATCHER.start()
+
+
 def _run_pipeline_job(job_id: str) -> None:
     job = _get_job(job_id)
     if not job:
         logger.error("Job %s not found in store", job_id)
         return
+    if job.get("status") == "cancelled":
+        logger.info("Job %s was cancelled before it started", job_id)
+        return
+
+    token = CancellationToken()
+    with _CANCEL_LOCK:
+        JOB_CANCEL_TOKENS[job_id] = token
+    _ensure_cancel_watcher()
+    try:
+        _execute_pipeline_job(job_id, job, token)
+    finally:
+        with _CANCEL_LOCK:
+            JOB_CANCEL_TOKENS.pop(job_id, None)
 
+
+def _execute_pipeline_job(job_id: str, job: dict[str, Any], cancel_token: CancellationToken) -> None:
     input_data = job.get("input", {})
     brand = str(input_data.get("brand", ""))
     competitor = str(input_data.get("competitor", ""))
     location = str(input_data.get("location", ""))
+    options: dict[str, Any] = {
+        "force_regenerate": bool(input_data.get("force_regenerate", False)),
+        "variations": bool(input_data.get("variations", False)),
+        "on_variation": lambda variation: _append_job_variation(job_id, _sanitize_result(variation)),
+        "on_partial": lambda stage, data: _set_job_partial(job_id, stage, _sanitize_result(data)),
+        "job_id": job_id,
+        "timeout_seconds": JOB_MAX_RUNTIME_SECONDS,
+        "cancel_token": cancel_token,
+        "preview": bool(input_data.get("preview", False)),
+        "priority": str(input_data.get("priority") or DEFAULT_PRIORITY),
+    }
+    start_progress = {
+        "step": "STEP 1 — discovery",
+        "percent": 10,
+        "message": "Discovering trends across sources",
+    }
+    render = job.get("render")
+    if render:
+        # A render of a finished preview: STEPS 1-3 come from the stored result.
+        preview_result = job.get("result") or {}
+        options.update(
+            preview=False,
+            force_regenerate=bool(render.get("force_regenerate", options["force_regenerate"])),
+            shared={"outputs": preview_result.get("render_seed") or {}, "explain": preview_result.get("explain") or {}},
+        )
+        start_progress = {
+            "step": "STEP 4 — kling generation",
+            "percent": 90,
+            "message": "Rendering video from the preview prompt",
+        }
 
     logger.info("Job %s starting (brand=%s, competitor=%s, location=%s)", job_id, brand, competitor, location)
 
-    _set_job_state(
-        job_id,
-        "running",
-        progress={
-            "step": "STEP 1 — discovery",
-            "percent": 10,
-            "message": "Discovering trends across sources",
-        },
-    )
-
-    result_holder: dict[str, Any] = {}
-    error_holder: dict[str, str] = {}
-    done_event = threading.Event()
-    callback_enabled = _pipeline_supports_progress_callback()
+    _set_job_state(job_id, "running", progress=start_progress)
 
     def _progress_callback(step: str, percent: int, message: str) -> None:
         _set_job_state(
@@ -295,97 +622,462 @@ def _run_pipeline_job(job_id: str) -> None:
             },
         )
 
-    def _worker() -> None:
-        try:
-            output, _ = _invoke_pipeline(
-                brand,
-                competitor,
-                location,
-                on_progress=_progress_callback,
-            )
-            result_holder["output"] = output
-        except Exception as exc:
-            error_holder["message"] = str(exc)
-            error_holder["trace"] = traceback.format_exc(limit=8)
-        finally:
-            done_event.set()
+    start_ts = time.time()
+    try:
+        # Runs on the executor thread itself; the pipeline enforces the runtime cap.
+        output, _ = _invoke_pipeline(
+            brand,
+            competitor,
+            location,
+            on_progress=_progress_callback,
+            options=options,
+        )
+    except Exception as exc:
+        _finish_pipeline_job(job_id, None, exc, start_ts)
+        return
+    _finish_pipeline_job(job_id, output, None, start_ts)
 
-    worker_thread = threading.Thread(target=_worker, daemon=True)
-    worker_thread.start()
 
-    max_runtime_seconds = 12 * 60
-    start_ts = time.time()
+def _finish_pipeline_job(job_id: str, output: Any, error: BaseException | None, start_ts: float) -> None:
+    """Record how a pipeline run ended: done, cancelled, or error (``timeout`` for the runtime cap)."""
+    elapsed = time.time() - start_ts
+    if isinstance(error, TimeoutError):
+        logger.error("Job %s timed out after %.1fs", job_id, elapsed)
+        _set_job_state(
+            job_id,
+            "error",
+            error="timeout",
+            progress={
+                "step": "TIMEOUT",
+                "percent": 100,
+                "message": f"Job exceeded max runtime ({JOB_MAX_RUNTIME_SECONDS // 60} minutes)",
+            },
+        )
+        return
+    if isinstance(error, JobCancelled):
+        logger.info("Job %s cancelled after %.1fs", job_id, elapsed)
+        _set_job_state(
+            job_id,
+            "cancelled",
+            error="cancelled",
+            progress={"step": "CANCELLED", "percent": 100, "message": "Job cancelled"},
+        )
+        return
+    if error is not None:
+        logger.error("Job %s failed: %s", job_id, error)
+        logger.error(
+            "Job %s traceback: %s",
+            job_id,
+            "".join(traceback.format_exception(type(error), error, error.__traceback__, limit=8)),
+        )
+        _set_job_state(
+            job_id,
+            "error",
+            error=str(error),
+            progress={
+                "step": "ERROR",
+                "percent": 100,
+                "message": "Pipeline execution failed",
+            },
+        )
+        return
 
-    # Approximate progress for long jobs so clients can show movement.
-    staged_progress = [
-        (0, "STEP 1 — discovery", 10, "Discovery in progress"),
-        (120, "STEP 2 — analysis", 40, "Analyzing source media"),
-        (300, "STEP 3 — prompt generation", 70, "Building director brief and prompt"),
-        (480, "STEP 4 — generation", 95, "Generating final video"),
-    ]
-
-    stage_index = 0
-
-    while not done_event.wait(timeout=2):
-        elapsed = time.time() - start_ts
-
-        if elapsed >= max_runtime_seconds:
-            logger.error("Job %s timed out after %.1fs", job_id, elapsed)
-            _set_job_state(
-                job_id,
-                "error",
-                error="timeout",
-                progress={
-                    "step": "TIMEOUT",
-                    "percent": 100,
-                    "message": "Job exceeded max runtime (12 minutes)",
-                },
-            )
-            return
+    safe_output = _sanitize_result(output)
+
+    if isinstance(safe_output, dict) and safe_output.get("status") == "preview":
+        progress = {
+            "step": "PREVIEW",
+            "percent": 100,
+            "message": f"Preview ready; POST /api/job/{job_id}/render to generate the video",
+        }
+    else:
+        progress = {
+            "step": "COMPLETE",
+            "percent": 100,
+            "message": "Pipeline finished successfully",
+        }
+    _set_job_state(job_id, "done", result=safe_output, progress=progress)
+    _cache_job_media(job_id, safe_output)
+    logger.info("Job %s completed", job_id)
+
+
+def _run_batch_group(batch_id: str, job_ids: list[str]) -> None:
+    """Run one competitor group of a batch: shared discovery and Reka, then each item's generation."""
+    jobs = [job for job in (_get_job(job_id) for job_id in job_ids) if job and job.get("status") != "cancelled"]
+    if not jobs:
+        _refresh_batch(batch_id)
+        return
+
+    group_token = CancellationToken()
+    tokens = {job["id"]: CancellationToken() for job in jobs}
+
+    def _item_cancelled() -> None:
+        # The shared stages only stop once no item is left to use them.
+        if all(token.cancelled for token in tokens.values()):
+            group_token.cancel("cancelled")
 
-        if not callback_enabled:
-            while stage_index + 1 < len(staged_progress) and elapsed >= staged_progress[stage_index + 1][0]:
-                stage_index += 1
-                _, step_name, percent, message = staged_progress[stage_index]
+    for token in tokens.values():
+        token.add_callback(_item_cancelled)
+    # The group's runtime cap stops every item with it.
+    group_token.add_callback(
+        lambda: [token.cancel(group_token.reason or "cancelled") for token in tokens.values()]
+    )
+    with _CANCEL_LOCK:
+        JOB_CANCEL_TOKENS.update(tokens)
+    _ensure_cancel_watcher()
+
+    def _shared_progress(step: str, percent: int, message: str) -> None:
+        for job_id, token in tokens.items():
+            if not token.cancelled:
                 _set_job_state(
                     job_id,
                     "running",
                     progress={
-                        "step": step_name,
+                        "step": step,
                         "percent": percent,
-                        "message": message,
+                        "message": f"{message} (shared by {len(tokens)} batch items)",
                     },
                 )
 
-    if "message" in error_holder:
-        logger.error("Job %s failed: %s", job_id, error_holder["message"])
-        logger.error("Job %s traceback: %s", job_id, error_holder.get("trace", ""))
+    def _progress_for(job_id: str) -> Any:
+        return lambda step, percent, message: _set_job_state(
+            job_id, "running", progress={"step": step, "percent": percent, "message": message}
+        )
+
+    def _variation_for(job_id: str) -> Any:
+        return lambda variation: _append_job_variation(job_id, _sanitize_result(variation))
+
+    def _partial_for(job_id: str) -> Any:
+        return lambda stage, data: _set_job_partial(job_id, stage, _sanitize_result(data))
+
+    items = []
+    for job in jobs:
+        input_data = job.get("input", {})
+        items.append(
+            {
+                "job_id": job["id"],
+                "brand": str(input_data.get("brand", "")),
+                "location": str(input_data.get("location", "")),
+                "force_regenerate": bool(input_data.get("force_regenerate", False)),
+                "variations": bool(input_data.get("variations", False)),
+                "on_progress": _progress_for(job["id"]),
+                "on_variation": _variation_for(job["id"]),
+                "on_partial": _partial_for(job["id"]),
+                "cancel_token": tokens[job["id"]],
+            }
+        )
+
+    finished: set[str] = set()
+    start_ts = time.time()
+
+    def _item_done(job_id: str, result: dict[str, Any] | None, error: BaseException | None) -> None:
+        finished.add(job_id)
+        _finish_pipeline_job(job_id, result, error, start_ts)
+        _refresh_batch(batch_id)
+
+    competitor = str(jobs[0].get("input", {}).get("competitor", ""))
+    logger.info("Batch %s: running %s item(s) for competitor=%s", batch_id, len(items), competitor)
+    _shared_progress("STEP 1 — discovery", 10, "Discovering trends across sources")
+    try:
+        pipeline_module.run_batch_group(
+            competitor,
+            items,
+            _item_done,
+            on_progress=_shared_progress,
+            timeout_seconds=JOB_MAX_RUNTIME_SECONDS,
+            cancel_token=group_token,
+            priority=str(jobs[0].get("input", {}).get("priority") or "batch"),
+        )
+    except Exception as exc:
+        for job_id in tokens:
+            if job_id not in finished:
+                _finish_pipeline_job(job_id, None, exc, start_ts)
+    finally:
+        with _CANCEL_LOCK:
+            for job_id in tokens:
+                JOB_CANCEL_TOKENS.pop(job_id, None)
+        _refresh_batch(batch_id)
+
+
+def _batch_summary(batch: dict[str, Any]) -> dict[str, Any]:
+    items = []
+    counts: dict[str, int] = {}
+    for entry in batch.get("items", []):
+        job = _get_job(entry["job_id"])
+        status = job["status"] if job else "expired"
+        counts[status] = counts.get(status, 0) + 1
+        result = job.get("result") if job else None
+        items.append(
+            {
+                **entry,
+                "status": status,
+                "progress": job.get("progress") if job else None,
+                "error": job.get("error") if job else None,
+                "video_url": result.get("video_url") if isinstance(result, dict) else None,
+            }
+        )
+
+    if all(item["status"] in TERMINAL_STATUSES or item["status"] == "expired" for item in items):
+        status = "done"
+    elif any(item["status"] != "queued" for item in items):
+        status = "running"
+    else:
+        status = "queued"
+    return {
+        "batch_id": batch["id"],
+        "status": status,
+        "created_at": batch["created_at"],
+        "counts": counts,
+        "groups": batch.get("groups", []),
+        "items": items,
+    }
+
+
+def _refresh_batch(batch_id: str) -> None:
+    """Store the batch's aggregate status so finished batches age out like jobs."""
+    batch = _get_job(batch_id)
+    if not batch:
+        return
+    status = _batch_summary(batch)["status"]
+    if status == batch["status"]:
+        return
+
+    def _apply(record: dict[str, Any]) -> None:
+        record["status"] = status
+        _touch_job(record)
+
+    JOB_STORE.update(batch_id, _apply)
+
+
+def _create_resumed_job(job_id: str, input_dict: dict[str, Any]) -> None:
+    progress = {
+        "step": "STEP 4 — kling generation",
+        "percent": 90,
+        "message": "Resuming in-flight Kling generation after restart",
+    }
+    if _get_job(job_id):
+        # Durable stores keep the original record; just surface the resume.
+        _set_job_state(job_id, "running", error=None, progress=progress)
+        return
+
+    JOB_STORE.create(
+        {
+            "id": job_id,
+            "status": "running",
+            "created_at": _now_iso(),
+            "updated_at": _now_iso(),
+            "version": 1,
+            "input": input_dict,
+            "progress": progress,
+            "result": None,
+            "error": None,
+            "variations": [],
+        }
+    )
+
+
+def _resume_job_tasks(job_id: str, tasks: list[dict[str, Any]]) -> None:
+    """Re-attach to a restarted job's pending Kling tasks and finish the job from them and any done earlier."""
+    tracker = get_tracker()
+    task_log = get_task_log()
+    cache = get_generation_cache()
+
+    async def _wait_all() -> list[Any]:
+        return await asyncio.gather(
+            *[tracker.wait(task["task_id"]) for task in tasks],
+            return_exceptions=True,
+        )
+
+    outcomes = run_async(_wait_all())
+    variations: list[dict[str, Any]] = []
+    # Variations that finished before the restart still belong in the result.
+    resumed_ids = {task["task_id"] for task in tasks}
+    job = _get_job(job_id) or {}
+    on_record = {item.get("task_id") for item in job.get("variations") or []}
+    for task in task_log.finished_for_job(job_id):
+        if task["task_id"] in resumed_ids:
+            continue
+        item = {
+            "index": (task.get("context") or {}).get("variation_index", 0),
+            "task_id": task["task_id"],
+            "prompt": task.get("prompt") or "",
+        }
+        if task.get("status") == "success" and task.get("video_url"):
+            item.update({"status": "success", "video_url": task["video_url"]})
+        else:
+            item.update({"status": "error", "error": task.get("error") or "Kling generation failed", "video_url": None})
+        variations.append(item)
+        if task["task_id"] not in on_record:
+            _append_job_variation(job_id, item)
+
+    for task, outcome in zip(tasks, outcomes):
+        context = task.get("context") or {}
+        if isinstance(outcome, BaseException):
+            task_log.record_finished(task["task_id"], error=str(outcome))
+            item = {"status": "error", "error": str(outcome), "video_url": None}
+        else:
+            record_task_outcome(
+                task["task_id"],
+                video_url=outcome,
+                task_log=task_log,
+                cache=cache,
+                cache_key=context.get("cache_key"),
+                prompt=task.get("prompt") or "",
+            )
+            item = {"status": "success", "video_url": outcome}
+        item.update(
+            {
+                "index": context.get("variation_index", 0),
+                "task_id": task["task_id"],
+                "prompt": task.get("prompt") or "",
+            }
+        )
+        variations.append(item)
+        _append_job_variation(job_id, item)
+
+    variations.sort(key=lambda item: item["index"])
+    succeeded = [item for item in variations if item.get("video_url")]
+    if not succeeded:
+        errors = "; ".join(str(item.get("error")) for item in variations)
         _set_job_state(
             job_id,
             "error",
-            error=error_holder["message"],
-            progress={
-                "step": "ERROR",
-                "percent": 100,
-                "message": "Pipeline execution failed",
-            },
+            error=f"STEP 4 — kling generation failed after resume: {errors}",
+            progress={"step": "ERROR", "percent": 100, "message": "Resumed Kling generation failed"},
         )
         return
 
-    output = result_holder.get("output")
-    safe_output = _sanitize_result(output)
-
+    first_context = tasks[0].get("context") or {}
+    primary = succeeded[0]
+    result = {
+        "status": "success",
+        "resumed": True,
+        "brand": first_context.get("brand", ""),
+        "competitor": first_context.get("competitor", ""),
+        "location": first_context.get("location", ""),
+        "kling_prompt": primary["prompt"],
+        "video_url": primary["video_url"],
+        "variations": variations if len(variations) > 1 else [],
+        "explain": {
+            "generation": {
+                "provider": "kling",
+                "prompt": primary["prompt"],
+                "task_id": primary["task_id"],
+                "video_url": primary["video_url"],
+                "resumed": True,
+            }
+        },
+    }
     _set_job_state(
         job_id,
         "done",
-        result=safe_output,
-        progress={
-            "step": "COMPLETE",
-            "percent": 100,
-            "message": "Pipeline finished successfully",
-        },
+        result=_sanitize_result(result),
+        progress={"step": "COMPLETE", "percent": 100, "message": "Resumed generation finished"},
     )
-    logger.info("Job %s completed", job_id)
+    _cache_job_media(job_id, result)
+    logger.info("Job %s completed from %s resumed Kling task(s)", job_id, len(tasks))
+
+
+def _adopt_finished_job_task(task: dict[str, Any]) -> None:
+    """Keep polling an orphaned task whose job is over so the paid video still reaches the cache."""
+    context = task.get("context") or {}
+    remaining = RESUME_MAX_AGE_SECONDS - (time.time() - float(task.get("submitted_at") or 0.0))
+    get_tracker().adopt(
+        task["task_id"],
+        max_wait=max(0.0, remaining),
+        on_done=functools.partial(
+            record_task_outcome,
+            task["task_id"],
+            task_log=get_task_log(),
+            cache=get_generation_cache(),
+            cache_key=context.get("cache_key"),
+            prompt=task.get("prompt") or "",
+        ),
+    )
+
+
+def _resume_outstanding_kling_tasks() -> None:
+    try:
+        outstanding = get_task_log().outstanding()
+    except Exception as exc:
+        logger.warning("Could not read Kling task log: %s", exc)
+        return
+
+    task_log = get_task_log()
+    by_job: dict[str, list[dict[str, Any]]] = {}
+    for task in outstanding:
+        if not task.get("job_id") or not task_log.is_orphaned(task):
+            continue
+        # Several workers sweep at once; only the one that wins the claim resumes.
+        if not task_log.claim(task["task_id"], task.get("owner")):
+            continue
+        job = _get_job(task["job_id"])
+        if job and job.get("status") in {"done", "error", "cancelled"}:
+            _adopt_finished_job_task(task)
+            continue
+        by_job.setdefault(task["job_id"], []).append(task)
+
+    for job_id, tasks in by_job.items():
+        context = tasks[0].get("context") or {}
+        _create_resumed_job(
+            job_id,
+            {
+                "brand": context.get("brand", ""),
+                "competitor": context.get("competitor", ""),
+                "location": context.get("location", ""),
+            },
+        )
+        logger.info("Resuming %s Kling task(s) for job %s", len(tasks), job_id)
+        threading.Thread(target=_resume_job_tasks, args=(job_id, tasks), daemon=True).start()
+
+
+KLING_RESUME_ENABLED = os.environ.get("KLING_RESUME_ON_STARTUP", "1") == "1"
+# Expired cache rows are otherwise only dropped when the same key is read again.
+CACHE_PURGE_INTERVAL_SECONDS = int(os.environ.get("CACHE_PURGE_INTERVAL_SECONDS", "600"))
+
+
+def _purge_expired_caches() -> None:
+    for name, cache in (("generation", get_generation_cache()), ("discovery", get_discovery_cache())):
+        if cache is None:
+            continue
+        try:
+            removed = cache.purge_expired()
+        except Exception as exc:
+            logger.warning("%s cache purge failed: %s", name.capitalize(), exc)
+            continue
+        if removed:
+            logger.info("Purged %s expired %s cache entries", removed, name)
+
+
+def _kling_lease_loop() -> None:
+    """Renew this process's Kling task leases and adopt tasks whose owner let theirs lapse.
+
+    A restarted container can boot before the previous process's leases
+    expire, so the orphan sweep repeats instead of running only at startup.
+    The same loop purges expired cache rows every CACHE_PURGE_INTERVAL_SECONDS.
+    """
+    last_purge = 0.0
+    while True:
+        time.sleep(OWNER_LEASE_SECONDS / 3)
+        try:
+            get_task_log().renew_leases()
+        except Exception as exc:
+            logger.warning("Could not renew Kling task leases: %s", exc)
+        if KLING_RESUME_ENABLED:
+            _resume_outstanding_kling_tasks()
+        if time.monotonic() - last_purge >= CACHE_PURGE_INTERVAL_SECONDS:
+            last_purge = time.monotonic()
+            _purge_expired_caches()
+
+
+if not SMOKE_MODE:
+    if KLING_RESUME_ENABLED:
+        _resume_outstanding_kling_tasks()
+    threading.Thread(target=_kling_lease_loop, name="kling-lease", daemon=True).start()
+
+if not SMOKE_MODE:
+    # Deliveries left pending by a previous process are retried from the durable queue.
+    get_webhook_dispatcher().start()
 
 
 @app.before_request
@@ -406,6 +1098,25 @@ def health() -> Any:
                 "kling": SERVICES["kling"],
                 "twitter": SERVICES["twitter"],
             },
+            "jobs": JOB_EXECUTOR.stats(),
+        }
+    )
+
+
+@app.get("/api/metrics")
+def metrics() -> Any:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return jsonify(
+        {
+            "timestamp": _now_iso(),
+            "job_store": JOB_STORE.stats(),
+            "job_body_cache": JOB_BODY_CACHE.stats(),
+            "job_events": {**JOB_EVENTS.stats(), "open_streams": _SSE_OPEN, "max_streams": SSE_MAX_STREAMS},
+            "executor": JOB_EXECUTOR.stats(),
+            "stage_limits": stage_limit_stats(),
+            "runtime": get_runtime().stats(),
+            # ru_maxrss is reported in kilobytes on Linux.
+            "process": {"pid": os.getpid(), "max_rss_kb": usage.ru_maxrss},
         }
     )
 
@@ -477,6 +1188,26 @@ def selftest() -> Any:
     )
 
 
+def _busy_response(retry_after: int) -> Any:
+    response = jsonify({"error": "server busy, retry later", "retry_after": retry_after})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 429
+
+
+def _reused_job_response(job: dict[str, Any], priority: str | None = None) -> Any:
+    payload = {"job_id": job["id"], "status": job["status"], "reused": True}
+    if job["status"] == "queued":
+        if priority and JOB_EXECUTOR.promote(job["id"], priority):
+            # A waiting caller must not sit behind the background job it attached to.
+            def _apply(stored: dict[str, Any]) -> None:
+                stored["input"]["priority"] = priority
+                _touch_job(stored)
+
+            JOB_STORE.update(job["id"], _apply)
+        payload["queue_position"] = JOB_EXECUTOR.queue_position(job["id"])
+    return jsonify(payload), 200
+
+
 @app.post("/api/generate")
 def generate() -> Any:
     body = request.get_json(silent=True) or {}
@@ -484,17 +1215,385 @@ def generate() -> Any:
     if error:
         return jsonify({"error": error}), 400
 
-    job_id = _create_job(parsed)
-    threading.Thread(target=_run_pipeline_job, args=(job_id,), daemon=True).start()
-    return jsonify({"job_id": job_id, "status": "queued"}), 202
+    fingerprint = _job_fingerprint(parsed)
+    idempotency_key = request.headers.get("Idempotency-Key", "").strip() or None
+    if idempotency_key and len(idempotency_key) > 255:
+        return jsonify({"error": "Idempotency-Key is too long"}), 400
+
+    with _SUBMIT_LOCK:
+        if idempotency_key:
+            existing = _find_idempotent_job(idempotency_key)
+            if existing is not None:
+                if existing.get("fingerprint") != fingerprint:
+                    return jsonify({"error": "Idempotency-Key was already used for a different request"}), 422
+                return _reused_job_response(existing, parsed["priority"])
+
+        existing = _find_reusable_job(fingerprint)
+        if existing is not None:
+            logger.info("Request matches job %s (%s); reusing it", existing["id"], existing["status"])
+            return _reused_job_response(existing, parsed["priority"])
+
+        if JOB_EXECUTOR.is_full(parsed["priority"]):
+            return _busy_response(JOB_EXECUTOR.retry_after(parsed["priority"]))
+
+        parsed["tenant"] = _request_tenant(parsed)
+        job_id = _create_job(parsed, fingerprint=fingerprint, idempotency_key=idempotency_key)
+
+    try:
+        position = JOB_EXECUTOR.submit(
+            job_id,
+            lambda: _run_pipeline_job(job_id),
+            priority=parsed["priority"],
+            tenant=parsed["tenant"],
+        )
+    except QueueFullError as exc:
+        # Lost a race for the last slot after the job record was written; free its
+        # Idempotency-Key so the client's retry is admitted rather than replayed.
+        JOB_STORE.update(job_id, lambda job: job.update(fingerprint=None, idempotency_key=None))
+        _set_job_state(
+            job_id,
+            "error",
+            error="server busy",
+            progress={"step": "REJECTED", "percent": 100, "message": "Job queue is full"},
+            notify=False,
+        )
+        return _busy_response(exc.retry_after)
+    return jsonify({"job_id": job_id, "status": "queued", "queue_position": position}), 202
+
+
+@app.post("/api/generate_batch")
+def generate_batch() -> Any:
+    body = request.get_json(silent=True) or {}
+    raw_items = body.get("items")
+    if not isinstance(raw_items, list) or not raw_items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    if len(raw_items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"at most {BATCH_MAX_ITEMS} items per batch"}), 400
+    priority = str(body.get("priority") or "batch").strip().lower()
+    if priority not in ("batch", "background"):
+        return jsonify({"error": "priority must be batch or background"}), 400
+
+    parsed_items = []
+    for index, raw in enumerate(raw_items):
+        if not isinstance(raw, dict):
+            return jsonify({"error": f"items[{index}]: must be an object"}), 400
+        parsed, error = _validate_generate_body(raw)
+        if error:
+            return jsonify({"error": f"items[{index}]: {error}"}), 400
+        if parsed["preview"]:
+            # Grouped items share one run that always renders; previews go through /api/generate.
+            return jsonify({"error": f"items[{index}]: preview is not supported in batches"}), 400
+        parsed_items.append({**parsed, "priority": priority, "tenant": _request_tenant(parsed)})
+
+    # Items naming the same competitor share one discovery + Reka run.
+    groups: dict[str, list[int]] = {}
+    for index, parsed in enumerate(parsed_items):
+        groups.setdefault(normalize_prompt(parsed["competitor"]), []).append(index)
+
+    batch_id = str(uuid.uuid4())
+    with _SUBMIT_LOCK:
+        if JOB_EXECUTOR.is_full(priority):
+            return _busy_response(JOB_EXECUTOR.retry_after(priority))
+        job_ids = [_create_job({**parsed, "batch_id": batch_id}) for parsed in parsed_items]
+        group_entries = [
+            {"competitor": parsed_items[indexes[0]]["competitor"], "job_ids": [job_ids[i] for i in indexes]}
+            for indexes in groups.values()
+        ]
+        JOB_STORE.create(
+            {
+                "id": batch_id,
+                "kind": "batch",
+                "status": "queued",
+                "created_at": _now_iso(),
+                "updated_at": _now_iso(),
+                "version": 1,
+                "input": {"items": len(parsed_items), "priority": priority},
+                "items": [
+                    {
+                        "index": index,
+                        "job_id": job_ids[index],
+                        "brand": parsed["brand"],
+                        "competitor": parsed["competitor"],
+                        "location": parsed["location"],
+                    }
+                    for index, parsed in enumerate(parsed_items)
+                ],
+                "groups": group_entries,
+                "progress": None,
+                "result": None,
+                "error": None,
+                "variations": [],
+            }
+        )
+
+    rejected = 0
+    for number, (group, indexes) in enumerate(zip(group_entries, groups.values())):
+        try:
+            JOB_EXECUTOR.submit(
+                f"{batch_id}:{number}",
+                lambda group_job_ids=group["job_ids"]: _run_batch_group(batch_id, group_job_ids),
+                priority=priority,
+                # A group shares one slot; it is charged to the tenant of its first item.
+                tenant=parsed_items[indexes[0]]["tenant"],
+            )
+        except QueueFullError:
+            rejected += len(group["job_ids"])
+            for job_id in group["job_ids"]:
+                _set_job_state(
+                    job_id,
+                    "error",
+                    error="server busy",
+                    progress={"step": "REJECTED", "percent": 100, "message": "Job queue is full"},
+                    notify=False,
+                )
+    if rejected:
+        _refresh_batch(batch_id)
+        logger.warning("Batch %s: %s item(s) rejected, job queue is full", batch_id, rejected)
+
+    batch = _get_job(batch_id)
+    return jsonify(_batch_summary(batch)), 202
+
+
+@app.get("/api/batch/<batch_id>")
+def get_batch(batch_id: str) -> Any:
+    batch = _get_job(batch_id)
+    if not batch or batch.get("kind") != "batch":
+        return jsonify({"error": "batch not found"}), 404
+    return jsonify(_batch_summary(batch))
 
 
 @app.get("/api/job/<job_id>")
 def get_job(job_id: str) -> Any:
-    job = _get_job(job_id)
-    if not job:
+    version = JOB_STORE.version(job_id)
+    if version is None:
         return jsonify({"error": "job not found"}), 404
-    return jsonify(job)
+
+    cached = JOB_BODY_CACHE.get(job_id, version)
+    if cached is None:
+        job = _get_job(job_id)
+        if not job:
+            return jsonify({"error": "job not found"}), 404
+        version = int(job.get("version", 0))
+        cached = (job["status"], json.dumps(job).encode("utf-8"))
+        JOB_BODY_CACHE.put(job_id, version, *cached)
+    if b'"media_url"' in cached[1]:
+        job = _drop_stale_media(job_id, cached[1])
+        if job is not None:
+            version = int(job.get("version", 0))
+            cached = (job["status"], json.dumps(job).encode("utf-8"))
+            JOB_BODY_CACHE.put(job_id, version, *cached)
+    status, body = cached
+
+    etag = f"{job_id}.{version}"
+    if status == "queued":
+        # Only the worker holding the job knows its place in line, so it is part of the tag.
+        position = JOB_EXECUTOR.queue_position(job_id)
+        etag = f"{etag}.q{position}"
+        if not request.if_none_match.contains(etag):
+            job = json.loads(body)
+            job["queue_position"] = position
+            body = json.dumps(job).encode("utf-8")
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.delete("/api/job/<job_id>")
+def cancel_job(job_id: str) -> Any:
+    previous_status: str | None = None
+
+    def _apply(job: dict[str, Any]) -> None:
+        nonlocal previous_status
+        previous_status = job["status"]
+        if previous_status in TERMINAL_STATUSES:
+            return
+        job["status"] = "cancelled"
+        job["error"] = "cancelled"
+        job["progress"] = {"step": "CANCELLED", "percent": 100, "message": "Job cancelled by request"}
+        _touch_job(job)
+
+    job = JOB_STORE.update(job_id, _apply)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    if previous_status in TERMINAL_STATUSES:
+        return jsonify({"error": f"job already {previous_status}", "status": previous_status}), 409
+
+    # Queued here: never starts. Running here: the token stops it. Running on
+    # another worker: its cancellation watcher sees the stored status.
+    JOB_EXECUTOR.cancel(job_id)
+    with _CANCEL_LOCK:
+        token = JOB_CANCEL_TOKENS.get(job_id)
+    if token is not None:
+        token.cancel("cancelled")
+    JOB_EVENTS.publish(job_id, "snapshot", job, final=True)
+    _enqueue_job_webhook(job)
+    logger.info("Job %s cancelled (was %s)", job_id, previous_status)
+    return jsonify({"job_id": job_id, "status": "cancelled"})
+
+
+@app.post("/api/job/<job_id>/render")
+def render_job(job_id: str) -> Any:
+    body = request.get_json(silent=True) or {}
+    refusal: str | None = None
+
+    def _apply(job: dict[str, Any]) -> None:
+        nonlocal refusal
+        result = job.get("result")
+        if job["status"] != "done" or not isinstance(result, dict) or result.get("status") != "preview":
+            refusal = f"job is {job['status']}" if job["status"] != "done" else "job is not a finished preview"
+            return
+        job["status"] = "queued"
+        job["render"] = {"requested_at": _now_iso(), "force_regenerate": bool(body.get("force_regenerate", False))}
+        job["progress"] = {"step": "QUEUED", "percent": 90, "message": "Render queued"}
+        _touch_job(job)
+
+    with _SUBMIT_LOCK:
+        stored = _get_job(job_id)
+        priority = str(((stored or {}).get("input") or {}).get("priority") or DEFAULT_PRIORITY)
+        if JOB_EXECUTOR.is_full(priority):
+            return _busy_response(JOB_EXECUTOR.retry_after(priority))
+        job = JOB_STORE.update(job_id, _apply)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    if refusal:
+        return jsonify({"error": f"cannot render: {refusal}", "status": job["status"]}), 409
+
+    try:
+        position = JOB_EXECUTOR.submit(
+            job_id,
+            lambda: _run_pipeline_job(job_id),
+            priority=priority,
+            tenant=str(job["input"].get("tenant") or normalize_prompt(job["input"].get("brand", ""))),
+        )
+    except QueueFullError as exc:
+        # Put the preview back exactly as it was so the render can be retried.
+        def _revert(job: dict[str, Any]) -> None:
+            job["status"] = "done"
+            job.pop("render", None)
+            job["progress"] = {"step": "PREVIEW", "percent": 100, "message": "Preview ready; render rejected, retry later"}
+            _touch_job(job)
+
+        JOB_STORE.update(job_id, _revert)
+        return _busy_response(exc.retry_after)
+    JOB_EVENTS.publish(job_id, "progress", {"status": "queued", "progress": job["progress"], "error": None, "updated_at": job["updated_at"]})
+    return jsonify({"job_id": job_id, "status": "queued", "queue_position": position}), 202
+
+
+@app.get("/api/media/<digest>")
+def get_media(digest: str) -> Any:
+    store = get_media_store()
+    if store is None or not is_valid_digest(digest):
+        return jsonify({"error": "media not found"}), 404
+
+    path = store.open_path(digest)
+    if not path:
+        return jsonify({"error": "media not found"}), 404
+
+    # Content-addressed, so the digest is a strong ETag and the file never changes.
+    # conditional=True answers Range and If-None-Match; the WSGI file wrapper lets
+    # gunicorn stream the body with sendfile.
+    response = send_file(path, mimetype="video/mp4", conditional=True, etag=digest, max_age=31536000)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+def _sse_message(event: str, data: Any, event_id: int | None = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _acquire_sse_slot() -> bool:
+    global _SSE_OPEN
+    with _SSE_LOCK:
+        if _SSE_OPEN >= SSE_MAX_STREAMS:
+            return False
+        _SSE_OPEN += 1
+        return True
+
+
+def _release_sse_slot() -> None:
+    global _SSE_OPEN
+    with _SSE_LOCK:
+        _SSE_OPEN = max(0, _SSE_OPEN - 1)
+
+
+@app.get("/api/job/<job_id>/events")
+def job_events(job_id: str) -> Any:
+    if not _get_job(job_id):
+        return jsonify({"error": "job not found"}), 404
+    if not _acquire_sse_slot():
+        response = jsonify({"error": "too many open event streams; poll /api/job/<job_id>", "retry_after": 5})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+
+    raw_last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or ""
+    try:
+        resume_from: int | None = int(raw_last_id)
+    except ValueError:
+        resume_from = None
+
+    def _stream() -> Any:
+        started = time.monotonic()
+        last_sent = time.monotonic()
+        last_id = resume_from if resume_from is not None else -1
+        seen_updated_at = None
+
+        # Retry hint for EventSource reconnects, in milliseconds.
+        yield "retry: 3000\n\n"
+
+        replay = JOB_EVENTS.events_after(job_id, last_id) if resume_from is not None else None
+        if resume_from is not None and resume_from > JOB_EVENTS.last_id(job_id):
+            # Ids from another worker or an older process; resync from the store.
+            replay = None
+
+        pending: list[dict[str, Any]] | None = replay
+        while time.monotonic() - started < SSE_MAX_STREAM_SECONDS:
+            if pending is None:
+                snapshot = _get_job(job_id)
+                if snapshot is None:
+                    yield _sse_message("error", {"error": "job not found"})
+                    return
+                last_id = JOB_EVENTS.last_id(job_id)
+                seen_updated_at = snapshot.get("updated_at")
+                yield _sse_message("snapshot", snapshot, last_id)
+                last_sent = time.monotonic()
+                if snapshot.get("status") in TERMINAL_STATUSES:
+                    return
+            else:
+                for item in pending:
+                    last_id = item["id"]
+                    data = item["data"]
+                    seen_updated_at = data.get("updated_at", seen_updated_at)
+                    yield _sse_message(item["event"], data, last_id)
+                    last_sent = time.monotonic()
+                    if item["event"] == "snapshot" and data.get("status") in TERMINAL_STATUSES:
+                        return
+
+            pending = JOB_EVENTS.wait(job_id, last_id, timeout=1.0)
+            if pending == []:
+                # Nothing published here; the job may be running in another worker.
+                current = _get_job(job_id)
+                if current is not None and current.get("updated_at") != seen_updated_at:
+                    pending = None
+                elif time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+
+    response = Response(stream_with_context(_stream()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    # Runs when the server closes the response, whether or not the stream was iterated.
+    response.call_on_close(_release_sse_slot)
+    return response
 
 
 @app.post("/api/generate_sync")
@@ -505,7 +1604,15 @@ def generate_sync() -> Any:
         return jsonify({"error": error}), 400
 
     try:
-        output, _ = _invoke_pipeline(parsed["brand"], parsed["competitor"], parsed["location"])
+        output, _ = _invoke_pipeline(
+            parsed["brand"],
+            parsed["competitor"],
+            parsed["location"],
+            options={
+                "force_regenerate": parsed["force_regenerate"],
+                "variations": parsed["variations"],
+            },
+        )
         return jsonify(_sanitize_result(output))
     except Exception as exc:
         logger.error("Sync pipeline failed: %s", exc)
@@ -513,6 +1620,37 @@ def generate_sync() -> Any:
         return jsonify({"error": str(exc)}), 500
 
 
+def _record_kling_callback(data: dict[str, Any]) -> None:
+    task_id = str(data.get("taskId") or data.get("task_id") or "")
+    try:
+        _, video_url = parse_task_record(data)
+    except Exception as exc:
+        get_task_log().record_finished(task_id, error=str(exc))
+        return
+    if video_url:
+        get_task_log().record_finished(task_id, video_url=video_url)
+
+
+@app.post("/api/kling/callback")
+def kling_callback() -> Any:
+    if KLING_CALLBACK_TOKEN:
+        supplied = request.args.get("token", "")
+        if not hmac.compare_digest(supplied, KLING_CALLBACK_TOKEN):
+            return jsonify({"error": "forbidden"}), 403
+
+    body = request.get_json(silent=True) or {}
+    data = body.get("data") if isinstance(body.get("data"), dict) else body
+    if not isinstance(data, dict) or not (data.get("taskId") or data.get("task_id")):
+        return jsonify({"error": "missing taskId"}), 400
+
+    resolved = get_tracker().resolve_record(data)
+    if not resolved:
+        # The waiting job may live in another worker; its tracker reads the task log.
+        _record_kling_callback(data)
+    logger.info("Kling callback for task %s (resolved=%s)", data.get("taskId") or data.get("task_id"), resolved)
+    return jsonify({"status": "ok", "resolved": resolved})
+
+
 # Legacy compatibility routes
 @app.post("/api/pipeline/run")
 def legacy_run() -> Any:
@@ -526,12 +1664,7 @@ def legacy_status(job_id: str) -> Any:
 
 @app.get("/api/pipeline/jobs")
 def legacy_jobs() -> Any:
-    with JOBS_LOCK:
-        summaries = [
-            {"id": j["id"], "status": j["status"], "created_at": j["created_at"]}
-            for j in JOBS.values()
-        ]
-    return jsonify(summaries)
+    return jsonify(JOB_STORE.list_summaries())
 
 
 @app.get("/_debug/jobs_clear")
@@ -539,14 +1672,15 @@ def debug_jobs_clear() -> Any:
     if not DEBUG_MODE:
         return jsonify({"error": "forbidden"}), 403
 
-    with JOBS_LOCK:
-        JOBS.clear()
+    JOB_STORE.clear()
     return jsonify({"status": "cleared", "timestamp": _now_iso()})
 
 
-# Frontend polling note:
-# Poll GET /api/job/<job_id> every 2-3 seconds and handle statuses:
-# queued | running | done | error
+# Frontend progress note:
+# Prefer GET /api/job/<job_id>/events (Server-Sent Events: snapshot | progress |
+# variation). Fall back to polling GET /api/job/<job_id> every 2-3 seconds and
+# handle statuses: queued | running | done | error | cancelled
+# Server-to-server callers can pass callback_url instead and receive a signed POST.
 
 if __name__ == "__main__":
     debug_enabled = os.environ.get("FLASK_ENV") == "development"
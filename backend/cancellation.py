@@ -0,0 +1,133 @@
+import threading
+import time
+from typing import Callable
+
+
+class JobCancelled(Exception):
+    def __init__(self, reason: str = "cancelled") -> None:
+        super().__init__(f"job {reason}")
+        self.reason = reason
+
+
+class JobTimedOut(JobCancelled, TimeoutError):
+    """Cancellation caused by the runtime cap; still a ``TimeoutError`` for callers."""
+
+    def __init__(self) -> None:
+        super().__init__("timeout")
+
+
+class CancellationToken:
+    """Cooperative, thread-safe cancellation flag shared by a job's pipeline and agents.
+
+    Loops call ``raise_if_cancelled`` between upstream calls and use ``wait``
+    instead of ``time.sleep`` so a cancel or timeout interrupts a back-off
+    immediately. Async code bridges in through ``add_callback``.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self.reason: str | None = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel once; returns False if the token was already cancelled."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+        return True
+
+    def cancel_after(self, seconds: float, reason: str = "timeout") -> threading.Timer:
+        timer = threading.Timer(seconds, self.cancel, kwargs={"reason": reason})
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """Run ``callback`` on cancel (immediately if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to ``timeout`` seconds; True if cancelled meanwhile."""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        if not self._event.is_set():
+            return
+        if self.reason == "timeout":
+            raise JobTimedOut()
+        raise JobCancelled(self.reason or "cancelled")
+
+
+class Deadline:
+    """The moment a job's runtime budget runs out, shared by every upstream call.
+
+    Each call sizes its own timeout with ``timeout(default)`` - its usual limit
+    or whatever is left, whichever is smaller - and optional work checks
+    ``allows`` first. ``within`` carves a shorter budget for one stage so later
+    stages keep the time they need. Enforcement stays with the job's
+    ``CancellationToken``; a deadline only shapes how long each call may take.
+    """
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = max(0.0, float(seconds))
+        self.expires_at = time.monotonic() + self.seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def allows(self, seconds: float) -> bool:
+        return self.remaining() >= seconds
+
+    def timeout(self, default: float, minimum: float = 1.0) -> float:
+        return max(minimum, min(default, self.remaining()))
+
+    def within(self, seconds: float) -> "Deadline":
+        """A deadline ``seconds`` from now, never later than this one."""
+        child = Deadline(seconds)
+        if self.expires_at < child.expires_at:
+            child.expires_at = self.expires_at
+            child.seconds = child.remaining()
+        return child
+
+
+def timeout_within(deadline: Deadline | None, default: float) -> float:
+    return default if deadline is None else deadline.timeout(default)
+
+
+def deadline_allows(deadline: Deadline | None, seconds: float) -> bool:
+    return deadline is None or deadline.allows(seconds)
+
+
+def check_cancelled(token: CancellationToken | None) -> None:
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def sleep_or_cancel(token: CancellationToken | None, seconds: float) -> None:
+    """``time.sleep`` that returns early (raising) when ``token`` is cancelled."""
+    if token is None:
+        threading.Event().wait(seconds)
+        return
+    if token.wait(seconds):
+        token.raise_if_cancelled()
@@ -17,3 +17,6 @@ class Settings:
 
 
 settings = Settings()
+
+# Local persistent state (caches, task logs, job store). Mount a volume here in production.
+DATA_DIR = os.getenv("TRENDHIJACK_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data"))
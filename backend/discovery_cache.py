@@ -0,0 +1,124 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from config import DATA_DIR
+from generation_cache import normalize_prompt
+
+# Trends move quickly; a topic slice older than this is fetched again.
+DEFAULT_TTL_SECONDS = int(os.environ.get("DISCOVERY_CACHE_TTL_SECONDS", str(30 * 60)))
+CACHE_ENABLED = os.environ.get("DISCOVERY_CACHE_ENABLED", "1") == "1"
+# A slice searched at a deeper level also answers shallower lookups.
+DEPTH_RANK = {"basic": 0, "advanced": 1}
+
+
+class DiscoveryCache:
+    """Discovery results stored per (source, topic, platform, recency) slice.
+
+    Jobs that share a topic - typically the competitor name - reuse the slice
+    another job fetched instead of re-scouting it, and only search the slices
+    that are missing or stale. Every slice keeps the time it was fetched so
+    callers can report how fresh their discovery is.
+    """
+
+    def __init__(self, path: str | None = None, ttl_seconds: int = DEFAULT_TTL_SECONDS) -> None:
+        self.path = path or os.path.join(DATA_DIR, "discovery_cache.sqlite3")
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS slices (
+                    source TEXT NOT NULL,
+                    topic_key TEXT NOT NULL,
+                    platform TEXT NOT NULL,
+                    recency TEXT NOT NULL,
+                    depth TEXT NOT NULL,
+                    posts TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (source, topic_key, platform, recency)
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(
+        self,
+        source: str,
+        topic: str,
+        platform: str,
+        recency: str,
+        depth: str = "basic",
+    ) -> dict[str, Any] | None:
+        """The fresh slice for this key searched at ``depth`` or deeper, else None."""
+        key = (source, normalize_prompt(topic), platform, recency)
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT depth, posts, fetched_at FROM slices "
+                "WHERE source = ? AND topic_key = ? AND platform = ? AND recency = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            stored_depth, posts, fetched_at = row
+            if time.time() - float(fetched_at) > self.ttl_seconds:
+                conn.execute(
+                    "DELETE FROM slices WHERE source = ? AND topic_key = ? AND platform = ? AND recency = ?",
+                    key,
+                )
+                return None
+        if DEPTH_RANK.get(stored_depth, 0) < DEPTH_RANK.get(depth, 0):
+            return None
+        return {"posts": json.loads(posts), "depth": stored_depth, "fetched_at": float(fetched_at)}
+
+    def put(
+        self,
+        source: str,
+        topic: str,
+        platform: str,
+        recency: str,
+        posts: list[dict[str, Any]],
+        depth: str = "basic",
+    ) -> float:
+        fetched_at = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO slices (source, topic_key, platform, recency, depth, posts, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    source,
+                    normalize_prompt(topic),
+                    platform,
+                    recency,
+                    depth,
+                    json.dumps(posts, ensure_ascii=False),
+                    fetched_at,
+                ),
+            )
+        return fetched_at
+
+    def purge_expired(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute("DELETE FROM slices WHERE fetched_at < ?", (cutoff,))
+            return int(cursor.rowcount or 0)
+
+
+_CACHE: DiscoveryCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_discovery_cache() -> DiscoveryCache | None:
+    global _CACHE
+    if not CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = DiscoveryCache()
+        return _CACHE
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any
+
+from config import DATA_DIR
+
+# Kie result URLs expire after a while; never hand out an entry older than this.
+DEFAULT_TTL_SECONDS = int(os.environ.get("KLING_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_ENABLED = os.environ.get("KLING_CACHE_ENABLED", "1") == "1"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse cosmetic differences (case, unicode forms, punctuation, spacing)."""
+    text = unicodedata.normalize("NFKC", str(prompt or "")).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_cache_key(
+    prompt: str,
+    mode: str = "std",
+    duration: str = "5",
+    aspect_ratio: str = "9:16",
+    multi_prompt: list | None = None,
+) -> str:
+    payload = {
+        "prompt": normalize_prompt(prompt),
+        "mode": str(mode),
+        "duration": str(duration),
+        "aspect_ratio": str(aspect_ratio),
+        "multi_prompt": multi_prompt or None,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Persistent map from normalized Kling request to a finished generation."""
+
+    def __init__(self, path: str | None = None, ttl_seconds: int = DEFAULT_TTL_SECONDS) -> None:
+        self.path = path or os.path.join(DATA_DIR, "generation_cache.sqlite3")
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS generations (
+                    cache_key TEXT PRIMARY KEY,
+                    task_id TEXT,
+                    video_url TEXT NOT NULL,
+                    prompt TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, cache_key: str) -> dict[str, Any] | None:
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT task_id, video_url, created_at FROM generations WHERE cache_key = ?",
+                (cache_key,),
+            ).fetchone()
+            if row is None:
+                return None
+            task_id, video_url, created_at = row
+            if time.time() - float(created_at) > self.ttl_seconds:
+                conn.execute("DELETE FROM generations WHERE cache_key = ?", (cache_key,))
+                return None
+        return {"task_id": task_id, "video_url": video_url, "created_at": created_at}
+
+    def put(self, cache_key: str, task_id: str | None, video_url: str, prompt: str = "") -> None:
+        if not video_url:
+            return
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO generations (cache_key, task_id, video_url, prompt, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (cache_key, task_id, video_url, prompt[:4000], time.time()),
+            )
+
+    def invalidate(self, cache_key: str) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM generations WHERE cache_key = ?", (cache_key,))
+
+    def purge_expired(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute("DELETE FROM generations WHERE created_at < ?", (cutoff,))
+            return int(cursor.rowcount or 0)
+
+
+_CACHE: GenerationCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_generation_cache() -> GenerationCache | None:
+    global _CACHE
+    if not CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = GenerationCache()
+        return _CACHE
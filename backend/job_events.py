@@ -0,0 +1,85 @@
+import collections
+import threading
+import time
+from typing import Any
+
+RETAINED_EVENTS_PER_JOB = 50
+# Drop the history of finished jobs after this long; late subscribers get a snapshot.
+FINISHED_RETENTION_SECONDS = 600
+
+
+class JobEventBus:
+    """In-process fan-out of job state changes to Server-Sent Events streams.
+
+    Every published event gets a per-job increasing id so a reconnecting
+    client can send ``Last-Event-ID`` and receive only what it missed, as long
+    as those events are still retained here. Anything older (or published by
+    another worker) is covered by a fresh snapshot from the job store.
+    """
+
+    def __init__(self) -> None:
+        self._events: dict[str, collections.deque[dict[str, Any]]] = {}
+        self._seq: dict[str, int] = {}
+        self._finished_at: dict[str, float] = {}
+        self._cond = threading.Condition()
+
+    def publish(self, job_id: str, event: str, data: dict[str, Any], final: bool = False) -> int:
+        with self._cond:
+            seq = self._seq.get(job_id, 0) + 1
+            self._seq[job_id] = seq
+            history = self._events.setdefault(job_id, collections.deque(maxlen=RETAINED_EVENTS_PER_JOB))
+            history.append({"id": seq, "event": event, "data": data})
+            if final:
+                self._finished_at[job_id] = time.monotonic()
+            else:
+                # A finished job can be reopened (preview -> render); keep its history live.
+                self._finished_at.pop(job_id, None)
+            self._prune_locked()
+            self._cond.notify_all()
+            return seq
+
+    def last_id(self, job_id: str) -> int:
+        with self._cond:
+            return self._seq.get(job_id, 0)
+
+    def events_after(self, job_id: str, last_id: int) -> list[dict[str, Any]] | None:
+        """Events newer than ``last_id``, or ``None`` when some of them are no longer retained."""
+        with self._cond:
+            return self._events_after_locked(job_id, last_id)
+
+    def wait(self, job_id: str, last_id: int, timeout: float) -> list[dict[str, Any]] | None:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                events = self._events_after_locked(job_id, last_id)
+                if events is None or events:
+                    return events
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(timeout=remaining)
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            self._prune_locked()
+            return {
+                "jobs": len(self._events),
+                "events": sum(len(history) for history in self._events.values()),
+                "finished_jobs": len(self._finished_at),
+            }
+
+    def _events_after_locked(self, job_id: str, last_id: int) -> list[dict[str, Any]] | None:
+        history = self._events.get(job_id)
+        if not history:
+            return []
+        if last_id < history[0]["id"] - 1:
+            return None
+        return [item for item in history if item["id"] > last_id]
+
+    def _prune_locked(self) -> None:
+        cutoff = time.monotonic() - FINISHED_RETENTION_SECONDS
+        for job_id, finished in list(self._finished_at.items()):
+            if finished < cutoff:
+                self._finished_at.pop(job_id, None)
+                self._events.pop(job_id, None)
+                self._seq.pop(job_id, None)
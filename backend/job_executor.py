@@ -0,0 +1,338 @@
+import collections
+import itertools
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+logger = logging.getLogger("trendhijack.job_executor")
+
+DEFAULT_MAX_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+DEFAULT_MAX_QUEUE = int(os.environ.get("JOB_QUEUE_MAX", "32"))
+
+# Scheduling classes, highest first. Interactive requests come from a user
+# waiting on the result; batch is bulk /api/generate_batch work; background is
+# speculative pre-warming that only runs on otherwise idle capacity.
+PRIORITY_CLASSES = ("interactive", "batch", "background")
+DEFAULT_PRIORITY = "interactive"
+
+
+def parse_limits(raw: str) -> dict[str, float]:
+    """Parse ``"name=value,name=value"`` settings; malformed entries are skipped."""
+    limits: dict[str, float] = {}
+    for part in raw.split(","):
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if not name:
+            continue
+        try:
+            limits[name] = float(value)
+        except ValueError:
+            logger.warning("Ignoring malformed limit entry %r", part)
+    return limits
+
+
+# Workers only interactive jobs may use: batch and background together never
+# occupy more than JOB_WORKERS minus this (when there is more than one worker).
+INTERACTIVE_RESERVED_WORKERS = int(os.environ.get("JOB_INTERACTIVE_RESERVED_WORKERS", "1"))
+# Worker threads each class may occupy at once, on top of the shared
+# non-interactive cap above (interactive is only bounded by JOB_WORKERS).
+CLASS_WORKERS = {
+    "batch": max(1, DEFAULT_MAX_WORKERS - 1),
+    "background": max(1, DEFAULT_MAX_WORKERS // 4),
+    **{name: int(value) for name, value in parse_limits(os.environ.get("JOB_CLASS_WORKERS", "")).items()},
+}
+# Queued entries each class may hold, so bulk work cannot fill the queue that
+# interactive requests are admitted through.
+CLASS_QUEUE_MAX = {
+    "batch": max(1, DEFAULT_MAX_QUEUE // 2),
+    "background": max(1, DEFAULT_MAX_QUEUE // 4),
+    **{name: int(value) for name, value in parse_limits(os.environ.get("JOB_CLASS_QUEUE_MAX", "")).items()},
+}
+# Relative share of the executor per tenant (API consumer or brand); 1 when unlisted.
+TENANT_WEIGHTS = parse_limits(os.environ.get("JOB_TENANT_WEIGHTS", ""))
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("job queue is full")
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Entry:
+    job_id: str
+    fn: Callable[[], Any]
+    priority: str
+    tenant: str
+    seq: int
+
+
+class JobExecutor:
+    """Fixed pool of job threads in front of a bounded, prioritised queue.
+
+    ``submit`` raises ``QueueFullError`` instead of growing without limit, so a
+    burst is turned away with a Retry-After hint rather than spawning a thread
+    per request.
+
+    Free workers take the highest priority class that has queued work and is
+    under its worker cap. Within a class every tenant has its own FIFO and
+    tenants are served by weighted fair queuing: each dispatch advances the
+    tenant's virtual time by ``1 / weight`` and the tenant furthest behind goes
+    next, so one tenant's flood of jobs cannot starve another's single job.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        class_workers: dict[str, int] | None = None,
+        class_queue_max: dict[str, int] | None = None,
+        tenant_weights: dict[str, float] | None = None,
+        interactive_reserved: int = INTERACTIVE_RESERVED_WORKERS,
+    ) -> None:
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(1, max_queue)
+        # Always leave at least one worker to the other classes as well.
+        self.interactive_reserved = max(0, min(interactive_reserved, self.max_workers - 1))
+        self.class_workers = {
+            name: max(1, min(self.max_workers, int((class_workers or CLASS_WORKERS).get(name, self.max_workers))))
+            for name in PRIORITY_CLASSES
+        }
+        self.class_queue_max = {
+            name: max(1, min(self.max_queue, int((class_queue_max or CLASS_QUEUE_MAX).get(name, self.max_queue))))
+            for name in PRIORITY_CLASSES
+        }
+        self.tenant_weights = dict(TENANT_WEIGHTS if tenant_weights is None else tenant_weights)
+        self._queues: dict[str, dict[str, collections.deque[_Entry]]] = {name: {} for name in PRIORITY_CLASSES}
+        # Per class: each tenant's virtual time and the class's virtual clock.
+        self._vtime: dict[str, dict[str, float]] = {name: {} for name in PRIORITY_CLASSES}
+        self._clock: dict[str, float] = {name: 0.0 for name in PRIORITY_CLASSES}
+        self._running: dict[str, str] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._durations: collections.deque[float] = collections.deque(maxlen=20)
+
+    def _ensure_threads(self) -> None:
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.max_workers:
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _weight(self, tenant: str) -> float:
+        weight = self.tenant_weights.get(tenant, 1.0)
+        return weight if weight > 0 else 1.0
+
+    def _queued_locked(self, priority: str | None = None) -> int:
+        classes = PRIORITY_CLASSES if priority is None else (priority,)
+        return sum(len(queue) for name in classes for queue in self._queues[name].values())
+
+    def _full_locked(self, priority: str) -> bool:
+        return (
+            self._queued_locked() >= self.max_queue
+            or self._queued_locked(priority) >= self.class_queue_max[priority]
+        )
+
+    def submit(
+        self,
+        job_id: str,
+        fn: Callable[[], Any],
+        priority: str = DEFAULT_PRIORITY,
+        tenant: str = "",
+    ) -> int:
+        """Queue ``fn`` and return its 1-based queue position (0 when a worker is free)."""
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"unknown priority class '{priority}'")
+        with self._cond:
+            if self._full_locked(priority):
+                raise QueueFullError(self._estimate_wait(self._ahead_locked(priority), self._capacity(priority)))
+            self._enqueue_locked(_Entry(job_id, fn, priority, tenant, next(self._seq)))
+            self._ensure_threads()
+            position = self._position_locked(job_id, priority)
+            self._cond.notify_all()
+            return position
+
+    def _enqueue_locked(self, entry: _Entry) -> None:
+        self._queues[entry.priority].setdefault(entry.tenant, collections.deque()).append(entry)
+
+    def _next_tenant(
+        self,
+        queues: dict[str, collections.deque[_Entry]],
+        vtime: dict[str, float],
+        clock: float,
+    ) -> str | None:
+        """The backlogged tenant with the lowest virtual start time; oldest head breaks ties."""
+        backlogged = [tenant for tenant, queue in queues.items() if queue]
+        if not backlogged:
+            return None
+        return min(backlogged, key=lambda tenant: (max(vtime.get(tenant, 0.0), clock), queues[tenant][0].seq))
+
+    def _advance(self, vtime: dict[str, float], clock: float, tenant: str) -> float:
+        """Charge ``tenant`` for one dispatch and return the class's new virtual clock."""
+        start = max(vtime.get(tenant, 0.0), clock)
+        vtime[tenant] = start + 1.0 / self._weight(tenant)
+        return start
+
+    def _running_locked(self, priority: str) -> int:
+        return sum(1 for name in self._running.values() if name == priority)
+
+    def _free_slots_locked(self, priority: str) -> int:
+        """Workers a job of ``priority`` could start on right now, given every cap."""
+        free = min(
+            self.max_workers - len(self._running),
+            self.class_workers[priority] - self._running_locked(priority),
+        )
+        if priority != DEFAULT_PRIORITY:
+            background_running = len(self._running) - self._running_locked(DEFAULT_PRIORITY)
+            free = min(free, self.max_workers - self.interactive_reserved - background_running)
+        return max(0, free)
+
+    def _capacity(self, priority: str) -> int:
+        """Most workers jobs of ``priority`` can ever hold at once."""
+        if priority == DEFAULT_PRIORITY:
+            return self.class_workers[priority]
+        return max(1, min(self.class_workers[priority], self.max_workers - self.interactive_reserved))
+
+    def _take_locked(self) -> _Entry | None:
+        for priority in PRIORITY_CLASSES:
+            if not self._free_slots_locked(priority):
+                continue
+            queues = self._queues[priority]
+            tenant = self._next_tenant(queues, self._vtime[priority], self._clock[priority])
+            if tenant is None:
+                continue
+            entry = queues[tenant].popleft()
+            if not queues[tenant]:
+                del queues[tenant]
+            self._clock[priority] = self._advance(self._vtime[priority], self._clock[priority], tenant)
+            return entry
+        return None
+
+    def _order_locked(self) -> list[str]:
+        """Queued job ids in the order they are expected to start, ignoring worker caps."""
+        order: list[str] = []
+        for priority in PRIORITY_CLASSES:
+            queues = {tenant: collections.deque(queue) for tenant, queue in self._queues[priority].items()}
+            vtime = dict(self._vtime[priority])
+            clock = self._clock[priority]
+            while True:
+                tenant = self._next_tenant(queues, vtime, clock)
+                if tenant is None:
+                    break
+                order.append(queues[tenant].popleft().job_id)
+                clock = self._advance(vtime, clock, tenant)
+        return order
+
+    def queue_position(self, job_id: str) -> int | None:
+        with self._cond:
+            if job_id in self._running:
+                return 0
+            order = self._order_locked()
+            return order.index(job_id) + 1 if job_id in order else None
+
+    def _position_locked(self, job_id: str, priority: str) -> int:
+        order = self._order_locked()
+        if job_id in order:
+            return max(0, order.index(job_id) + 1 - self._free_slots_locked(priority))
+        return 0
+
+    def _ahead_locked(self, priority: str) -> int:
+        """Queued jobs a new ``priority`` job would wait behind: its own class and every higher one."""
+        rank = PRIORITY_CLASSES.index(priority)
+        return sum(self._queued_locked(name) for name in PRIORITY_CLASSES[: rank + 1])
+
+    def _estimate_wait(self, queued: int, workers: int | None = None) -> int:
+        average = sum(self._durations) / len(self._durations) if self._durations else 60.0
+        return max(1, int(average * (queued + 1) / (workers or self.max_workers)))
+
+    def _find_locked(self, job_id: str) -> tuple[str, str, int] | None:
+        for priority, queues in self._queues.items():
+            for tenant, queue in queues.items():
+                for index, entry in enumerate(queue):
+                    if entry.job_id == job_id:
+                        return priority, tenant, index
+        return None
+
+    def _remove_locked(self, job_id: str) -> _Entry | None:
+        found = self._find_locked(job_id)
+        if found is None:
+            return None
+        priority, tenant, index = found
+        queue = self._queues[priority][tenant]
+        entry = queue[index]
+        del queue[index]
+        if not queue:
+            del self._queues[priority][tenant]
+        return entry
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a job that has not started yet; False if it is running or unknown here."""
+        with self._cond:
+            return self._remove_locked(job_id) is not None
+
+    def promote(self, job_id: str, priority: str) -> bool:
+        """Move a queued job up to ``priority``; False if it is not queued or already at/above it."""
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"unknown priority class '{priority}'")
+        with self._cond:
+            found = self._find_locked(job_id)
+            if found is None or PRIORITY_CLASSES.index(found[0]) <= PRIORITY_CLASSES.index(priority):
+                return False
+            entry = self._remove_locked(job_id)
+            entry.priority = priority
+            self._enqueue_locked(entry)
+            self._cond.notify_all()
+            return True
+
+    def is_full(self, priority: str = DEFAULT_PRIORITY) -> bool:
+        with self._cond:
+            return self._full_locked(priority)
+
+    def retry_after(self, priority: str = DEFAULT_PRIORITY) -> int:
+        with self._cond:
+            return self._estimate_wait(self._ahead_locked(priority), self._capacity(priority))
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.max_workers,
+                "running": len(self._running),
+                "queued": self._queued_locked(),
+                "max_queue": self.max_queue,
+                "interactive_reserved": self.interactive_reserved,
+                "classes": {
+                    name: {
+                        "running": self._running_locked(name),
+                        "queued": self._queued_locked(name),
+                        "tenants": len(self._queues[name]),
+                        "max_workers": self._capacity(name),
+                        "max_queue": self.class_queue_max[name],
+                    }
+                    for name in PRIORITY_CLASSES
+                },
+            }
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                entry = self._take_locked()
+                while entry is None:
+                    self._cond.wait()
+                    entry = self._take_locked()
+                self._running[entry.job_id] = entry.priority
+
+            started = time.monotonic()
+            try:
+                entry.fn()
+            except Exception:
+                logger.exception("Job %s crashed in executor", entry.job_id)
+            finally:
+                with self._cond:
+                    self._running.pop(entry.job_id, None)
+                    self._durations.append(time.monotonic() - started)
+                    # A finished job may free its class's slot for a job another worker skipped.
+                    self._cond.notify_all()
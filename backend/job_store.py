@@ -0,0 +1,491 @@
+import abc
+import collections
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from config import DATA_DIR
+
+logger = logging.getLogger("trendhijack.job_store")
+
+JobMutator = Callable[[dict[str, Any]], None]
+
+JOB_STORE_BACKEND = os.environ.get("JOB_STORE", "sqlite").strip().lower()
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = os.environ.get("JOB_STORE_REDIS_PREFIX", "trendhijack")
+# Finished jobs are evicted after JOB_RETENTION_SECONDS, and beyond the newest
+# JOB_MAX_RECORDS; queued/running jobs are never evicted.
+JOB_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", str(24 * 3600)))
+JOB_MAX_RECORDS = int(os.environ.get("JOB_MAX_RECORDS", "500"))
+# Memory store only: write finished results to disk and keep just the summary in RAM.
+JOB_RESULT_SPILL = os.environ.get("JOB_RESULT_SPILL", "0") == "1"
+FINISHED_STATUSES = ("done", "error", "cancelled")
+# Top-level job fields that find_recent can look up (indexed on SQLite).
+LOOKUP_FIELDS = ("fingerprint", "idempotency_key")
+
+
+class JobStore(abc.ABC):
+    """Storage for job records shared by every worker that serves the API.
+
+    ``update`` applies ``mutate`` to the stored job atomically and returns a
+    copy of the new record, or ``None`` when the job does not exist.
+    """
+
+    @abc.abstractmethod
+    def create(self, job: dict[str, Any]) -> None: ...
+
+    @abc.abstractmethod
+    def get(self, job_id: str) -> dict[str, Any] | None: ...
+
+    @abc.abstractmethod
+    def update(self, job_id: str, mutate: JobMutator) -> dict[str, Any] | None: ...
+
+    def version(self, job_id: str) -> int | None:
+        """Current ``version`` of the job without materialising it where the backend allows."""
+        job = self.get(job_id)
+        return int(job.get("version", 0)) if job else None
+
+    @abc.abstractmethod
+    def find_recent(self, field: str, value: str, created_after: str) -> list[dict[str, Any]]:
+        """Jobs whose top-level ``field`` equals ``value`` created after ``created_after``, newest first."""
+
+    @abc.abstractmethod
+    def list_summaries(self) -> list[dict[str, Any]]: ...
+
+    @abc.abstractmethod
+    def clear(self) -> None: ...
+
+    @abc.abstractmethod
+    def evict(self, max_age_seconds: int = JOB_RETENTION_SECONDS, max_records: int = JOB_MAX_RECORDS) -> int:
+        """Drop finished jobs past the TTL or beyond the newest ``max_records``; returns how many."""
+
+    @abc.abstractmethod
+    def stats(self) -> dict[str, Any]:
+        """Record count and approximate bytes held, for /api/metrics."""
+
+
+def _cutoff_iso(max_age_seconds: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)).isoformat()
+
+
+class MemoryJobStore(JobStore):
+    """Process-local store; only correct with a single worker.
+
+    Keeps a running byte estimate per record. With ``spill_dir`` set, a
+    finished job's ``result`` is written there and read back on access, so
+    RAM holds only the small job envelope.
+    """
+
+    def __init__(self, spill_dir: str | None = None) -> None:
+        self._jobs: dict[str, dict[str, Any]] = {}
+        self._sizes: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.spill_dir = spill_dir
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_path(self, job_id: str) -> str:
+        return os.path.join(self.spill_dir or "", f"{job_id}.json")
+
+    def _materialize(self, job: dict[str, Any]) -> dict[str, Any]:
+        job = copy.deepcopy(job)
+        if job.pop("result_spilled", False):
+            try:
+                with open(self._spill_path(job["id"]), encoding="utf-8") as handle:
+                    job["result"] = json.load(handle)
+            except (OSError, ValueError) as exc:
+                logger.warning("Spilled result for job %s is unreadable: %s", job["id"], exc)
+        return job
+
+    def _store(self, job: dict[str, Any]) -> None:
+        """Save the (materialized) ``job``, spilling its result if it has finished."""
+        job = copy.deepcopy(job)
+        job.pop("result_spilled", None)
+        if self.spill_dir and job["status"] in FINISHED_STATUSES and job.get("result") is not None:
+            path = self._spill_path(job["id"])
+            with open(f"{path}.tmp", "w", encoding="utf-8") as handle:
+                json.dump(job["result"], handle)
+            os.replace(f"{path}.tmp", path)
+            job["result"] = None
+            job["result_spilled"] = True
+        self._jobs[job["id"]] = job
+        self._sizes[job["id"]] = len(json.dumps(job, default=str))
+
+    def _drop(self, job_id: str) -> None:
+        job = self._jobs.pop(job_id, None)
+        self._sizes.pop(job_id, None)
+        if job and job.get("result_spilled"):
+            try:
+                os.remove(self._spill_path(job_id))
+            except OSError:
+                pass
+
+    def create(self, job: dict[str, Any]) -> None:
+        with self._lock:
+            self._store(job)
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._materialize(job) if job else None
+
+    def update(self, job_id: str, mutate: JobMutator) -> dict[str, Any] | None:
+        with self._lock:
+            stored = self._jobs.get(job_id)
+            if not stored:
+                return None
+            job = self._materialize(stored)
+            mutate(job)
+            self._store(job)
+            return job
+
+    def version(self, job_id: str) -> int | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return int(job.get("version", 0)) if job else None
+
+    def find_recent(self, field: str, value: str, created_after: str) -> list[dict[str, Any]]:
+        with self._lock:
+            matches = [
+                self._materialize(j)
+                for j in self._jobs.values()
+                if j.get(field) == value and j["created_at"] >= created_after
+            ]
+        return sorted(matches, key=lambda j: j["created_at"], reverse=True)
+
+    def list_summaries(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [
+                {"id": j["id"], "status": j["status"], "created_at": j["created_at"]}
+                for j in self._jobs.values()
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            for job_id in list(self._jobs):
+                self._drop(job_id)
+
+    def evict(self, max_age_seconds: int = JOB_RETENTION_SECONDS, max_records: int = JOB_MAX_RECORDS) -> int:
+        cutoff = _cutoff_iso(max_age_seconds)
+        with self._lock:
+            finished = sorted(
+                (j for j in self._jobs.values() if j["status"] in FINISHED_STATUSES),
+                key=lambda j: j["created_at"],
+                reverse=True,
+            )
+            doomed = [
+                j["id"]
+                for index, j in enumerate(finished)
+                if j["updated_at"] < cutoff or index >= max(0, max_records)
+            ]
+            for job_id in doomed:
+                self._drop(job_id)
+        return len(doomed)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "records": len(self._jobs),
+                "bytes": sum(self._sizes.values()),
+                "spilled": sum(1 for j in self._jobs.values() if j.get("result_spilled")),
+            }
+
+
+class SQLiteJobStore(JobStore):
+    """SQLite in WAL mode: readers never block the writer, safe across gunicorn workers."""
+
+    def __init__(self, path: str | None = None) -> None:
+        self.path = path or os.path.join(DATA_DIR, "jobs.sqlite3")
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                data TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at)")
+        for field in LOOKUP_FIELDS:
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS jobs_{field} ON jobs (json_extract(data, '$.{field}'))"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly where needed.
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, job: dict[str, Any]) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO jobs (id, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+            (job["id"], job["status"], job["created_at"], job["updated_at"], json.dumps(job)),
+        )
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        row = self._conn().execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, job_id: str, mutate: JobMutator) -> dict[str, Any] | None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if not row:
+                conn.execute("COMMIT")
+                return None
+            job = json.loads(row[0])
+            mutate(job)
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, data = ? WHERE id = ?",
+                (job["status"], job["updated_at"], json.dumps(job), job_id),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return job
+
+    def version(self, job_id: str) -> int | None:
+        row = self._conn().execute(
+            "SELECT COALESCE(json_extract(data, '$.version'), 0) FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return int(row[0]) if row else None
+
+    def find_recent(self, field: str, value: str, created_after: str) -> list[dict[str, Any]]:
+        if field not in LOOKUP_FIELDS:
+            raise ValueError(f"unsupported lookup field: {field}")
+        rows = self._conn().execute(
+            f"SELECT data FROM jobs WHERE json_extract(data, '$.{field}') = ? AND created_at >= ? "
+            "ORDER BY created_at DESC",
+            (value, created_after),
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def list_summaries(self) -> list[dict[str, Any]]:
+        rows = self._conn().execute("SELECT id, status, created_at FROM jobs ORDER BY created_at").fetchall()
+        return [{"id": r[0], "status": r[1], "created_at": r[2]} for r in rows]
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM jobs")
+
+    def evict(self, max_age_seconds: int = JOB_RETENTION_SECONDS, max_records: int = JOB_MAX_RECORDS) -> int:
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed = conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*FINISHED_STATUSES, _cutoff_iso(max_age_seconds)),
+            ).rowcount
+            removed += conn.execute(
+                f"DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN ({placeholders}) "
+                "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (*FINISHED_STATUSES, max(0, max_records)),
+            ).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        conn = self._conn()
+        records, data_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM jobs").fetchone()
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "records": int(records),
+            "bytes": int(data_bytes),
+            "file_bytes": int(page_count * page_size),
+        }
+
+
+class RedisJobStore(JobStore):
+    """Redis (or any client speaking the same commands) for multi-host deployments.
+
+    Pass ``client`` to use a stand-in such as fakeredis; otherwise the ``redis``
+    package is imported lazily so the other backends never load it.
+    """
+
+    def __init__(self, client: Any = None, url: str = REDIS_URL, prefix: str = REDIS_PREFIX) -> None:
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    @property
+    def _index_key(self) -> str:
+        return f"{self.prefix}:jobs"
+
+    def _lookup_key(self, field: str, value: str) -> str:
+        return f"{self.prefix}:{field}:{value}"
+
+    def create(self, job: dict[str, Any]) -> None:
+        pipe = self.client.pipeline()
+        pipe.set(self._key(job["id"]), json.dumps(job))
+        pipe.rpush(self._index_key, job["id"])
+        for field in LOOKUP_FIELDS:
+            if job.get(field):
+                pipe.lpush(self._lookup_key(field, job[field]), job["id"])
+                pipe.ltrim(self._lookup_key(field, job[field]), 0, 19)
+        pipe.execute()
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        raw = self.client.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    def update(self, job_id: str, mutate: JobMutator) -> dict[str, Any] | None:
+        key = self._key(job_id)
+        while True:
+            pipe = self.client.pipeline()
+            try:
+                pipe.watch(key)
+                raw = pipe.get(key)
+                if not raw:
+                    pipe.reset()
+                    return None
+                job = json.loads(raw)
+                mutate(job)
+                pipe.multi()
+                pipe.set(key, json.dumps(job))
+                pipe.execute()
+                return job
+            except Exception as exc:
+                if type(exc).__name__ != "WatchError":
+                    raise
+                # Another worker wrote the job first; retry on the fresh value.
+                continue
+            finally:
+                pipe.reset()
+
+    def find_recent(self, field: str, value: str, created_after: str) -> list[dict[str, Any]]:
+        matches = []
+        for raw_id in self.client.lrange(self._lookup_key(field, value), 0, -1):
+            job = self.get(raw_id.decode("utf-8") if isinstance(raw_id, bytes) else str(raw_id))
+            if job and job.get(field) == value and job["created_at"] >= created_after:
+                matches.append(job)
+        return sorted(matches, key=lambda j: j["created_at"], reverse=True)
+
+    def list_summaries(self) -> list[dict[str, Any]]:
+        summaries = []
+        for raw_id in self.client.lrange(self._index_key, 0, -1):
+            job_id = raw_id.decode("utf-8") if isinstance(raw_id, bytes) else str(raw_id)
+            job = self.get(job_id)
+            if job:
+                summaries.append({"id": job["id"], "status": job["status"], "created_at": job["created_at"]})
+        return summaries
+
+    def clear(self) -> None:
+        for raw_id in self.client.lrange(self._index_key, 0, -1):
+            job_id = raw_id.decode("utf-8") if isinstance(raw_id, bytes) else str(raw_id)
+            job = self.get(job_id)
+            pipe = self.client.pipeline()
+            pipe.delete(self._key(job_id))
+            for field in LOOKUP_FIELDS:
+                if job and job.get(field):
+                    pipe.delete(self._lookup_key(field, job[field]))
+            pipe.execute()
+        self.client.delete(self._index_key)
+
+    def evict(self, max_age_seconds: int = JOB_RETENTION_SECONDS, max_records: int = JOB_MAX_RECORDS) -> int:
+        cutoff = _cutoff_iso(max_age_seconds)
+        finished_seen = 0
+        removed = 0
+        # The index is in creation order, so walk it newest first for the count cap.
+        for raw_id in reversed(self.client.lrange(self._index_key, 0, -1)):
+            job_id = raw_id.decode("utf-8") if isinstance(raw_id, bytes) else str(raw_id)
+            job = self.get(job_id)
+            if job is None:
+                self.client.lrem(self._index_key, 0, raw_id)
+                continue
+            if job["status"] not in FINISHED_STATUSES:
+                continue
+            finished_seen += 1
+            if job["updated_at"] < cutoff or finished_seen > max(0, max_records):
+                pipe = self.client.pipeline()
+                pipe.delete(self._key(job_id))
+                pipe.lrem(self._index_key, 0, raw_id)
+                # Lookup lists are per value, so evicted ids would otherwise linger there.
+                for field in LOOKUP_FIELDS:
+                    if job.get(field):
+                        pipe.lrem(self._lookup_key(field, job[field]), 0, job_id)
+                pipe.execute()
+                removed += 1
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        ids = self.client.lrange(self._index_key, 0, -1)
+        data_bytes = 0
+        for raw_id in ids:
+            job_id = raw_id.decode("utf-8") if isinstance(raw_id, bytes) else str(raw_id)
+            data_bytes += int(self.client.strlen(self._key(job_id)) or 0)
+        return {"backend": "redis", "records": len(ids), "bytes": data_bytes}
+
+
+class SerializedJobCache:
+    """Small LRU of job JSON bodies keyed by ``(job_id, version)``.
+
+    Versions only move forward, so an entry never goes stale; a poll that
+    finds the job unchanged is answered from these bytes without touching
+    ``json.dumps`` again.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._entries: collections.OrderedDict[tuple[str, int], tuple[str, bytes]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str, version: int) -> tuple[str, bytes] | None:
+        with self._lock:
+            entry = self._entries.get((job_id, version))
+            if entry is not None:
+                self._entries.move_to_end((job_id, version))
+            return entry
+
+    def put(self, job_id: str, version: int, status: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[(job_id, version)] = (status, body)
+            self._entries.move_to_end((job_id, version))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": sum(len(body) for _, body in self._entries.values()),
+            }
+
+
+def create_job_store(backend: str = JOB_STORE_BACKEND) -> JobStore:
+    if backend == "memory":
+        return MemoryJobStore(spill_dir=os.path.join(DATA_DIR, "job_results") if JOB_RESULT_SPILL else None)
+    if backend == "redis":
+        return RedisJobStore()
+    if backend != "sqlite":
+        logger.warning("Unknown JOB_STORE '%s', using sqlite", backend)
+    return SQLiteJobStore()
@@ -1,11 +1,30 @@
+import asyncio
+import functools
 import json
 import os
-import time
 from typing import Any
 
 import requests
 
-API_BASE_URL = "https://api.kie.ai/api/v1"
+from cancellation import CancellationToken, Deadline, check_cancelled, sleep_or_cancel, timeout_within
+from generation_cache import make_cache_key
+from kling_task_log import RESUME_MAX_AGE_SECONDS
+
+API_BASE_URL = f"{os.environ.get('KLING_BASE_URL', 'https://api.kie.ai').rstrip('/')}/api/v1"
+# Public URL of this service's /api/kling/callback route. When set, Kie pushes
+# task completion to us and polling only runs as a slow safety net.
+CALLBACK_URL = os.environ.get("KLING_CALLBACK_URL", "").strip()
+CALLBACK_TOKEN = os.environ.get("KLING_CALLBACK_TOKEN", "").strip()
+# One keep-alive connection pool for every createTask/recordInfo call in the process.
+_HTTP = requests.Session()
+
+
+class KlingTimeout(Exception):
+    """The caller stopped waiting while the task may still be rendering."""
+
+
+class KlingTransportError(Exception):
+    """recordInfo could not be read (network, HTTP or JSON error); the task itself may be fine."""
 
 
 def _get_api_key() -> str:
@@ -22,6 +41,15 @@ def _headers() -> dict[str, str]:
     }
 
 
+def _callback_url() -> str | None:
+    if not CALLBACK_URL:
+        return None
+    if not CALLBACK_TOKEN:
+        return CALLBACK_URL
+    separator = "&" if "?" in CALLBACK_URL else "?"
+    return f"{CALLBACK_URL}{separator}token={CALLBACK_TOKEN}"
+
+
 def _safe_json(response: requests.Response) -> dict[str, Any]:
     try:
         return response.json()
@@ -35,6 +63,8 @@ def generate_video(
     mode: str = "std",
     multi_shots: bool = False,
     multi_prompt: list | None = None,
+    callback_url: str | None = None,
+    timeout: float = 60,
 ) -> str:
     print("Submitting Kling task...")
 
@@ -53,13 +83,15 @@ def generate_video(
         "model": "kling-3.0/video",
         "input": input_payload,
     }
+    if callback_url:
+        payload["callBackUrl"] = callback_url
 
     try:
-        response = requests.post(
+        response = _HTTP.post(
             f"{API_BASE_URL}/jobs/createTask",
             headers=_headers(),
             json=payload,
-            timeout=60,
+            timeout=timeout,
         )
     except requests.RequestException as exc:
         raise Exception(f"Kling createTask request failed: {exc}") from exc
@@ -80,61 +112,144 @@ def generate_video(
     return str(task_id)
 
 
-def poll_video(task_id: str, interval: int = 15, max_wait: int = 600) -> str:
+def fetch_task_record(task_id: str) -> dict[str, Any]:
+    if not task_id:
+        raise Exception("task_id is required")
+
+    try:
+        response = _HTTP.get(
+            f"{API_BASE_URL}/jobs/recordInfo",
+            headers=_headers(),
+            params={"taskId": task_id},
+            timeout=60,
+        )
+    except requests.RequestException as exc:
+        raise KlingTransportError(f"Kling recordInfo request failed: {exc}") from exc
+
+    try:
+        result = _safe_json(response)
+    except Exception as exc:
+        raise KlingTransportError(f"Kling recordInfo HTTP {response.status_code}: {exc}") from exc
+    if response.status_code != 200:
+        raise KlingTransportError(f"Kling recordInfo HTTP {response.status_code}: {result}")
+
+    if result.get("code") != 200:
+        raise KlingTransportError(f"Kling recordInfo failed: {result}")
+
+    return result.get("data", {}) if isinstance(result.get("data"), dict) else {}
+
+
+def parse_task_record(data: dict[str, Any]) -> tuple[str, str | None]:
+    """Return (state, video_url) for a recordInfo payload; raise when the task failed."""
+    state = str(data.get("state", "")).lower()
+
+    if state == "success":
+        result_json = data.get("resultJson", "{}")
+        try:
+            parsed_result = json.loads(result_json) if isinstance(result_json, str) else result_json
+        except Exception as exc:
+            raise Exception(f"Failed to parse resultJson: {exc} | raw={result_json}") from exc
+
+        if not isinstance(parsed_result, dict):
+            raise Exception(f"Unexpected resultJson format: {parsed_result}")
+
+        urls = parsed_result.get("resultUrls", [])
+        if not urls or not isinstance(urls, list):
+            raise Exception(f"No resultUrls found in resultJson: {parsed_result}")
+
+        return state, str(urls[0])
+
+    if state == "fail":
+        raise Exception(data.get("failMsg") or "Kling generation failed")
+
+    return state, None
+
+
+def poll_video(
+    task_id: str,
+    interval: int = 15,
+    max_wait: int = 600,
+    cancel_token: CancellationToken | None = None,
+) -> str:
     if not task_id:
         raise Exception("task_id is required")
 
     elapsed = 0
     while elapsed <= max_wait:
+        check_cancelled(cancel_token)
         try:
-            response = requests.get(
-                f"{API_BASE_URL}/jobs/recordInfo",
-                headers=_headers(),
-                params={"taskId": task_id},
-                timeout=60,
-            )
-        except requests.RequestException as exc:
-            raise Exception(f"Kling recordInfo request failed: {exc}") from exc
+            state, video_url = parse_task_record(fetch_task_record(task_id))
+        except KlingTransportError as exc:
+            # A failed status read says nothing about the render; try again next round.
+            state, video_url = f"recordInfo unavailable ({exc})", None
+        print(f"[{elapsed}s] {state or 'unknown'}")
 
-        result = _safe_json(response)
-        if response.status_code != 200:
-            raise Exception(f"Kling recordInfo HTTP {response.status_code}: {result}")
+        if video_url:
+            return video_url
 
-        if result.get("code") != 200:
-            raise Exception(f"Kling recordInfo failed: {result}")
+        sleep_or_cancel(cancel_token, interval)
+        elapsed += interval
 
-        data = result.get("data", {}) if isinstance(result.get("data"), dict) else {}
-        state = str(data.get("state", "")).lower()
-        print(f"[{elapsed}s] {state or 'unknown'}")
+    raise KlingTimeout(f"Timed out waiting for Kling task {task_id} after {max_wait}s")
 
-        if state == "waiting":
-            time.sleep(interval)
-            elapsed += interval
-            continue
 
-        if state == "success":
-            result_json = data.get("resultJson", "{}")
-            try:
-                parsed_result = json.loads(result_json) if isinstance(result_json, str) else result_json
-            except Exception as exc:
-                raise Exception(f"Failed to parse resultJson: {exc} | raw={result_json}") from exc
+async def submit_video_async(prompt: str, **kwargs) -> str:
+    # createTask is a single short HTTP call; run it off the loop thread so
+    # other generations keep progressing while it is in flight.
+    return await asyncio.to_thread(generate_video, prompt, **kwargs)
 
-            if not isinstance(parsed_result, dict):
-                raise Exception(f"Unexpected resultJson format: {parsed_result}")
 
-            urls = parsed_result.get("resultUrls", [])
-            if not urls or not isinstance(urls, list):
-                raise Exception(f"No resultUrls found in resultJson: {parsed_result}")
+async def poll_video_async(
+    task_id: str,
+    initial_interval: float = 2.0,
+    max_interval: float = 15.0,
+    backoff: float = 1.5,
+    max_wait: float = 600.0,
+    cancel_event: asyncio.Event | None = None,
+) -> str:
+    """Await a Kling task without blocking the event loop.
 
-            return str(urls[0])
+    Polls start at ``initial_interval`` seconds and grow by ``backoff`` up to
+    ``max_interval``. Cancelling the awaiting task, or setting ``cancel_event``,
+    stops polling immediately.
+    """
+    if not task_id:
+        raise Exception("task_id is required")
 
-        if state == "fail":
-            raise Exception(data.get("failMsg") or "Kling generation failed")
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    interval = max(0.1, float(initial_interval))
 
-        time.sleep(interval)
-        elapsed += interval
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            raise asyncio.CancelledError(f"Kling task {task_id} polling cancelled")
 
-    raise Exception(f"Timed out waiting for Kling task {task_id} after {max_wait}s")
+        try:
+            data = await asyncio.to_thread(fetch_task_record, task_id)
+        except KlingTransportError as exc:
+            # A failed status read says nothing about the render; back off and retry.
+            print(f"recordInfo unavailable for {task_id}: {exc}")
+            data = {}
+        state, video_url = parse_task_record(data)
+        elapsed = loop.time() - started
+        print(f"[{elapsed:.0f}s] {state or 'unknown'}")
+
+        if video_url:
+            return video_url
+
+        remaining = max_wait - elapsed
+        if remaining <= 0:
+            raise KlingTimeout(f"Timed out waiting for Kling task {task_id} after {max_wait:.0f}s")
+
+        delay = min(interval, remaining)
+        if cancel_event is None:
+            await asyncio.sleep(delay)
+        else:
+            try:
+                await asyncio.wait_for(cancel_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+        interval = min(max_interval, interval * backoff)
 
 
 def generate_and_poll(prompt: str, **kwargs) -> str:
@@ -176,16 +291,125 @@ def generate_multi_shot(scenes: list[dict], duration_each: int = 3) -> str:
     )
 
 
-class KlingAgent:
-    def __init__(self) -> None:
-        pass
+def record_task_outcome(
+    task_id: str,
+    video_url: str | None = None,
+    error: str | None = None,
+    task_log: Any = None,
+    cache: Any = None,
+    cache_key: str | None = None,
+    prompt: str = "",
+) -> None:
+    """Write a finished task to the task log and, on success, the generation cache."""
+    if task_log is not None:
+        task_log.record_finished(task_id, video_url=video_url, error=error)
+    if video_url and cache is not None and cache_key:
+        cache.put(cache_key, task_id, video_url, prompt=prompt)
+
 
-    async def generate_video(self, prompt: str, style: str = "std") -> dict[str, str]:
+class KlingAgent:
+    def __init__(self, tracker: Any = None, cache: Any = None, task_log: Any = None) -> None:
+        # Optional shared KlingTaskTracker; without one each call polls on its own.
+        self.tracker = tracker
+        # Optional GenerationCache keyed by the normalized request.
+        self.cache = cache
+        # Optional KlingTaskLog so in-flight tasks survive a restart.
+        self.task_log = task_log
+
+    async def generate_video(
+        self,
+        prompt: str,
+        style: str = "std",
+        cancel_event: asyncio.Event | None = None,
+        force_regenerate: bool = False,
+        job_context: dict[str, Any] | None = None,
+        deadline: Deadline | None = None,
+    ) -> dict[str, Any]:
+        """Submit (or reuse) a generation and wait for it, for at most what ``deadline`` leaves."""
         mode = style if style in {"std", "pro"} else "std"
-        task_id = generate_video(prompt=prompt, mode=mode)
-        video_url = poll_video(task_id)
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_cache_key(prompt, mode=mode, duration="5", aspect_ratio="9:16")
+            # Cache and task-log writes are SQLite; keep them off the shared loop.
+            if force_regenerate:
+                # The caller rejected the cached video; stop handing it to other jobs too.
+                await asyncio.to_thread(self.cache.invalidate, cache_key)
+                cached = None
+            else:
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached:
+                print(f"♻️ Reusing cached Kling generation {cached.get('task_id')}")
+                return {
+                    "task_id": cached.get("task_id"),
+                    "status": "success",
+                    "video_url": cached["video_url"],
+                    "cached": True,
+                }
+
+        if deadline is not None and deadline.expired:
+            raise Exception("No time left in the job budget to submit a Kling task")
+        task_id = await submit_video_async(
+            prompt=prompt,
+            mode=mode,
+            callback_url=_callback_url(),
+            timeout=timeout_within(deadline, 60),
+        )
+        context = dict(job_context or {})
+        if self.task_log is not None:
+            await asyncio.to_thread(
+                self.task_log.record_submitted,
+                task_id,
+                job_id=context.pop("job_id", None),
+                prompt=prompt,
+                context={**context, "mode": mode, "cache_key": cache_key},
+            )
+
+        max_wait = timeout_within(deadline, 600.0)
+        try:
+            if self.tracker is not None:
+                video_url = await self.tracker.wait(task_id, max_wait=max_wait, cancel_event=cancel_event)
+            else:
+                video_url = await poll_video_async(task_id, max_wait=max_wait, cancel_event=cancel_event)
+        except (asyncio.CancelledError, KlingTimeout):
+            # The render is paid for and may still finish; keep tracking it so the
+            # video reaches the task log and the cache, or record it as abandoned.
+            if self.tracker is not None:
+                self.tracker.adopt(
+                    task_id,
+                    max_wait=RESUME_MAX_AGE_SECONDS,
+                    on_done=functools.partial(
+                        record_task_outcome,
+                        task_id,
+                        task_log=self.task_log,
+                        cache=self.cache,
+                        cache_key=cache_key,
+                        prompt=prompt,
+                    ),
+                )
+            elif self.task_log is not None:
+                await asyncio.to_thread(
+                    self.task_log.record_finished, task_id, error="abandoned: job stopped waiting"
+                )
+            raise
+        except Exception as exc:
+            if self.task_log is not None:
+                await asyncio.to_thread(self.task_log.record_finished, task_id, error=str(exc) or type(exc).__name__)
+            raise
+
+        await asyncio.to_thread(
+            record_task_outcome,
+            task_id,
+            video_url=video_url,
+            task_log=self.task_log,
+            cache=self.cache,
+            cache_key=cache_key,
+            prompt=prompt,
+        )
+
         return {
             "task_id": task_id,
             "status": "success",
             "video_url": video_url,
+            "cached": False,
         }
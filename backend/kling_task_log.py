@@ -0,0 +1,175 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any
+
+from config import DATA_DIR
+
+# Tasks older than this are not worth re-attaching to; Kie will have expired them.
+RESUME_MAX_AGE_SECONDS = int(os.environ.get("KLING_RESUME_MAX_AGE_SECONDS", str(2 * 3600)))
+
+
+# A pending task's owner must renew its lease this often or the task counts as orphaned.
+OWNER_LEASE_SECONDS = float(os.environ.get("KLING_OWNER_LEASE_SECONDS", "90"))
+
+# Restarted containers keep their hostname and reuse pids, so the owner key
+# carries a per-boot nonce that a new process can never share with a dead one.
+_BOOT_ID = uuid.uuid4().hex[:12]
+
+
+def process_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{_BOOT_ID}"
+
+
+class KlingTaskLog:
+    """Durable record of submitted Kling tasks and the job that owns each one.
+
+    A task is written as ``pending`` right after createTask succeeds and
+    flipped to ``success``/``error`` once its outcome is known, so a restarted
+    process can find paid generations that were still rendering and resume
+    waiting on them instead of submitting them again. ``owner`` records the
+    process waiting on a task and ``lease_until`` how long that claim holds;
+    owners renew their leases while alive, so sibling workers only adopt tasks
+    whose lease ran out.
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        self.path = path or os.path.join(DATA_DIR, "kling_tasks.sqlite3")
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS kling_tasks (
+                    task_id TEXT PRIMARY KEY,
+                    job_id TEXT,
+                    prompt TEXT,
+                    context TEXT,
+                    status TEXT NOT NULL,
+                    video_url TEXT,
+                    error TEXT,
+                    submitted_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS kling_tasks_status ON kling_tasks (status)")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(kling_tasks)")}
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE kling_tasks ADD COLUMN owner TEXT")
+            if "lease_until" not in columns:
+                conn.execute("ALTER TABLE kling_tasks ADD COLUMN lease_until REAL")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def record_submitted(
+        self,
+        task_id: str,
+        job_id: str | None = None,
+        prompt: str = "",
+        context: dict[str, Any] | None = None,
+    ) -> None:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO kling_tasks "
+                "(task_id, job_id, prompt, context, status, video_url, error, submitted_at, updated_at, owner, lease_until) "
+                "VALUES (?, ?, ?, ?, 'pending', NULL, NULL, ?, ?, ?, ?)",
+                (
+                    task_id,
+                    job_id,
+                    prompt[:4000],
+                    json.dumps(context or {}),
+                    now,
+                    now,
+                    process_owner(),
+                    now + OWNER_LEASE_SECONDS,
+                ),
+            )
+
+    def claim(self, task_id: str, previous_owner: str | None) -> bool:
+        """Atomically take over an orphaned task from ``previous_owner``; False if someone else did."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE kling_tasks SET owner = ?, lease_until = ?, updated_at = ? "
+                "WHERE task_id = ? AND status = 'pending' AND owner IS ? "
+                "AND (lease_until IS NULL OR lease_until < ?)",
+                (process_owner(), now + OWNER_LEASE_SECONDS, now, task_id, previous_owner, now),
+            )
+            return cursor.rowcount == 1
+
+    def renew_leases(self) -> int:
+        """Extend the lease on every pending task this process owns."""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE kling_tasks SET lease_until = ? WHERE owner = ? AND status = 'pending'",
+                (time.time() + OWNER_LEASE_SECONDS, process_owner()),
+            )
+            return cursor.rowcount
+
+    @staticmethod
+    def is_orphaned(task: dict[str, Any]) -> bool:
+        """True when no live process holds ``task``: its owner let the lease lapse."""
+        if task.get("owner") == process_owner():
+            return False
+        return (task.get("lease_until") or 0.0) < time.time()
+
+    def record_finished(self, task_id: str, video_url: str | None = None, error: str | None = None) -> None:
+        status = "success" if video_url else "error"
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE kling_tasks SET status = ?, video_url = ?, error = ?, updated_at = ? WHERE task_id = ?",
+                (status, video_url, (error or "")[:1000] or None, time.time(), task_id),
+            )
+
+    def get(self, task_id: str) -> dict[str, Any] | None:
+        with self._lock, self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM kling_tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def finished_for_job(self, job_id: str) -> list[dict[str, Any]]:
+        with self._lock, self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT * FROM kling_tasks WHERE job_id = ? AND status != 'pending' ORDER BY submitted_at",
+                (job_id,),
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def outstanding(self, max_age_seconds: int = RESUME_MAX_AGE_SECONDS) -> list[dict[str, Any]]:
+        cutoff = time.time() - max_age_seconds
+        with self._lock, self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT * FROM kling_tasks WHERE status = 'pending' AND submitted_at >= ? ORDER BY submitted_at",
+                (cutoff,),
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> dict[str, Any]:
+        item = dict(row)
+        try:
+            item["context"] = json.loads(item.get("context") or "{}")
+        except Exception:
+            item["context"] = {}
+        return item
+
+
+_TASK_LOG: KlingTaskLog | None = None
+_TASK_LOG_LOCK = threading.Lock()
+
+
+def get_task_log() -> KlingTaskLog:
+    global _TASK_LOG
+    with _TASK_LOG_LOCK:
+        if _TASK_LOG is None:
+            _TASK_LOG = KlingTaskLog()
+        return _TASK_LOG
@@ -0,0 +1,386 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from kling_agent import CALLBACK_URL, KlingTimeout, fetch_task_record, parse_task_record
+from kling_task_log import get_task_log
+
+logger = logging.getLogger("trendhijack.kling_tracker")
+
+FetchRecord = Callable[[str], dict[str, Any]]
+OnDone = Callable[..., None]
+
+DEFAULT_MAX_POLLS_PER_SECOND = float(os.environ.get("KLING_POLL_MAX_RPS", "2"))
+DEFAULT_TYPICAL_SECONDS = float(os.environ.get("KLING_TYPICAL_SECONDS", "120"))
+# Safety-net poll interval used when Kie is expected to call us back.
+DEFAULT_CALLBACK_SAFETY_INTERVAL = float(os.environ.get("KLING_CALLBACK_SAFETY_INTERVAL", "90"))
+
+
+@dataclass
+class TrackedTask:
+    task_id: str
+    future: Future
+    registered_at: float
+    max_wait: float
+    next_poll_at: float
+    waiters: int = 1
+    polls: int = 0
+    last_state: str = ""
+    last_remote_poll_at: float = 0.0
+    transport_errors: int = 0
+    meta: dict[str, Any] = field(default_factory=dict)
+
+
+class KlingTaskTracker:
+    """Process-wide poller for every outstanding Kling task.
+
+    Jobs register a task id and await a shared future. A single background
+    thread polls due tasks one at a time, never faster than
+    ``max_polls_per_second`` in total, so recordInfo traffic stays flat no
+    matter how many generations are waiting. Per-task intervals adapt to the
+    task age relative to the observed typical completion time: sparse while
+    the render cannot be done yet, dense around the expected finish, then
+    backing off for stragglers. A recordInfo read that fails is retried with
+    backoff; only Kie's own ``fail`` state or a malformed result ends a task
+    before ``max_wait``.
+
+    In callback mode Kie notifies ``/api/kling/callback``, which calls
+    ``resolve_record``; polling then only runs every
+    ``callback_safety_interval`` seconds in case a callback is lost. With a
+    ``task_log`` the tracker also picks up outcomes another worker recorded
+    (e.g. a callback that landed on a sibling gunicorn worker) without any
+    Kie request.
+    """
+
+    def __init__(
+        self,
+        fetch_record: FetchRecord = fetch_task_record,
+        max_polls_per_second: float = DEFAULT_MAX_POLLS_PER_SECOND,
+        typical_seconds: float = DEFAULT_TYPICAL_SECONDS,
+        min_interval: float = 3.0,
+        max_interval: float = 30.0,
+        callback_mode: bool = bool(CALLBACK_URL),
+        callback_safety_interval: float = DEFAULT_CALLBACK_SAFETY_INTERVAL,
+        task_log: Any = None,
+    ) -> None:
+        self.fetch_record = fetch_record
+        self.task_log = task_log
+        self.min_gap = 1.0 / max(0.01, max_polls_per_second)
+        self.typical_seconds = max(1.0, typical_seconds)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.callback_mode = callback_mode
+        self.callback_safety_interval = callback_safety_interval
+        self._tasks: dict[str, TrackedTask] = {}
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+        self._total_polls = 0
+        self._last_remote_poll = 0.0
+
+    # -- scheduling -----------------------------------------------------
+
+    def _interval_for(self, age: float) -> float:
+        if self.callback_mode:
+            # Cheap local task-log checks in between the rare remote safety polls.
+            return self.min_interval if self.task_log is not None else self.callback_safety_interval
+        ratio = age / self.typical_seconds
+        if ratio < 0.5:
+            interval = self.typical_seconds * 0.25
+        elif ratio < 1.5:
+            interval = self.min_interval
+        else:
+            interval = self.min_interval * ratio
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def _observe_completion(self, duration: float) -> None:
+        # Exponential moving average so the schedule tracks Kie's current speed.
+        self.typical_seconds = max(1.0, 0.8 * self.typical_seconds + 0.2 * duration)
+
+    # -- public API -----------------------------------------------------
+
+    def register(self, task_id: str, max_wait: float = 600.0, **meta: Any) -> Future:
+        if not task_id:
+            raise Exception("task_id is required")
+
+        with self._cond:
+            tracked = self._tasks.get(task_id)
+            if tracked is not None and not tracked.future.done():
+                tracked.waiters += 1
+                tracked.max_wait = max(tracked.max_wait, max_wait)
+                tracked.meta.update(meta)
+                return tracked.future
+
+            now = time.monotonic()
+            tracked = TrackedTask(
+                task_id=task_id,
+                future=Future(),
+                registered_at=now,
+                max_wait=max_wait,
+                next_poll_at=now + self._interval_for(0.0),
+                meta=dict(meta),
+            )
+            self._tasks[task_id] = tracked
+            self._ensure_thread()
+            self._cond.notify_all()
+            return tracked.future
+
+    def release(self, task_id: str) -> None:
+        with self._cond:
+            tracked = self._tasks.get(task_id)
+            if tracked is None:
+                return
+            tracked.waiters -= 1
+            if tracked.waiters <= 0:
+                self._tasks.pop(task_id, None)
+                if not tracked.future.done():
+                    tracked.future.cancel()
+
+    def adopt(self, task_id: str, max_wait: float, on_done: OnDone) -> None:
+        """Keep polling a task no job waits on any more and hand its outcome to ``on_done``.
+
+        The adoption counts as a waiter that is never released, so the task
+        stays tracked until it finishes or ``max_wait`` runs out, and
+        ``on_done(video_url=..., error=...)`` runs on the resolving thread.
+        """
+        future = self.register(task_id, max_wait=max_wait, adopted=True)
+
+        def _finish(done: Future) -> None:
+            if done.cancelled():
+                return
+            exc = done.exception()
+            try:
+                if exc is None:
+                    on_done(video_url=done.result())
+                else:
+                    on_done(error=str(exc) or type(exc).__name__)
+            except Exception as callback_exc:
+                logger.warning("Recording adopted Kling task %s failed: %s", task_id, callback_exc)
+
+        future.add_done_callback(_finish)
+        logger.info("Kling task %s adopted after its job stopped waiting", task_id)
+
+    async def wait(
+        self,
+        task_id: str,
+        max_wait: float = 600.0,
+        cancel_event: asyncio.Event | None = None,
+    ) -> str:
+        future = self.register(task_id, max_wait=max_wait)
+        # Shield so one cancelled waiter does not cancel the shared future.
+        waiter = asyncio.shield(asyncio.wrap_future(future))
+        try:
+            if cancel_event is None:
+                return await waiter
+
+            cancel_waiter = asyncio.ensure_future(cancel_event.wait())
+            try:
+                done, _ = await asyncio.wait(
+                    {waiter, cancel_waiter},
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+            finally:
+                cancel_waiter.cancel()
+            if waiter in done:
+                return waiter.result()
+            raise asyncio.CancelledError(f"Kling task {task_id} wait cancelled")
+        finally:
+            if not future.done():
+                self.release(task_id)
+
+    def resolve(
+        self,
+        task_id: str,
+        video_url: str | None = None,
+        error: str | None = None,
+        timed_out: bool = False,
+    ) -> bool:
+        with self._cond:
+            tracked = self._tasks.pop(task_id, None)
+        if tracked is None or tracked.future.done():
+            return False
+
+        if video_url:
+            self._observe_completion(time.monotonic() - tracked.registered_at)
+            tracked.future.set_result(video_url)
+        else:
+            failure = KlingTimeout if timed_out else Exception
+            tracked.future.set_exception(failure(error or "Kling generation failed"))
+        return True
+
+    def resolve_record(self, data: dict[str, Any]) -> bool:
+        """Resolve a task from a recordInfo-shaped payload, e.g. a Kie callback body."""
+        task_id = str(data.get("taskId") or data.get("task_id") or "")
+        if not task_id:
+            return False
+
+        try:
+            state, video_url = parse_task_record(data)
+        except Exception as exc:
+            return self.resolve(task_id, error=str(exc))
+
+        if video_url:
+            return self.resolve(task_id, video_url=video_url)
+
+        logger.info("Kling callback for %s reported non-final state '%s'", task_id, state)
+        return False
+
+    def outstanding(self) -> list[dict[str, Any]]:
+        now = time.monotonic()
+        with self._cond:
+            return [
+                {
+                    "task_id": t.task_id,
+                    "age_seconds": round(now - t.registered_at, 1),
+                    "polls": t.polls,
+                    "last_state": t.last_state,
+                    "waiters": t.waiters,
+                    "adopted": bool(t.meta.get("adopted")),
+                }
+                for t in self._tasks.values()
+            ]
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            outstanding = len(self._tasks)
+        return {
+            "outstanding": outstanding,
+            "total_polls": self._total_polls,
+            "typical_seconds": round(self.typical_seconds, 1),
+            "max_polls_per_second": round(1.0 / self.min_gap, 2),
+            "callback_mode": self.callback_mode,
+        }
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    # -- poller thread --------------------------------------------------
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="kling-tracker", daemon=True)
+        self._thread.start()
+
+    def _next_due(self) -> tuple[TrackedTask | None, float]:
+        if not self._tasks:
+            return None, 60.0
+        tracked = min(self._tasks.values(), key=lambda t: t.next_poll_at)
+        return tracked, max(0.0, tracked.next_poll_at - time.monotonic())
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                tracked, delay = self._next_due()
+                if tracked is None or delay > 0:
+                    self._cond.wait(timeout=delay)
+                    continue
+
+            self._poll_one(tracked)
+
+    def _logged_outcome(self, task_id: str) -> bool:
+        if self.task_log is None:
+            return False
+        try:
+            record = self.task_log.get(task_id)
+        except Exception as exc:
+            logger.warning("Kling task log lookup failed for %s: %s", task_id, exc)
+            return False
+        if not record or record.get("status") == "pending":
+            return False
+        if record.get("status") == "success" and record.get("video_url"):
+            return self.resolve(task_id, video_url=record["video_url"])
+        return self.resolve(task_id, error=record.get("error") or "Kling generation failed")
+
+    def _time_out(self, tracked: TrackedTask) -> None:
+        self.resolve(
+            tracked.task_id,
+            error=f"Timed out waiting for Kling task {tracked.task_id} after {tracked.max_wait:.0f}s",
+            timed_out=True,
+        )
+
+    def _poll_one(self, tracked: TrackedTask) -> None:
+        task_id = tracked.task_id
+        now = time.monotonic()
+        age = now - tracked.registered_at
+
+        if self._logged_outcome(task_id):
+            return
+
+        remote_due = not self.callback_mode or (
+            now - (tracked.last_remote_poll_at or tracked.registered_at) >= self.callback_safety_interval
+        )
+        if not remote_due:
+            if age >= tracked.max_wait:
+                self._time_out(tracked)
+                return
+            with self._cond:
+                tracked.next_poll_at = now + self._interval_for(age)
+            return
+
+        # Global rate cap applies to Kie requests only, not local task-log checks.
+        gap = self.min_gap - (time.monotonic() - self._last_remote_poll)
+        if gap > 0:
+            time.sleep(gap)
+        self._last_remote_poll = time.monotonic()
+        tracked.last_remote_poll_at = self._last_remote_poll
+        self._total_polls += 1
+        tracked.polls += 1
+
+        try:
+            record = self.fetch_record(task_id)
+        except Exception as exc:
+            # Kie being unreachable says nothing about the render; only its own
+            # fail state ends the task, so back off and keep trying until max_wait.
+            tracked.transport_errors += 1
+            logger.warning("Kling recordInfo for %s failed (%s in a row): %s", task_id, tracked.transport_errors, exc)
+            if age >= tracked.max_wait:
+                self._time_out(tracked)
+                return
+            backoff = self.min_interval * 2 ** min(tracked.transport_errors, 6)
+            with self._cond:
+                tracked.next_poll_at = time.monotonic() + min(max(backoff, self._interval_for(age)), 4 * self.max_interval)
+            return
+
+        tracked.transport_errors = 0
+        try:
+            state, video_url = parse_task_record(record)
+        except Exception as exc:
+            logger.warning("Kling task %s failed: %s", task_id, exc)
+            self.resolve(task_id, error=str(exc))
+            return
+
+        tracked.last_state = state
+        print(f"[{age:.0f}s] {task_id} {state or 'unknown'}")
+        if video_url:
+            self.resolve(task_id, video_url=video_url)
+            return
+
+        if age >= tracked.max_wait:
+            self._time_out(tracked)
+            return
+
+        with self._cond:
+            tracked.next_poll_at = time.monotonic() + self._interval_for(age)
+
+
+_TRACKER: KlingTaskTracker | None = None
+_TRACKER_LOCK = threading.Lock()
+
+
+def get_tracker() -> KlingTaskTracker:
+    global _TRACKER
+    with _TRACKER_LOCK:
+        if _TRACKER is None:
+            _TRACKER = KlingTaskTracker(task_log=get_task_log())
+        return _TRACKER
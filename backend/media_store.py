@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+import requests
+
+from config import DATA_DIR
+
+logger = logging.getLogger("trendhijack.media_store")
+
+MEDIA_CACHE_ENABLED = os.environ.get("MEDIA_CACHE_ENABLED", "1") == "1"
+DEFAULT_MAX_BYTES = int(os.environ.get("MEDIA_STORE_MAX_BYTES", str(2 * 1024**3)))
+DOWNLOAD_WORKERS = int(os.environ.get("MEDIA_DOWNLOAD_WORKERS", "2"))
+CHUNK_SIZE = 1024 * 1024
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+ReadyCallback = Callable[[str, str], None]
+
+
+def is_valid_digest(digest: str) -> bool:
+    return bool(_DIGEST_RE.match(digest or ""))
+
+
+class MediaStore:
+    """Content-addressed local copy of generated videos with size-bounded LRU eviction.
+
+    Files live at ``<root>/<digest[:2]>/<digest>.mp4`` where ``digest`` is the
+    SHA-256 of the bytes. A small SQLite index maps source URLs to digests and
+    tracks last access so the least recently served files go first when the
+    store grows past ``max_bytes``.
+    """
+
+    def __init__(self, root: str | None = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.root = root or os.path.join(DATA_DIR, "media")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, DOWNLOAD_WORKERS), thread_name_prefix="media-dl")
+        os.makedirs(self.root, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS media (digest TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS sources (source_url TEXT PRIMARY KEY, digest TEXT NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(os.path.join(self.root, "index.sqlite3"), timeout=10)
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}.mp4")
+
+    # -- lookups --------------------------------------------------------
+
+    def digest_for_url(self, source_url: str) -> str | None:
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT digest FROM sources WHERE source_url = ?", (source_url,)).fetchone()
+        if row and os.path.exists(self.path_for(row[0])):
+            return row[0]
+        return None
+
+    def has(self, digest: str) -> bool:
+        """Whether ``digest`` is still on disk, without counting it as an access."""
+        return is_valid_digest(digest) and os.path.exists(self.path_for(digest))
+
+    def open_path(self, digest: str) -> str | None:
+        """Return the local file for ``digest`` and mark it recently used."""
+        if not is_valid_digest(digest):
+            return None
+        path = self.path_for(digest)
+        if not os.path.exists(path):
+            return None
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE media SET last_access = ? WHERE digest = ?", (time.time(), digest))
+        return path
+
+    def stats(self) -> dict[str, int]:
+        with self._lock, self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM media").fetchone()
+        return {"files": int(count), "bytes": int(total), "max_bytes": self.max_bytes}
+
+    # -- downloads ------------------------------------------------------
+
+    def download(self, source_url: str) -> str:
+        existing = self.digest_for_url(source_url)
+        if existing:
+            return existing
+
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as handle, requests.get(source_url, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    handle.write(chunk)
+                    hasher.update(chunk)
+                    size += len(chunk)
+
+            digest = hasher.hexdigest()
+            final_path = self.path_for(digest)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO media (digest, size, last_access) VALUES (?, ?, ?)",
+                (digest, size, time.time()),
+            )
+            conn.execute("INSERT OR REPLACE INTO sources (source_url, digest) VALUES (?, ?)", (source_url, digest))
+
+        self.evict()
+        return digest
+
+    def enqueue(self, source_url: str, on_ready: ReadyCallback | None = None) -> Future:
+        """Download ``source_url`` in the background; ``on_ready(source_url, digest)`` fires when stored."""
+        with self._lock:
+            future = self._inflight.get(source_url)
+            if future is None:
+                future = self._executor.submit(self.download, source_url)
+                self._inflight[source_url] = future
+                future.add_done_callback(lambda _: self._forget(source_url))
+
+        if on_ready is not None:
+
+            def _notify(done: Future) -> None:
+                try:
+                    digest = done.result()
+                except Exception as exc:
+                    logger.warning("Media download failed for %s: %s", source_url, exc)
+                    return
+                try:
+                    on_ready(source_url, digest)
+                except Exception as exc:
+                    logger.warning("Media ready callback failed for %s: %s", source_url, exc)
+
+            future.add_done_callback(_notify)
+        return future
+
+    def _forget(self, source_url: str) -> None:
+        with self._lock:
+            self._inflight.pop(source_url, None)
+
+    def evict(self) -> int:
+        removed = 0
+        with self._lock, self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM media").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            rows = conn.execute("SELECT digest, size FROM media ORDER BY last_access ASC").fetchall()
+            for digest, size in rows:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(self.path_for(digest))
+                except FileNotFoundError:
+                    pass
+                conn.execute("DELETE FROM media WHERE digest = ?", (digest,))
+                conn.execute("DELETE FROM sources WHERE digest = ?", (digest,))
+                total -= size
+                removed += 1
+        if removed:
+            logger.info("Evicted %s cached media file(s)", removed)
+        return removed
+
+
+_STORE: MediaStore | None = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_media_store() -> MediaStore | None:
+    global _STORE
+    if not MEDIA_CACHE_ENABLED:
+        return None
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = MediaStore()
+        return _STORE
@@ -1,23 +1,86 @@
 import asyncio
+import copy
+import functools
 import logging
 import os
-from typing import Any, Callable
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable
 
+from cancellation import CancellationToken, Deadline, JobCancelled, check_cancelled, deadline_allows
 from kling_agent import API_BASE_URL as KLING_API_BASE_URL
+from discovery_cache import CACHE_ENABLED as DISCOVERY_CACHE_ENABLED
+from discovery_cache import get_discovery_cache
+from generation_cache import get_generation_cache
+from job_executor import DEFAULT_PRIORITY
 from kling_agent import KlingAgent
+from kling_task_log import get_task_log
+from kling_tracker import get_tracker
 from reka_agent import FALLBACK_DIRECTOR_BRIEF, analyze_video, brief_to_kling_prompt
+from runtime import run_async
+from stage_graph import Stage, StageError, StageGraph
+from stage_limits import get_stage_limiter
 from tavily_agent import TavilySocialScout, filter_and_rank
 from yutori_agent import YutoriTwitterScout
 
 logger = logging.getLogger("trendhijack.pipeline")
 
 ProgressCallback = Callable[[str, int, str], None]
+VariationCallback = Callable[[dict[str, Any]], None]
+# (stage, data): what a finished stage adds to the job before the result exists.
+PartialCallback = Callable[[str, dict[str, Any]], None]
+# (job_id, result, error): exactly one of result / error is set.
+ItemDoneCallback = Callable[[str, dict[str, Any] | None, BaseException | None], None]
 
 FALLBACK_MP4_URL = "https://videos.pexels.com/video-files/3571264/3571264-hd_1920_1080_30fps.mp4"
 REKA_MODEL = "reka-flash"
 KLING_MODEL = "kling-3.0/video"
 KLING_ENDPOINT = f"{KLING_API_BASE_URL}/jobs/createTask"
 DEFAULT_RECENCY = "week"
+# Variation mode: most Kling generations one job may submit, and how many run at once.
+VARIATION_BUDGET = int(os.environ.get("KLING_VARIATION_BUDGET", "3"))
+VARIATION_CONCURRENCY = int(os.environ.get("KLING_VARIATION_CONCURRENCY", "3"))
+# Blocking SDK calls (Tavily, Twitter, Reka) run here rather than on the shared
+# loop's default executor, so slow or abandoned calls cannot starve other jobs.
+_BLOCKING_STAGE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("PIPELINE_BLOCKING_WORKERS", "16")),
+    thread_name_prefix="pipeline-stage",
+)
+# Progress, partial and variation callbacks write the job store (SQLite or
+# Redis); they run here so a slow write never stalls the shared loop.
+_CALLBACK_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("PIPELINE_CALLBACK_WORKERS", "4")),
+    thread_name_prefix="pipeline-callback",
+)
+# Start Reka as soon as the media URL is final, while the other scouts finish.
+SPECULATIVE_ANALYSIS = os.environ.get("PIPELINE_SPECULATIVE_ANALYSIS", "1") == "1"
+# Also bet on FALLBACK_MP4_URL at t=0, before media search has answered. A miss
+# pays for a second Reka analysis, so this is off unless fallbacks are common.
+SPECULATE_ON_FALLBACK = os.environ.get("PIPELINE_SPECULATE_FALLBACK", "0") == "1"
+# Batch groups: how many items' prompt + Kling stages run at once after the shared discovery.
+BATCH_ITEM_CONCURRENCY = int(os.environ.get("PIPELINE_BATCH_CONCURRENCY", "4"))
+# Adaptive discovery: basic-depth Tavily searches first, advanced only for
+# platforms still short of strong posts, stopping once the shortlist is full.
+TAVILY_ADAPTIVE_DEPTH = os.environ.get("TAVILY_ADAPTIVE_DEPTH", "1") == "1"
+TAVILY_SATURATION_SCORE = float(os.environ.get("TAVILY_SATURATION_SCORE", "0.5"))
+SHORTLIST_SIZE = 15
+MAX_POSTS_PER_PLATFORM = 5
+# How a job's deadline is split: discovery must finish early enough to leave
+# these many seconds for Reka and for Kling, and optional work (Twitter scout,
+# MP4 search, variations) is skipped once its stage has less than the minimum.
+ANALYSIS_RESERVE_SECONDS = float(os.environ.get("PIPELINE_ANALYSIS_RESERVE_SECONDS", "120"))
+GENERATION_RESERVE_SECONDS = float(os.environ.get("PIPELINE_GENERATION_RESERVE_SECONDS", "300"))
+OPTIONAL_STAGE_MIN_SECONDS = float(os.environ.get("PIPELINE_OPTIONAL_STAGE_MIN_SECONDS", "30"))
+# Which user-facing step a failing stage is reported under.
+STAGE_STEPS = {
+    "tavily": "STEP 1 — discovery",
+    "twitter": "STEP 1 — discovery",
+    "media": "STEP 1 — discovery",
+    "discovery": "STEP 1 — discovery",
+    "analysis": "STEP 2 — reka analysis",
+    "prompt": "STEP 3 — prompt generation",
+    "generation": "STEP 4 — kling generation",
+}
 DEFAULT_PLATFORMS = {
     "twitter": True,
     "reddit": True,
@@ -28,15 +91,109 @@ DEFAULT_PLATFORMS = {
 }
 
 
-def _report_progress(on_progress: ProgressCallback | None, step: str, percent: int, message: str) -> None:
+async def _run_callback(fn: Callable[..., Any], *args: Any) -> None:
+    await asyncio.get_running_loop().run_in_executor(_CALLBACK_EXECUTOR, functools.partial(fn, *args))
+
+
+async def _report_progress(on_progress: ProgressCallback | None, step: str, percent: int, message: str) -> None:
     if on_progress is None:
         return
     try:
-        on_progress(step, percent, message)
+        await _run_callback(on_progress, step, percent, message)
     except Exception as exc:
         logger.warning("Progress callback failed at %s: %s", step, exc)
 
 
+def _partial_view(stage: str, output: Any) -> dict[str, Any]:
+    """The client-facing slice of a stage's output, published as soon as the stage finishes."""
+    if stage == "discovery":
+        return {
+            "trend_summary": output["trend_summary"],
+            "twitter_posts_found": len(output["twitter_posts"]),
+            "top_posts_for_reka": len(output["top_posts"]),
+            "shortlist": [_normalize_post(post) for post in output["top_posts"]],
+        }
+    if stage == "analysis":
+        return {"director_brief": output}
+    if stage == "prompt":
+        return {"kling_prompt": output["kling_prompt"], "variations": len(output["variation_prompts"])}
+    return {"video_url": output or None}
+
+
+async def _report_partial(on_partial: PartialCallback | None, stage: str, data: dict[str, Any]) -> None:
+    if on_partial is None:
+        return
+    try:
+        await _run_callback(on_partial, stage, _redact_sensitive(data))
+    except Exception as exc:
+        logger.warning("Partial result callback failed at %s: %s", stage, exc)
+
+
+async def _run_blocking(
+    cancel_token: CancellationToken | None,
+    cancel_event: asyncio.Event | None,
+    fn: Callable[..., Any],
+    /,
+    *args: Any,
+    **kwargs: Any,
+) -> Any:
+    """Run a blocking stage off the loop; stop waiting for it as soon as the job is cancelled.
+
+    The abandoned call finishes in the background (its own loops check the
+    token and stop issuing upstream requests), but the job returns at once.
+    """
+    check_cancelled(cancel_token)
+    return await _await_blocking(cancel_token, cancel_event, _submit_blocking(fn, *args, **kwargs))
+
+
+def _submit_blocking(fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> asyncio.Future[Any]:
+    future = asyncio.get_running_loop().run_in_executor(
+        _BLOCKING_STAGE_EXECUTOR, functools.partial(fn, *args, **kwargs)
+    )
+    # If the caller stops waiting (job cancelled, speculation discarded) nobody
+    # reads the outcome, so consume it here; awaiting callers still see it.
+    future.add_done_callback(lambda done: done.cancelled() or done.exception())
+    return future
+
+
+async def _await_blocking(
+    cancel_token: CancellationToken | None,
+    cancel_event: asyncio.Event | None,
+    future: asyncio.Future[Any],
+) -> Any:
+    if cancel_event is None:
+        return await future
+    cancel_waiter = asyncio.ensure_future(cancel_event.wait())
+    try:
+        await asyncio.wait({future, cancel_waiter}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        cancel_waiter.cancel()
+    if not future.done():
+        check_cancelled(cancel_token)
+        raise asyncio.CancelledError("blocking stage cancelled")
+    return future.result()
+
+
+def _stage_deadline(deadline: Deadline | None, held_back: float) -> Deadline | None:
+    """The part of ``deadline`` a stage may use while keeping ``held_back`` seconds for later stages."""
+    if deadline is None:
+        return None
+    return deadline.within(deadline.remaining() - held_back)
+
+
+def _discovery_cache_summary(slices: list[dict[str, Any]]) -> dict[str, Any]:
+    """How much of a job's discovery came from shared topic slices, and the age of the stalest one."""
+    now = time.time()
+    ages = [now - float(item["fetched_at"]) for item in slices if item.get("fetched_at")]
+    hits = sum(1 for item in slices if item.get("cached"))
+    return {
+        "enabled": DISCOVERY_CACHE_ENABLED,
+        "hits": hits,
+        "misses": len(slices) - hits,
+        "oldest_age_seconds": round(max(ages), 1) if ages else None,
+    }
+
+
 def _safe_float(value: Any) -> float | int | None:
     if value is None:
         return None
@@ -68,6 +225,15 @@ def _normalize_post(post: Any) -> dict[str, Any]:
     }
 
 
+async def _report_variation(on_variation: VariationCallback | None, item: dict[str, Any]) -> None:
+    if on_variation is None:
+        return
+    try:
+        await _run_callback(on_variation, item)
+    except Exception as exc:
+        logger.warning("Variation callback failed for #%s: %s", item.get("index"), exc)
+
+
 def _redact_sensitive(payload: Any) -> Any:
     exact_sensitive = {
         "api_key",
@@ -113,8 +279,13 @@ def _redact_sensitive(payload: Any) -> Any:
 
 
 def _default_explain(brand: str, competitor: str, location: str) -> dict[str, Any]:
-    discovery_topics = [competitor, f"{competitor} vs {brand}", f"{brand} alternative"]
-    yutori_topics = [competitor, brand, f"{competitor} {location}"]
+    discovery_topics = [competitor]
+    yutori_topics = [competitor]
+    if brand:
+        discovery_topics += [f"{competitor} vs {brand}", f"{brand} alternative"]
+        yutori_topics.append(brand)
+    if location:
+        yutori_topics.append(f"{competitor} {location}")
 
     return {
         "discovery": {
@@ -126,6 +297,7 @@ def _default_explain(brand: str, competitor: str, location: str) -> dict[str, An
                 "total_found": 0,
                 "results": [],
                 "top_urls": [],
+                "search_stats": {},
             },
             "yutori": {
                 "enabled": bool(os.environ.get("TWITTER_BEARER_TOKEN", "").strip()),
@@ -134,6 +306,7 @@ def _default_explain(brand: str, competitor: str, location: str) -> dict[str, An
                 "tweets": [],
                 "top_urls": [],
                 "summary": "",
+                "slices": [],
             },
             "merged": {
                 "total_posts": 0,
@@ -142,6 +315,7 @@ def _default_explain(brand: str, competitor: str, location: str) -> dict[str, An
                 "shortlist": [],
             },
             "mp4_for_reka": "",
+            "cache": {"enabled": DISCOVERY_CACHE_ENABLED, "hits": 0, "misses": 0, "oldest_age_seconds": None},
         },
         "analysis": {
             "provider": "reka",
@@ -149,6 +323,7 @@ def _default_explain(brand: str, competitor: str, location: str) -> dict[str, An
             "media_url": "",
             "director_brief": {},
             "used_fallback": False,
+            "speculation": {"enabled": SPECULATIVE_ANALYSIS, "hit": False},
         },
         "generation": {
             "provider": "kling",
@@ -160,7 +335,11 @@ def _default_explain(brand: str, competitor: str, location: str) -> dict[str, An
             "aspect_ratio": "9:16",
             "task_id": None,
             "video_url": None,
+            "cache_hit": False,
+            "variations": [],
         },
+        "timings": {"stages": {}, "critical_path": [], "total_ms": 0},
+        "deadline": {"budget_seconds": None, "skipped": []},
         "errors": [],
     }
 
@@ -331,8 +510,16 @@ def _build_smoke_result(brand: str, competitor: str, location: str) -> dict[str,
     return _redact_sensitive(result)
 
 
-def get_direct_mp4(topic: str, scout: TavilySocialScout) -> str:
+def get_direct_mp4(
+    topic: str,
+    scout: TavilySocialScout,
+    cancel_token: CancellationToken | None = None,
+    deadline: Deadline | None = None,
+) -> str:
     """Search Tavily for a direct MP4 URL for Reka video analysis."""
+    check_cancelled(cancel_token)
+    if deadline is not None and deadline.expired:
+        return FALLBACK_MP4_URL
     try:
         resp = scout.client.search(
             query=f"{topic} tech demo site:pexels.com OR site:pixabay.com",
@@ -348,9 +535,136 @@ def get_direct_mp4(topic: str, scout: TavilySocialScout) -> str:
     return FALLBACK_MP4_URL
 
 
+class SpeculativeAnalysis:
+    """``analyze_video`` calls started before the media URL is final, keyed by URL.
+
+    ``take`` hands back the run for the URL discovery chose (a hit) and
+    cancels the waiters of every other URL; their results are discarded.
+    """
+
+    def __init__(self, analyze: Callable[[str], Awaitable[dict[str, Any]]]) -> None:
+        self._analyze = analyze
+        self._tasks: dict[str, asyncio.Task[Any]] = {}
+        self._started: dict[str, float] = {}
+        self._finished: dict[str, float] = {}
+
+    def start(self, url: str) -> None:
+        if not url or url in self._tasks:
+            return
+        self._started[url] = time.perf_counter()
+        task = asyncio.ensure_future(self._analyze(url))
+        task.add_done_callback(lambda done: self._on_done(url, done))
+        self._tasks[url] = task
+
+    def _on_done(self, url: str, task: asyncio.Task[Any]) -> None:
+        self._finished[url] = time.perf_counter()
+        if not task.cancelled():
+            # Mark a discarded run's exception as retrieved.
+            task.exception()
+
+    def take(self, url: str) -> tuple[asyncio.Task[Any] | None, dict[str, Any]]:
+        """The speculative run for ``url`` (or None) and an explain entry describing the outcome."""
+        now = time.perf_counter()
+        task = self._tasks.pop(url, None)
+        discarded = sorted(self._tasks)
+        self.cancel()
+        report: dict[str, Any] = {
+            "enabled": True,
+            "speculated_urls": sorted(self._started),
+            "hit": task is not None,
+            "discarded_urls": discarded,
+            "overlap_ms": 0,
+        }
+        if task is not None:
+            # Reka time already spent before the analysis stage would have started.
+            overlap_end = min(now, self._finished.get(url, now))
+            report["overlap_ms"] = int(round((overlap_end - self._started[url]) * 1000))
+        return task, report
+
+    def cancel(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+
+def build_variation_prompts(
+    director_brief: dict[str, Any],
+    competitor: str,
+    top_title: str = "",
+    budget: int = VARIATION_BUDGET,
+) -> list[dict[str, Any]]:
+    """One Kling prompt per ``variation_briefs`` entry, using it as the opening hook."""
+    variation_briefs = director_brief.get("variation_briefs", [])
+    if not isinstance(variation_briefs, list):
+        return []
+
+    prompts = []
+    for index, variation in enumerate(variation_briefs[: max(0, budget)]):
+        variation_text = _clean_string(variation, 400).strip()
+        if not variation_text:
+            continue
+        prompt = brief_to_kling_prompt(
+            brief={**director_brief, "hook": variation_text},
+            brand=competitor,
+            location=director_brief.get("setting", "global"),
+        )
+        if top_title:
+            prompt = f"{prompt}. Context from top trend title: {top_title}."
+        prompts.append({"index": index, "brief": variation_text, "prompt": prompt})
+    return prompts
+
+
 class TrendHijackPipeline:
     def __init__(self) -> None:
-        self.kling_agent = KlingAgent()
+        self.kling_agent = KlingAgent(
+            tracker=get_tracker(),
+            cache=get_generation_cache(),
+            task_log=get_task_log(),
+        )
+
+    async def _generate_variations(
+        self,
+        variation_prompts: list[dict[str, Any]],
+        generation_mode: str,
+        force_regenerate: bool = False,
+        on_variation: VariationCallback | None = None,
+        job_context: dict[str, Any] | None = None,
+        cancel_event: asyncio.Event | None = None,
+        deadline: Deadline | None = None,
+        priority: str = DEFAULT_PRIORITY,
+    ) -> list[dict[str, Any]]:
+        """Submit every variation concurrently and report each one as it finishes."""
+        semaphore = asyncio.Semaphore(max(1, VARIATION_CONCURRENCY))
+
+        async def _one(item: dict[str, Any]) -> dict[str, Any]:
+            async with semaphore:
+                try:
+                    async with get_stage_limiter("kling").slot(priority):
+                        generation = await self.kling_agent.generate_video(
+                            prompt=item["prompt"],
+                            style=generation_mode,
+                            force_regenerate=force_regenerate,
+                            job_context={**(job_context or {}), "variation_index": item["index"]},
+                            cancel_event=cancel_event,
+                            deadline=deadline,
+                        )
+                except Exception as exc:
+                    return {**item, "status": "error", "error": str(exc), "task_id": None, "video_url": None}
+            return {
+                **item,
+                "status": "success",
+                "task_id": generation.get("task_id"),
+                "video_url": generation.get("video_url"),
+                "cache_hit": bool(generation.get("cached")),
+            }
+
+        finished: list[dict[str, Any]] = []
+        for next_done in asyncio.as_completed([_one(item) for item in variation_prompts]):
+            outcome = await next_done
+            finished.append(outcome)
+            await _report_variation(on_variation, outcome)
+        finished.sort(key=lambda item: item["index"])
+        return finished
 
     async def run_pipeline(
         self,
@@ -358,7 +672,27 @@ class TrendHijackPipeline:
         competitor: str,
         location: str,
         on_progress: ProgressCallback | None = None,
+        force_regenerate: bool = False,
+        variations: bool = False,
+        on_variation: VariationCallback | None = None,
+        job_id: str | None = None,
+        cancel_token: CancellationToken | None = None,
+        deadline: Deadline | None = None,
+        shared: dict[str, Any] | None = None,
+        preview: bool = False,
+        on_partial: PartialCallback | None = None,
+        priority: str = DEFAULT_PRIORITY,
     ) -> dict[str, Any]:
+        """Run the pipeline and return the job result.
+
+        ``preview`` stops after STEP 3 and adds ``render_seed`` to the result;
+        passing ``{"outputs": result["render_seed"], "explain": result["explain"]}``
+        back as ``shared`` later runs only STEP 4 from that stored prompt.
+        ``on_partial`` receives the discovery shortlist, brief, prompt and
+        video as each becomes available, long before the result is returned.
+        ``priority`` is the job's scheduling class, which bounds how many Reka
+        and Kling calls it may share with other jobs of that class.
+        """
         logger.info(
             "Pipeline start competitor='%s' brand='%s' location='%s'",
             competitor,
@@ -367,55 +701,265 @@ class TrendHijackPipeline:
         )
 
         if os.environ.get("SMOKE_MODE", "0") == "1":
-            _report_progress(on_progress, "STEP 1 — discovery start", 10, "SMOKE_MODE discovery")
-            _report_progress(on_progress, "STEP 1 — discovery end", 30, "SMOKE_MODE discovery complete")
-            _report_progress(on_progress, "STEP 2 — reka analysis start", 40, "SMOKE_MODE analysis")
-            _report_progress(on_progress, "STEP 2 — reka analysis end", 60, "SMOKE_MODE analysis complete")
-            _report_progress(on_progress, "STEP 3 — prompt generation start", 70, "SMOKE_MODE prompt build")
-            _report_progress(on_progress, "STEP 3 — prompt generation end", 85, "SMOKE_MODE prompt ready")
-            _report_progress(on_progress, "STEP 4 — kling generation start", 90, "SMOKE_MODE generation")
-            _report_progress(on_progress, "STEP 4 — kling generation end", 98, "SMOKE_MODE generation complete")
-            return _build_smoke_result(brand=brand, competitor=competitor, location=location)
+            await _report_progress(on_progress, "STEP 1 — discovery start", 10, "SMOKE_MODE discovery")
+            await _report_progress(on_progress, "STEP 1 — discovery end", 30, "SMOKE_MODE discovery complete")
+            await _report_progress(on_progress, "STEP 2 — reka analysis start", 40, "SMOKE_MODE analysis")
+            await _report_progress(on_progress, "STEP 2 — reka analysis end", 60, "SMOKE_MODE analysis complete")
+            await _report_progress(on_progress, "STEP 3 — prompt generation start", 70, "SMOKE_MODE prompt build")
+            await _report_progress(on_progress, "STEP 3 — prompt generation end", 85, "SMOKE_MODE prompt ready")
+            smoke_result = _build_smoke_result(brand=brand, competitor=competitor, location=location)
+            await _report_partial(
+                on_partial,
+                "discovery",
+                {
+                    "trend_summary": smoke_result["trend_summary"],
+                    "twitter_posts_found": smoke_result["twitter_posts_found"],
+                    "top_posts_for_reka": smoke_result["top_posts_for_reka"],
+                    "shortlist": smoke_result["top_content_sources"],
+                },
+            )
+            await _report_partial(on_partial, "analysis", {"director_brief": smoke_result["director_brief"]})
+            await _report_partial(on_partial, "prompt", {"kling_prompt": smoke_result["kling_prompt"], "variations": 0})
+            if preview:
+                return {**smoke_result, "status": "preview", "video_url": None, "render_seed": {}}
+            await _report_progress(on_progress, "STEP 4 — kling generation start", 90, "SMOKE_MODE generation")
+            await _report_progress(on_progress, "STEP 4 — kling generation end", 98, "SMOKE_MODE generation complete")
+            await _report_partial(on_partial, "generation", {"video_url": smoke_result["video_url"]})
+            return smoke_result
+
+        outputs, explain = await self._run_stages(
+            brand=brand,
+            competitor=competitor,
+            location=location,
+            on_progress=on_progress,
+            force_regenerate=force_regenerate,
+            variations=variations,
+            on_variation=on_variation,
+            job_id=job_id,
+            cancel_token=cancel_token,
+            deadline=deadline,
+            shared=shared,
+            targets=("prompt",) if preview else None,
+            on_partial=on_partial,
+            priority=priority,
+        )
+        discovery = outputs["discovery"]
+        top_posts = discovery["top_posts"]
+        filter_stats = discovery["filter_stats"]
+        twitter_posts = discovery["twitter_posts"]
+        trend_summary = discovery["trend_summary"]
+        director_brief = outputs["analysis"]
+        kling_prompt = outputs["prompt"]["kling_prompt"]
+        video_url = outputs.get("generation")
+
+        # STEP 5 — RETURN
+        result = {
+            "status": "preview" if preview else "success",
+            "brand": brand,
+            "competitor": competitor,
+            "location": location,
+            "trend_summary": trend_summary,
+            "tavily_posts_found": int(explain["discovery"]["tavily"]["total_found"]),
+            "twitter_posts_found": len(twitter_posts),
+            "top_posts_for_reka": len(top_posts),
+            "filter_stats": dict(filter_stats),
+            "director_brief": director_brief,
+            "kling_prompt": kling_prompt,
+            "video_url": video_url,
+            "variations": explain["generation"]["variations"],
+            "top_content_sources": [_normalize_post(post) for post in top_posts[:5]],
+            "explain": explain,
+            "output": {
+                "trend_summary": trend_summary,
+                "director_brief": director_brief,
+                "video_url": video_url,
+                "top_content_sources": [_normalize_post(post) for post in top_posts[:5]],
+            },
+        }
+        if preview:
+            # Everything STEP 4 needs, so a render can start without redoing STEPS 1-3.
+            result["render_seed"] = {name: outputs[name] for name in ("discovery", "analysis", "prompt")}
+        print("✅ Step 5 complete")
+        return _redact_sensitive(result)
+
+    async def run_shared_discovery(
+        self,
+        competitor: str,
+        on_progress: ProgressCallback | None = None,
+        cancel_token: CancellationToken | None = None,
+        deadline: Deadline | None = None,
+        priority: str = DEFAULT_PRIORITY,
+    ) -> dict[str, Any]:
+        """Discovery and Reka analysis for a competitor alone, to seed several runs through ``shared``.
+
+        Topics leave out brand and location so the result applies to every
+        batch item that names this competitor.
+        """
+        outputs, explain = await self._run_stages(
+            brand="",
+            competitor=competitor,
+            location="",
+            on_progress=on_progress,
+            cancel_token=cancel_token,
+            deadline=deadline,
+            targets=("analysis",),
+            priority=priority,
+        )
+        return {
+            "outputs": {"discovery": outputs["discovery"], "analysis": outputs["analysis"]},
+            "explain": explain,
+        }
+
+    async def _run_stages(
+        self,
+        brand: str,
+        competitor: str,
+        location: str,
+        on_progress: ProgressCallback | None = None,
+        force_regenerate: bool = False,
+        variations: bool = False,
+        on_variation: VariationCallback | None = None,
+        job_id: str | None = None,
+        cancel_token: CancellationToken | None = None,
+        deadline: Deadline | None = None,
+        shared: dict[str, Any] | None = None,
+        targets: tuple[str, ...] | None = None,
+        on_partial: PartialCallback | None = None,
+        priority: str = DEFAULT_PRIORITY,
+    ) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Run the stage graph and return every stage's output along with ``explain``.
+
+        With ``shared`` (from ``run_shared_discovery`` or a preview's
+        ``render_seed``) the stages it holds are taken as done and only the
+        remaining prompt and generation stages run.
+        """
+        # Bridge the thread-safe token to the loop so awaiting stages wake on cancel.
+        loop = asyncio.get_running_loop()
+        cancel_event = asyncio.Event()
+        if cancel_token is not None:
+            cancel_token.add_callback(lambda: loop.call_soon_threadsafe(cancel_event.set))
+
+        async def _blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+            return await _run_blocking(cancel_token, cancel_event, fn, *args, **kwargs)
 
         explain = _default_explain(brand=brand, competitor=competitor, location=location)
+        skipped = explain["deadline"]["skipped"]
+        if deadline is not None:
+            explain["deadline"]["budget_seconds"] = round(deadline.seconds, 1)
+        # Discovery keeps enough of the budget back for analysis and generation.
+        discovery_deadline = _stage_deadline(deadline, ANALYSIS_RESERVE_SECONDS + GENERATION_RESERVE_SECONDS)
         discovery_topics = explain["discovery"]["tavily"]["query_topics"]
         yutori_topics = explain["discovery"]["yutori"]["topics"]
-        top_posts: list[dict[str, Any]] = []
-        filter_stats: dict[str, Any] = {}
-        twitter_posts: list[dict[str, Any]] = []
-        yutori_summary = ""
-        direct_mp4_url = FALLBACK_MP4_URL
-
-        # STEP 1 — DISCOVERY
-        _report_progress(on_progress, "STEP 1 — discovery start", 10, "Discovering trends across platforms")
-        try:
+
+        if shared is not None:
+            explain["discovery"] = copy.deepcopy(shared["explain"]["discovery"])
+            explain["analysis"] = copy.deepcopy(shared["explain"]["analysis"])
+            explain["shared"] = {"timings": shared["explain"]["timings"]}
+            if "prompt" in shared["outputs"]:
+                explain["generation"]["prompt"] = shared["outputs"]["prompt"]["kling_prompt"]
+            targets = targets or ("prompt", "generation")
+            # Seeded stages will not run, so publish what they hold right away.
+            for name, output in shared["outputs"].items():
+                await _report_partial(on_partial, name, _partial_view(name, output))
+
+        # STEP 1 — DISCOVERY: the three sources are independent stages that run concurrently.
+        if shared is None:
+            await _report_progress(on_progress, "STEP 1 — discovery start", 10, "Discovering trends across platforms")
+
+        def _tavily_stage(_: dict[str, Any]) -> Any:
             tavily_scout = TavilySocialScout(api_key=os.environ["TAVILY_API_KEY"])
-            tavily_output = tavily_scout.run(
+            return tavily_scout.run(
                 topics=discovery_topics,
                 platforms=dict(DEFAULT_PLATFORMS),
                 recency=DEFAULT_RECENCY,
                 max_results=5,
+                cancel_token=cancel_token,
+                deadline=discovery_deadline,
+                adaptive=TAVILY_ADAPTIVE_DEPTH,
+                saturation_target=SHORTLIST_SIZE,
+                saturation_score=TAVILY_SATURATION_SCORE,
+                max_per_platform=MAX_POSTS_PER_PLATFORM,
+                cache=get_discovery_cache(),
             )
 
+        def _twitter_stage(_: dict[str, Any]) -> dict[str, Any] | None:
+            twitter_bearer = os.environ.get("TWITTER_BEARER_TOKEN", "")
+            if not twitter_bearer.strip():
+                return None
+            if not deadline_allows(discovery_deadline, OPTIONAL_STAGE_MIN_SECONDS):
+                skipped.append("twitter")
+                return None
+            yutori_scout = YutoriTwitterScout(bearer_token=twitter_bearer)
+            yutori_result = yutori_scout.scout(
+                topics=yutori_topics,
+                max_per_topic=10,
+                cancel_token=cancel_token,
+                deadline=discovery_deadline,
+                cache=get_discovery_cache(),
+            )
+            return {**yutori_result, "posts": yutori_scout.to_tavily_format(yutori_result.get("tweets", []))}
+
+        # Reka gets what is left once generation's share is held back, measured when each call starts.
+        async def _analyze(url: str) -> dict[str, Any]:
+            limiter = get_stage_limiter("reka")
+            await limiter.acquire(priority)
+            try:
+                check_cancelled(cancel_token)
+                future = _submit_blocking(
+                    analyze_video, url, deadline=_stage_deadline(deadline, GENERATION_RESERVE_SECONDS)
+                )
+            except BaseException:
+                limiter.release(priority)
+                raise
+            # A thread cannot be stopped, so the class slot stays taken until the
+            # Reka call really returns, even when this job stops waiting for it.
+            future.add_done_callback(lambda _: limiter.release(priority))
+            return await _await_blocking(cancel_token, cancel_event, future)
+
+        speculation = SpeculativeAnalysis(_analyze) if SPECULATIVE_ANALYSIS and shared is None else None
+        if speculation is not None and SPECULATE_ON_FALLBACK:
+            speculation.start(FALLBACK_MP4_URL)
+
+        async def _media_stage(_: dict[str, Any]) -> str:
+            if not deadline_allows(discovery_deadline, OPTIONAL_STAGE_MIN_SECONDS):
+                skipped.append("media_search")
+                if speculation is not None:
+                    # No search will run, so the fallback URL is final.
+                    speculation.start(FALLBACK_MP4_URL)
+                return FALLBACK_MP4_URL
+            tavily_mp4_scout = TavilySocialScout(api_key=os.environ["TAVILY_API_KEY"])
+            media_url = await _blocking(
+                get_direct_mp4, competitor, tavily_mp4_scout, cancel_token, deadline=discovery_deadline
+            )
+            if speculation is not None:
+                # The URL is final now; start Reka on it while the scouts finish.
+                speculation.start(media_url)
+            return media_url
+
+        async def _discovery_stage(inputs: dict[str, Any]) -> dict[str, Any]:
+            tavily_output = inputs["tavily"]
+            yutori_result = inputs["twitter"]
+            direct_mp4_url = inputs["media"]
+
             tavily_results = [_normalize_post(post) for post in tavily_output.posts]
             explain["discovery"]["tavily"]["total_found"] = int(tavily_output.total_found)
+            explain["discovery"]["tavily"]["search_stats"] = dict(tavily_output.search_stats)
             explain["discovery"]["tavily"]["results"] = tavily_results
             explain["discovery"]["tavily"]["top_urls"] = [
                 item["url"] for item in tavily_results if item.get("url")
             ][:5]
 
-            twitter_bearer = os.environ.get("TWITTER_BEARER_TOKEN", "")
-            explain["discovery"]["yutori"]["enabled"] = bool(twitter_bearer.strip())
-            if twitter_bearer.strip():
-                yutori_scout = YutoriTwitterScout(bearer_token=twitter_bearer)
-                yutori_result = yutori_scout.scout(topics=yutori_topics, max_per_topic=10)
+            twitter_posts: list[dict[str, Any]] = []
+            yutori_summary = ""
+            explain["discovery"]["yutori"]["enabled"] = yutori_result is not None
+            if yutori_result is not None:
                 yutori_summary = str(yutori_result.get("trend_summary", "") or "")
                 explain["discovery"]["yutori"]["summary"] = yutori_summary
                 explain["discovery"]["yutori"]["total_found"] = int(yutori_result.get("total_found", 0) or 0)
+                explain["discovery"]["yutori"]["slices"] = list(yutori_result.get("slices", []))
 
-                tweets_raw = yutori_result.get("tweets", [])
                 yutori_tweets = []
-                for tweet in tweets_raw:
+                for tweet in yutori_result.get("tweets", []):
                     if not isinstance(tweet, dict):
                         continue
                     yutori_tweets.append(
@@ -431,27 +975,26 @@ class TrendHijackPipeline:
                 explain["discovery"]["yutori"]["top_urls"] = [
                     item["url"] for item in yutori_tweets if item.get("url")
                 ][:5]
-
-                twitter_posts = yutori_scout.to_tavily_format(tweets_raw)
+                twitter_posts = yutori_result["posts"]
 
             all_posts = tavily_output.posts + twitter_posts
             explain["discovery"]["merged"]["total_posts"] = len(all_posts)
 
             top_posts, filter_stats = filter_and_rank(
                 posts=[p.__dict__ if hasattr(p, "__dict__") else p for p in all_posts],
-                top_n=15,
+                top_n=SHORTLIST_SIZE,
                 min_score=0.10,
-                max_per_platform=5,
+                max_per_platform=MAX_POSTS_PER_PLATFORM,
             )
 
             shortlist = [_normalize_post(post) for post in top_posts]
             explain["discovery"]["merged"]["top_posts_for_reka"] = len(top_posts)
             explain["discovery"]["merged"]["filter_stats"] = dict(filter_stats)
             explain["discovery"]["merged"]["shortlist"] = shortlist
-
-            tavily_mp4_scout = TavilySocialScout(api_key=os.environ["TAVILY_API_KEY"])
-            direct_mp4_url = get_direct_mp4(competitor, tavily_mp4_scout)
             explain["discovery"]["mp4_for_reka"] = direct_mp4_url
+            explain["discovery"]["cache"] = _discovery_cache_summary(
+                tavily_output.search_stats.get("slices", []) + explain["discovery"]["yutori"]["slices"]
+            )
 
             trend_summary = f"Tavily: {tavily_output.total_found} posts across platforms. "
             if yutori_summary:
@@ -459,15 +1002,28 @@ class TrendHijackPipeline:
 
             print(f"✅ Step 1 complete — {len(top_posts)} filtered posts ready for Reka")
             print(f"   MP4 for Reka analysis: {direct_mp4_url}")
-            _report_progress(on_progress, "STEP 1 — discovery end", 30, "Discovery complete")
-        except Exception as exc:
-            explain["errors"].append({"step": "STEP 1 — discovery", "error": str(exc)})
-            raise Exception(f"STEP 1 — discovery failed: {exc}") from exc
+            await _report_progress(on_progress, "STEP 1 — discovery end", 30, "Discovery complete")
+            discovery = {
+                "top_posts": top_posts,
+                "filter_stats": filter_stats,
+                "twitter_posts": twitter_posts,
+                "trend_summary": trend_summary,
+                "media_url": direct_mp4_url,
+            }
+            await _report_partial(on_partial, "discovery", _partial_view("discovery", discovery))
+            return discovery
 
         # STEP 2 — REKA ANALYSIS
-        _report_progress(on_progress, "STEP 2 — reka analysis start", 40, "Running Reka analysis")
-        try:
-            director_brief = analyze_video(direct_mp4_url)
+        async def _analysis_stage(inputs: dict[str, Any]) -> dict[str, Any]:
+            direct_mp4_url = inputs["discovery"]["media_url"]
+            await _report_progress(on_progress, "STEP 2 — reka analysis start", 40, "Running Reka analysis")
+            speculative_run = None
+            if speculation is not None:
+                speculative_run, explain["analysis"]["speculation"] = speculation.take(direct_mp4_url)
+            if speculative_run is not None:
+                director_brief = await speculative_run
+            else:
+                director_brief = await _analyze(direct_mp4_url)
             used_fallback = director_brief == FALLBACK_DIRECTOR_BRIEF
             explain["analysis"].update(
                 {
@@ -477,19 +1033,25 @@ class TrendHijackPipeline:
                 }
             )
             print("✅ Step 2 complete")
-            _report_progress(on_progress, "STEP 2 — reka analysis end", 60, "Reka analysis complete")
-        except Exception as exc:
-            explain["errors"].append({"step": "STEP 2 — reka analysis", "error": str(exc)})
-            raise Exception(f"STEP 2 — reka analysis failed: {exc}") from exc
+            await _report_progress(on_progress, "STEP 2 — reka analysis end", 60, "Reka analysis complete")
+            await _report_partial(on_partial, "analysis", _partial_view("analysis", director_brief))
+            return director_brief
 
         # STEP 3 — KLING PROMPT
-        _report_progress(on_progress, "STEP 3 — prompt generation start", 70, "Generating Kling prompt")
-        try:
-            kling_prompt = brief_to_kling_prompt(
-                brief=director_brief,
-                brand=competitor,
-                location=director_brief.get("setting", "global"),
-            )
+        async def _prompt_stage(inputs: dict[str, Any]) -> dict[str, Any]:
+            director_brief = inputs["analysis"]
+            top_posts = inputs["discovery"]["top_posts"]
+            check_cancelled(cancel_token)
+            await _report_progress(on_progress, "STEP 3 — prompt generation start", 70, "Generating Kling prompt")
+            if shared is None:
+                kling_prompt = brief_to_kling_prompt(
+                    brief=director_brief,
+                    brand=competitor,
+                    location=director_brief.get("setting", "global"),
+                )
+            else:
+                # Batch items share one brief; their own brand and location keep the videos distinct.
+                kling_prompt = brief_to_kling_prompt(brief=director_brief, brand=brand, location=location)
 
             top_title = ""
             if top_posts:
@@ -499,61 +1061,161 @@ class TrendHijackPipeline:
                 kling_prompt = f"{kling_prompt}. Context from top trend title: {top_title}."
 
             explain["generation"]["prompt"] = kling_prompt
+            variation_prompts: list[dict[str, Any]] = []
+            if variations and not deadline_allows(deadline, GENERATION_RESERVE_SECONDS):
+                # Too little time for several generations; fall back to the single prompt.
+                skipped.append("variations")
+            elif variations:
+                variation_prompts = build_variation_prompts(director_brief, competitor, top_title=top_title)
             print("✅ Step 3 complete")
-            _report_progress(on_progress, "STEP 3 — prompt generation end", 85, "Kling prompt ready")
-        except Exception as exc:
-            explain["errors"].append({"step": "STEP 3 — prompt generation", "error": str(exc)})
-            raise Exception(f"STEP 3 — prompt generation failed: {exc}") from exc
+            await _report_progress(on_progress, "STEP 3 — prompt generation end", 85, "Kling prompt ready")
+            prompt = {"kling_prompt": kling_prompt, "variation_prompts": variation_prompts}
+            await _report_partial(on_partial, "prompt", _partial_view("prompt", prompt))
+            return prompt
 
         # STEP 4 — KLING GENERATION
-        _report_progress(on_progress, "STEP 4 — kling generation start", 90, "Generating final video")
-        try:
+        async def _generation_stage(inputs: dict[str, Any]) -> str:
+            director_brief = inputs["analysis"]
+            kling_prompt = inputs["prompt"]["kling_prompt"]
+            variation_prompts = inputs["prompt"]["variation_prompts"]
+            check_cancelled(cancel_token)
+            await _report_progress(on_progress, "STEP 4 — kling generation start", 90, "Generating final video")
             generation_mode = "std"
             requested_mode = director_brief.get("vibe", "dynamic")
             if requested_mode in {"std", "pro"}:
                 generation_mode = requested_mode
 
             explain["generation"]["mode"] = generation_mode
-            generation = await self.kling_agent.generate_video(
-                prompt=kling_prompt,
-                style=generation_mode,
-            )
+            job_context = {
+                "job_id": job_id,
+                "brand": brand,
+                "competitor": competitor,
+                "location": location,
+            }
+            try:
+                if variation_prompts:
+                    variation_results = await self._generate_variations(
+                        variation_prompts,
+                        generation_mode,
+                        force_regenerate=force_regenerate,
+                        on_variation=on_variation,
+                        job_context=job_context,
+                        cancel_event=cancel_event,
+                        deadline=deadline,
+                        priority=priority,
+                    )
+                    explain["generation"]["variations"] = variation_results
+                    succeeded = [item for item in variation_results if item.get("video_url")]
+                    if not succeeded:
+                        raise Exception(f"all {len(variation_results)} variations failed")
+                    generation = {
+                        "task_id": succeeded[0]["task_id"],
+                        "video_url": succeeded[0]["video_url"],
+                        "cached": succeeded[0].get("cache_hit", False),
+                    }
+                else:
+                    async with get_stage_limiter("kling").slot(priority):
+                        generation = await self.kling_agent.generate_video(
+                            prompt=kling_prompt,
+                            style=generation_mode,
+                            force_regenerate=force_regenerate,
+                            job_context=job_context,
+                            cancel_event=cancel_event,
+                            deadline=deadline,
+                        )
+            except asyncio.CancelledError:
+                check_cancelled(cancel_token)
+                raise
             task_id = generation.get("task_id") if isinstance(generation, dict) else None
             video_url = generation.get("video_url", "") if isinstance(generation, dict) else str(generation)
 
             explain["generation"]["task_id"] = task_id
             explain["generation"]["video_url"] = video_url or None
+            explain["generation"]["cache_hit"] = bool(isinstance(generation, dict) and generation.get("cached"))
             print("✅ Step 4 complete")
-            _report_progress(on_progress, "STEP 4 — kling generation end", 98, "Video generation complete")
-        except Exception as exc:
-            explain["errors"].append({"step": "STEP 4 — kling generation", "error": str(exc)})
-            raise Exception(f"STEP 4 — kling generation failed: {exc}") from exc
+            await _report_progress(on_progress, "STEP 4 — kling generation end", 98, "Video generation complete")
+            await _report_partial(on_partial, "generation", _partial_view("generation", video_url))
+            return video_url
 
-        # STEP 5 — RETURN
-        result = {
-            "status": "success",
-            "brand": brand,
-            "competitor": competitor,
-            "location": location,
-            "trend_summary": trend_summary,
-            "tavily_posts_found": int(explain["discovery"]["tavily"]["total_found"]),
-            "twitter_posts_found": len(twitter_posts),
-            "top_posts_for_reka": len(top_posts),
-            "filter_stats": dict(filter_stats),
-            "director_brief": director_brief,
-            "kling_prompt": kling_prompt,
-            "video_url": video_url,
-            "top_content_sources": [_normalize_post(post) for post in top_posts[:5]],
-            "explain": explain,
-            "output": {
-                "trend_summary": trend_summary,
-                "director_brief": director_brief,
-                "video_url": video_url,
-                "top_content_sources": [_normalize_post(post) for post in top_posts[:5]],
-            },
-        }
-        print("✅ Step 5 complete")
-        return _redact_sensitive(result)
+        graph = StageGraph(
+            [
+                Stage("tavily", _tavily_stage),
+                Stage("twitter", _twitter_stage),
+                Stage("media", _media_stage),
+                Stage("discovery", _discovery_stage, deps=("tavily", "twitter", "media")),
+                Stage("analysis", _analysis_stage, deps=("discovery",)),
+                Stage("prompt", _prompt_stage, deps=("analysis", "discovery")),
+                Stage("generation", _generation_stage, deps=("analysis", "prompt")),
+            ],
+            run_sync=_blocking,
+            passthrough=(JobCancelled, asyncio.CancelledError),
+            seed=shared["outputs"] if shared is not None else None,
+            targets=targets,
+        )
+        try:
+            outputs = await graph.run()
+        except StageError as exc:
+            step = STAGE_STEPS.get(exc.stage, exc.stage)
+            explain["errors"].append({"step": step, "error": str(exc.error)})
+            raise Exception(f"{step} failed: {exc.error}") from exc.error
+        finally:
+            explain["timings"] = graph.report()
+            if speculation is not None:
+                speculation.cancel()
+
+        return outputs, explain
+
+    async def run_batch_group(
+        self,
+        competitor: str,
+        items: list[dict[str, Any]],
+        on_item_done: ItemDoneCallback,
+        on_progress: ProgressCallback | None = None,
+        cancel_token: CancellationToken | None = None,
+        deadline: Deadline | None = None,
+        priority: str = "batch",
+    ) -> None:
+        """Discover and analyse ``competitor`` once, then run every item's prompt and Kling stages.
+
+        Each item is a dict of ``run_pipeline`` keyword arguments (``job_id``,
+        ``brand``, ``location``, ``force_regenerate``, ``variations``,
+        ``on_progress``, ``on_variation``, ``on_partial``, ``cancel_token``).
+        Items finish independently and are reported through ``on_item_done``;
+        a failure of the shared stages fails every item.
+        """
+        shared = None
+        if os.environ.get("SMOKE_MODE", "0") != "1":
+            try:
+                shared = await self.run_shared_discovery(
+                    competitor,
+                    on_progress=on_progress,
+                    cancel_token=cancel_token,
+                    deadline=deadline,
+                    priority=priority,
+                )
+            except Exception as exc:
+                for item in items:
+                    await _run_callback(on_item_done, item["job_id"], None, exc)
+                return
+
+        semaphore = asyncio.Semaphore(max(1, BATCH_ITEM_CONCURRENCY))
+
+        async def _one(item: dict[str, Any]) -> None:
+            async with semaphore:
+                try:
+                    result = await self.run_pipeline(
+                        competitor=competitor,
+                        deadline=deadline,
+                        shared=shared,
+                        priority=priority,
+                        **item,
+                    )
+                except Exception as exc:
+                    await _run_callback(on_item_done, item["job_id"], None, exc)
+                    return
+            await _run_callback(on_item_done, item["job_id"], result, None)
+
+        await asyncio.gather(*(_one(item) for item in items))
 
     async def run(self, query: str, on_progress: ProgressCallback | None = None) -> dict[str, Any]:
         competitor = query
@@ -572,13 +1234,73 @@ def run_pipeline(
     competitor: str,
     location: str,
     on_progress: ProgressCallback | None = None,
+    force_regenerate: bool = False,
+    variations: bool = False,
+    on_variation: VariationCallback | None = None,
+    job_id: str | None = None,
+    timeout_seconds: float | None = None,
+    cancel_token: CancellationToken | None = None,
+    preview: bool = False,
+    shared: dict[str, Any] | None = None,
+    on_partial: PartialCallback | None = None,
+    priority: str = DEFAULT_PRIORITY,
 ) -> dict[str, Any]:
     runner = TrendHijackPipeline()
-    return asyncio.run(
-        runner.run_pipeline(
-            brand=brand,
-            competitor=competitor,
-            location=location,
-            on_progress=on_progress,
+    cancel_token = cancel_token or CancellationToken()
+    # The runtime cap cancels through the same token, so stages stop calling
+    # upstream APIs instead of running on after the caller has given up; the
+    # matching deadline lets each call size its timeout to what is left.
+    timer = cancel_token.cancel_after(timeout_seconds) if timeout_seconds else None
+    deadline = Deadline(timeout_seconds) if timeout_seconds else None
+    try:
+        return run_async(
+            runner.run_pipeline(
+                brand=brand,
+                competitor=competitor,
+                location=location,
+                on_progress=on_progress,
+                force_regenerate=force_regenerate,
+                variations=variations,
+                on_variation=on_variation,
+                job_id=job_id,
+                cancel_token=cancel_token,
+                deadline=deadline,
+                shared=shared,
+                preview=preview,
+                on_partial=on_partial,
+                priority=priority,
+            )
         )
-    )
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+
+def run_batch_group(
+    competitor: str,
+    items: list[dict[str, Any]],
+    on_item_done: ItemDoneCallback,
+    on_progress: ProgressCallback | None = None,
+    timeout_seconds: float | None = None,
+    cancel_token: CancellationToken | None = None,
+    priority: str = "batch",
+) -> None:
+    runner = TrendHijackPipeline()
+    cancel_token = cancel_token or CancellationToken()
+    timer = cancel_token.cancel_after(timeout_seconds) if timeout_seconds else None
+    deadline = Deadline(timeout_seconds) if timeout_seconds else None
+    try:
+        run_async(
+            runner.run_batch_group(
+                competitor,
+                items,
+                on_item_done,
+                on_progress=on_progress,
+                cancel_token=cancel_token,
+                deadline=deadline,
+                priority=priority,
+            )
+        )
+    finally:
+        if timer is not None:
+            timer.cancel()
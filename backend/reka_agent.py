@@ -1,10 +1,13 @@
 import ast
 import json
 import logging
+import math
 import os
 import re
 from typing import Any
 
+from cancellation import Deadline, timeout_within
+
 try:
     from reka_api import Reka as _RekaClientClass
 except Exception:
@@ -50,6 +53,8 @@ FALLBACK_IMAGE_ANALYSIS = {
 
 REKA_API_KEY = os.environ.get("REKA_API_KEY", "").strip()
 REKA_API_KEY_FALLBACK = os.environ.get("REKA_API_KEY_FALLBACK", "").strip()
+# Per-call limit for a Reka request; a job deadline can only shorten it.
+REKA_TIMEOUT_SECONDS = float(os.environ.get("REKA_TIMEOUT_SECONDS", "120"))
 
 
 def _init_client(api_key: str) -> Any:
@@ -187,10 +192,16 @@ def _safe_parse_json(raw_text: str) -> dict:
             return {"raw": cleaned}
 
 
-def _chat_create(client: Any, messages: list[dict]) -> Any:
+def _chat_create(client: Any, messages: list[dict], timeout: float | None = None) -> Any:
     # Primary reka-api 3.x style
     if hasattr(client, "chat") and hasattr(client.chat, "create"):
-        return client.chat.create(model="reka-flash", messages=messages)
+        if timeout is None:
+            return client.chat.create(model="reka-flash", messages=messages)
+        return client.chat.create(
+            model="reka-flash",
+            messages=messages,
+            request_options={"timeout_in_seconds": max(1, math.ceil(timeout))},
+        )
 
     # Compatibility fallbacks for possible SDK variants
     if hasattr(client, "responses") and hasattr(client.responses, "create"):
@@ -205,27 +216,30 @@ def _chat_create(client: Any, messages: list[dict]) -> Any:
     raise RuntimeError("Unsupported reka-api client shape: no usable chat create method")
 
 
-def _chat_create_with_fallback(messages: list[dict]) -> Any:
+def _chat_create_with_fallback(messages: list[dict], deadline: Deadline | None = None) -> Any:
     if not reka_client and not reka_fallback_client:
         return None
 
     if reka_client:
         try:
-            return _chat_create(reka_client, messages)
+            return _chat_create(reka_client, messages, timeout_within(deadline, REKA_TIMEOUT_SECONDS))
         except Exception as exc:
             print(f"Primary Reka key/client failed: {exc}")
 
     if reka_fallback_client:
+        if deadline is not None and deadline.expired:
+            print("Skipping fallback Reka key: analysis budget spent")
+            return None
         try:
             print("Retrying with fallback Reka key...")
-            return _chat_create(reka_fallback_client, messages)
+            return _chat_create(reka_fallback_client, messages, timeout_within(deadline, REKA_TIMEOUT_SECONDS))
         except Exception as exc:
             print(f"Fallback Reka key/client failed: {exc}")
 
     return None
 
 
-def analyze_video(video_url: str) -> dict:
+def analyze_video(video_url: str, deadline: Deadline | None = None) -> dict:
     print(f"Analyzing video with Reka: {video_url}")
 
     if not reka_client and not reka_fallback_client:
@@ -258,7 +272,8 @@ def analyze_video(video_url: str) -> dict:
                     {"type": "video_url", "video_url": video_url},
                 ],
             }
-        ]
+        ],
+        deadline=deadline,
     )
 
     if response is None:
@@ -0,0 +1,82 @@
+import asyncio
+import itertools
+import logging
+import os
+import threading
+from typing import Any, Coroutine
+
+logger = logging.getLogger("trendhijack.runtime")
+
+LOOP_THREADS = int(os.environ.get("PIPELINE_LOOP_THREADS", "1"))
+
+
+class AsyncRuntime:
+    """A few long-lived event-loop threads that every job's coroutine runs on.
+
+    Callers on ordinary threads (the job executor, resume threads) hand a
+    coroutine to ``run`` and block for its result. Because loops outlive jobs,
+    anything bound to a loop - the default thread pool, asyncio locks and
+    semaphores, aiohttp-style sessions - is built once and shared.
+    """
+
+    def __init__(self, threads: int = LOOP_THREADS) -> None:
+        self.threads = max(1, threads)
+        self._loops: list[asyncio.AbstractEventLoop] = []
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+
+    def _start_locked(self) -> None:
+        for index in range(self.threads):
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _serve(loop: asyncio.AbstractEventLoop = loop, ready: threading.Event = ready) -> None:
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            threading.Thread(target=_serve, name=f"pipeline-loop-{index}", daemon=True).start()
+            ready.wait()
+            self._loops.append(loop)
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The next loop in round-robin order, starting the threads on first use."""
+        with self._lock:
+            if not self._loops:
+                self._start_locked()
+            return self._loops[next(self._next) % len(self._loops)]
+
+    def run(self, coroutine: Coroutine[Any, Any, Any]) -> Any:
+        """Run ``coroutine`` on a shared loop and block the calling thread for its result."""
+        loop = self.loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coroutine.close()
+            raise RuntimeError("AsyncRuntime.run() called from its own loop thread; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "loops": len(self._loops),
+                "tasks": sum(len(asyncio.all_tasks(loop)) for loop in self._loops),
+            }
+
+
+_RUNTIME: AsyncRuntime | None = None
+_RUNTIME_LOCK = threading.Lock()
+
+
+def get_runtime() -> AsyncRuntime:
+    global _RUNTIME
+    with _RUNTIME_LOCK:
+        if _RUNTIME is None:
+            _RUNTIME = AsyncRuntime()
+        return _RUNTIME
+
+
+def run_async(coroutine: Coroutine[Any, Any, Any]) -> Any:
+    return get_runtime().run(coroutine)
@@ -0,0 +1,177 @@
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+StageFn = Callable[[dict[str, Any]], Any]
+SyncRunner = Callable[..., Awaitable[Any]]
+
+
+@dataclass
+class Stage:
+    """A named unit of pipeline work.
+
+    ``fn`` receives a dict of its dependencies' outputs keyed by stage name.
+    Coroutine functions run on the loop; plain functions are handed to the
+    graph's ``run_sync`` so blocking SDK calls stay off the loop thread.
+    """
+
+    name: str
+    fn: StageFn
+    deps: tuple[str, ...] = ()
+
+
+class StageError(Exception):
+    def __init__(self, stage: str, error: Exception) -> None:
+        super().__init__(f"{stage}: {error}")
+        self.stage = stage
+        self.error = error
+
+
+@dataclass
+class StageTiming:
+    start: float
+    end: float
+    deps: tuple[str, ...] = field(default_factory=tuple)
+
+
+class StageGraph:
+    """Runs stages as soon as all of their declared dependencies have finished.
+
+    The first failing stage cancels the rest and is re-raised as ``StageError``
+    (exception types listed in ``passthrough`` propagate unchanged). Timings of
+    every finished stage are kept for ``explain`` along with the critical path.
+
+    ``seed`` supplies outputs computed elsewhere (another job, an earlier run);
+    those stages count as finished and are not run. ``targets`` limits the run
+    to the named stages and whatever they depend on.
+    """
+
+    def __init__(
+        self,
+        stages: list[Stage],
+        run_sync: SyncRunner | None = None,
+        passthrough: tuple[type[BaseException], ...] = (),
+        seed: dict[str, Any] | None = None,
+        targets: tuple[str, ...] | None = None,
+    ) -> None:
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("stage names must be unique")
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"stage '{stage.name}' depends on unknown stage(s) {missing}")
+        self._check_acyclic()
+        self.seed = dict(seed or {})
+        unknown = [name for name in [*self.seed, *(targets or ())] if name not in self.stages]
+        if unknown:
+            raise ValueError(f"unknown stage(s) {unknown}")
+        if targets is not None:
+            self.stages = {name: self.stages[name] for name in self._closure(targets)}
+        self.run_sync = run_sync or asyncio.to_thread
+        self.passthrough = passthrough
+        self.timings: dict[str, StageTiming] = {}
+        self._started_at = 0.0
+
+    def _check_acyclic(self) -> None:
+        state: dict[str, int] = {}
+
+        def _visit(name: str) -> None:
+            if state.get(name) == 1:
+                raise ValueError(f"stage graph has a cycle through '{name}'")
+            if state.get(name) == 2:
+                return
+            state[name] = 1
+            for dep in self.stages[name].deps:
+                _visit(dep)
+            state[name] = 2
+
+        for name in self.stages:
+            _visit(name)
+
+    def _closure(self, targets: tuple[str, ...]) -> list[str]:
+        """``targets`` plus every stage they transitively depend on, stopping at seeded ones."""
+        needed: list[str] = []
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name in needed:
+                continue
+            needed.append(name)
+            if name not in self.seed:
+                pending.extend(self.stages[name].deps)
+        return needed
+
+    async def run(self) -> dict[str, Any]:
+        self._started_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        tasks: dict[str, asyncio.Future[Any]] = {}
+        for name in self.stages:
+            if name in self.seed:
+                tasks[name] = loop.create_future()
+                tasks[name].set_result(self.seed[name])
+
+        async def _run_stage(stage: Stage) -> Any:
+            if stage.deps:
+                await asyncio.gather(*(tasks[dep] for dep in stage.deps))
+            inputs = {dep: tasks[dep].result() for dep in stage.deps}
+            started = time.perf_counter()
+            try:
+                if inspect.iscoroutinefunction(stage.fn):
+                    output = await stage.fn(inputs)
+                else:
+                    output = await self.run_sync(stage.fn, inputs)
+            except self.passthrough:
+                raise
+            except StageError:
+                raise
+            except Exception as exc:
+                raise StageError(stage.name, exc) from exc
+            self.timings[stage.name] = StageTiming(start=started, end=time.perf_counter(), deps=stage.deps)
+            return output
+
+        for stage in self.stages.values():
+            if stage.name not in tasks:
+                tasks[stage.name] = asyncio.ensure_future(_run_stage(stage))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            # Let cancelled stages unwind before the failure propagates.
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return {**self.seed, **{name: task.result() for name, task in tasks.items()}}
+
+    def critical_path(self) -> list[str]:
+        """The dependency chain that ended last, i.e. the one that set total wall time."""
+        if not self.timings:
+            return []
+        current = max(self.timings, key=lambda name: self.timings[name].end)
+        path = [current]
+        while True:
+            deps = [dep for dep in self.timings[current].deps if dep in self.timings]
+            if not deps:
+                break
+            current = max(deps, key=lambda name: self.timings[name].end)
+            path.append(current)
+        return list(reversed(path))
+
+    def report(self) -> dict[str, Any]:
+        def _ms(value: float) -> int:
+            return int(round((value - self._started_at) * 1000))
+
+        stages = {
+            name: {
+                "start_ms": _ms(timing.start),
+                "end_ms": _ms(timing.end),
+                "duration_ms": int(round((timing.end - timing.start) * 1000)),
+                "deps": list(timing.deps),
+            }
+            for name, timing in self.timings.items()
+        }
+        total = max((item["end_ms"] for item in stages.values()), default=0)
+        return {"stages": stages, "critical_path": self.critical_path(), "total_ms": total}
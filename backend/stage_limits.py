@@ -0,0 +1,112 @@
+import asyncio
+import collections
+import contextlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+
+from job_executor import PRIORITY_CLASSES, parse_limits
+
+# Concurrent calls each priority class may have in flight per expensive stage.
+# A class that is not listed is unlimited.
+DEFAULT_STAGE_LIMITS = {
+    "reka": os.environ.get("REKA_CLASS_LIMITS", "interactive=8,batch=2,background=1"),
+    "kling": os.environ.get("KLING_CLASS_LIMITS", "interactive=8,batch=4,background=1"),
+}
+
+
+@dataclass
+class _Waiter:
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future[None]
+    granted: bool = False
+
+
+class ClassLimiter:
+    """Per-priority-class concurrency caps for one stage, shared by every event loop.
+
+    Jobs run on several runtime loops, so the counts live behind a thread lock
+    and waiters are woken on their own loop. A waiter cancelled after a slot was
+    handed to it passes the slot on instead of leaking it.
+    """
+
+    def __init__(self, name: str, limits: dict[str, int]) -> None:
+        self.name = name
+        self.limits = {priority: max(1, int(limit)) for priority, limit in limits.items()}
+        self._lock = threading.Lock()
+        self._active: dict[str, int] = collections.defaultdict(int)
+        self._waiters: dict[str, collections.deque[_Waiter]] = collections.defaultdict(collections.deque)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: str) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    async def acquire(self, priority: str) -> None:
+        """Wait for a slot; every successful call must be paired with ``release``."""
+        limit = self.limits.get(priority)
+        with self._lock:
+            if limit is None or self._active[priority] < limit:
+                self._active[priority] += 1
+                return
+            waiter = _Waiter(asyncio.get_running_loop(), asyncio.get_running_loop().create_future())
+            self._waiters[priority].append(waiter)
+        try:
+            await waiter.future
+        except BaseException:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters[priority].remove(waiter)
+            if granted:
+                self.release(priority)
+            raise
+
+    def release(self, priority: str) -> None:
+        with self._lock:
+            waiters = self._waiters[priority]
+            if not waiters:
+                self._active[priority] -= 1
+                return
+            # The slot moves straight to the next waiter; the active count is unchanged.
+            waiter = waiters.popleft()
+            waiter.granted = True
+        waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                priority: {
+                    "active": self._active[priority],
+                    "waiting": len(self._waiters[priority]),
+                    "limit": self.limits.get(priority),
+                }
+                for priority in PRIORITY_CLASSES
+            }
+
+
+def _wake(future: asyncio.Future[None]) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+_LIMITERS: dict[str, ClassLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_stage_limiter(stage: str) -> ClassLimiter:
+    with _LIMITERS_LOCK:
+        if stage not in _LIMITERS:
+            limits = parse_limits(DEFAULT_STAGE_LIMITS.get(stage, ""))
+            _LIMITERS[stage] = ClassLimiter(stage, {priority: int(value) for priority, value in limits.items()})
+        return _LIMITERS[stage]
+
+
+def stage_limit_stats() -> dict[str, Any]:
+    with _LIMITERS_LOCK:
+        limiters = list(_LIMITERS.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
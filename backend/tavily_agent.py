@@ -1,10 +1,13 @@
 import json
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from urllib.parse import parse_qs, urlparse
 from typing import Any
 
 import requests
 
+from cancellation import CancellationToken, Deadline, check_cancelled
+
 
 @dataclass
 class TavilyPost:
@@ -23,6 +26,11 @@ class TavilyPost:
 class TavilyScoutOutput:
     posts: list[Any]
     total_found: int
+    search_stats: dict[str, Any] = field(default_factory=dict)
+
+
+# Tavily API credits per search at each depth.
+SEARCH_CREDITS = {"basic": 1, "advanced": 2}
 
 
 class TavilySocialScout:
@@ -45,62 +53,184 @@ class TavilySocialScout:
         platforms: dict[str, bool],
         recency: str = "week",
         max_results: int = 5,
+        cancel_token: CancellationToken | None = None,
+        deadline: Deadline | None = None,
+        adaptive: bool = False,
+        saturation_target: int = 15,
+        saturation_score: float = 0.5,
+        max_per_platform: int = 5,
+        cache: Any = None,
     ) -> TavilyScoutOutput:
+        """Search every enabled topic x platform pair and return posts best-first.
+
+        With ``adaptive`` each pair is searched at ``basic`` depth first; only
+        platforms with fewer than ``max_per_platform`` posts scoring
+        ``saturation_score`` are retried at ``advanced`` depth, and searching
+        stops once ``saturation_target`` such posts (counted the way
+        ``filter_and_rank`` caps platforms) exist. ``search_stats`` reports
+        the credits this saved against searching everything at ``advanced``.
+
+        With a ``DiscoveryCache`` each pair is first looked up as a cached
+        slice (fetched by any job); only missing or stale slices are searched,
+        and ``search_stats["slices"]`` records when each one was fetched.
+        """
         posts: list[TavilyPost] = []
-        seen_urls = set()
-
+        seen_urls: set[str] = set()
         recency_hint = "last week" if recency == "week" else recency
-
-        for topic in topics:
-            for platform, enabled in platforms.items():
-                if not enabled:
+        pairs = [(topic, platform) for topic in topics for platform, enabled in platforms.items() if enabled]
+        stats: dict[str, Any] = {
+            "mode": "adaptive" if adaptive else "advanced",
+            "queries": {"basic": 0, "advanced": 0},
+            "escalated_platforms": [],
+            "saturated": False,
+            "skipped_queries": 0,
+            "cache_hits": 0,
+            "slices": [],
+        }
+        searched_depth: dict[tuple[str, str], str] = {}
+
+        def _saturated() -> bool:
+            return adaptive and _strong_post_count(posts, saturation_score, max_per_platform) >= saturation_target
+
+        def _search_all(queue: list[tuple[str, str]], depth: str) -> None:
+            for index, (topic, platform) in enumerate(queue):
+                check_cancelled(cancel_token)
+                if (deadline is not None and deadline.expired) or _saturated():
+                    # Out of discovery budget, or enough strong posts to fill the shortlist.
+                    stats["skipped_queries"] += len(queue) - index
+                    return
+                if searched_depth.get((topic, platform)) == "advanced":
                     continue
+                cached = cache.get("tavily", topic, platform, recency, depth=depth) if cache is not None else None
+                if cached is not None:
+                    stats["cache_hits"] += 1
+                    results, depth_used, fetched_at = cached["posts"], cached["depth"], cached["fetched_at"]
+                else:
+                    stats["queries"][depth] += 1
+                    results = self._search(topic, platform, depth, recency_hint, max_results)
+                    if results is None:
+                        continue
+                    depth_used, fetched_at = depth, time.time()
+                    if cache is not None:
+                        fetched_at = cache.put("tavily", topic, platform, recency, results, depth=depth)
+                searched_depth[(topic, platform)] = depth_used
+                stats["slices"].append(
+                    {
+                        "topic": topic,
+                        "platform": platform,
+                        "depth": depth_used,
+                        "cached": cached is not None,
+                        "fetched_at": fetched_at,
+                    }
+                )
+                self._collect(topic, platform, results, posts, seen_urls)
 
-                query = f"{topic} {platform} discussion {recency_hint}"
-                search_kwargs: dict[str, Any] = {
-                    "query": query,
-                    "search_depth": "advanced",
-                    "max_results": max_results,
-                }
-                domains = self.platform_domains.get(platform, [])
-                if domains:
-                    search_kwargs["include_domains"] = domains
+        if not adaptive:
+            _search_all(pairs, "advanced")
+        else:
+            _search_all(pairs, "basic")
+            if not _saturated():
+                strong = _strong_posts_by_platform(posts, saturation_score)
+                escalated = [
+                    platform
+                    for platform in dict.fromkeys(platform for _, platform in pairs)
+                    if strong.get(platform, 0) < max_per_platform
+                ]
+                stats["escalated_platforms"] = escalated
+                _search_all([pair for pair in pairs if pair[1] in escalated], "advanced")
+            stats["saturated"] = _saturated()
+
+        credits_used = sum(SEARCH_CREDITS[depth] * count for depth, count in stats["queries"].items())
+        credits_baseline = SEARCH_CREDITS["advanced"] * len(pairs)
+        stats.update(
+            {
+                "credits_used": credits_used,
+                "credits_baseline": credits_baseline,
+                "credits_saved": credits_baseline - credits_used,
+            }
+        )
 
-                try:
-                    response = self.client.search(**search_kwargs)
-                except Exception:
-                    continue
+        posts.sort(key=lambda p: p.relevance_score, reverse=True)
+        return TavilyScoutOutput(posts=posts, total_found=len(posts), search_stats=stats)
 
-                for result in response.get("results", []):
-                    url = str(result.get("url", ""))
-                    if not url or url in seen_urls:
-                        continue
-                    seen_urls.add(url)
-
-                    content = str(result.get("content", ""))
-                    viral_signals = []
-                    lowered = content.lower()
-                    if "like" in lowered:
-                        viral_signals.append("likes")
-                    if "retweet" in lowered or "share" in lowered:
-                        viral_signals.append("retweets")
-
-                    posts.append(
-                        TavilyPost(
-                            platform=platform,
-                            content_type="post",
-                            title=str(result.get("title", "")),
-                            url=url,
-                            snippet=content[:400],
-                            relevance_score=float(result.get("score", 0.0) or 0.0),
-                            topic=topic,
-                            published_date=str(result.get("published_date", "")),
-                            viral_signals=viral_signals,
-                        )
-                    )
+    def _search(
+        self,
+        topic: str,
+        platform: str,
+        depth: str,
+        recency_hint: str,
+        max_results: int,
+    ) -> list[dict[str, Any]] | None:
+        """Raw Tavily results for one pair, or None when the search failed."""
+        query = f"{topic} {platform} discussion {recency_hint}"
+        search_kwargs: dict[str, Any] = {
+            "query": query,
+            "search_depth": depth,
+            "max_results": max_results,
+        }
+        domains = self.platform_domains.get(platform, [])
+        if domains:
+            search_kwargs["include_domains"] = domains
 
-        posts.sort(key=lambda p: p.relevance_score, reverse=True)
-        return TavilyScoutOutput(posts=posts, total_found=len(posts))
+        try:
+            response = self.client.search(**search_kwargs)
+        except Exception:
+            return None
+        results = response.get("results", []) if isinstance(response, dict) else []
+        return [result for result in results if isinstance(result, dict)]
+
+    def _collect(
+        self,
+        topic: str,
+        platform: str,
+        results: list[dict[str, Any]],
+        posts: list[TavilyPost],
+        seen_urls: set[str],
+    ) -> None:
+        for result in results:
+            url = str(result.get("url", ""))
+            if not url or url in seen_urls:
+                continue
+            seen_urls.add(url)
+
+            content = str(result.get("content", ""))
+            viral_signals = []
+            lowered = content.lower()
+            if "like" in lowered:
+                viral_signals.append("likes")
+            if "retweet" in lowered or "share" in lowered:
+                viral_signals.append("retweets")
+
+            posts.append(
+                TavilyPost(
+                    platform=platform,
+                    content_type="post",
+                    title=str(result.get("title", "")),
+                    url=url,
+                    snippet=content[:400],
+                    relevance_score=float(result.get("score", 0.0) or 0.0),
+                    topic=topic,
+                    published_date=str(result.get("published_date", "")),
+                    viral_signals=viral_signals,
+                )
+            )
+
+
+def _post_score(post: TavilyPost) -> float:
+    # Same scoring as filter_and_rank's final_score.
+    return max(0.0, post.relevance_score) + len(post.viral_signals) * 0.05
+
+
+def _strong_posts_by_platform(posts: list[TavilyPost], min_score: float) -> dict[str, int]:
+    counts: dict[str, int] = {}
+    for post in posts:
+        if _post_score(post) >= min_score:
+            counts[post.platform] = counts.get(post.platform, 0) + 1
+    return counts
+
+
+def _strong_post_count(posts: list[TavilyPost], min_score: float, max_per_platform: int) -> int:
+    return sum(min(count, max_per_platform) for count in _strong_posts_by_platform(posts, min_score).values())
 
 
 def filter_and_rank(
@@ -159,7 +289,12 @@ class YouTubeScout:
 
         self.client = TavilyClient(api_key=api_key)
 
-    def search_youtube_videos(self, topic: str, max_per_query: int = 7) -> list:
+    def search_youtube_videos(
+        self,
+        topic: str,
+        max_per_query: int = 7,
+        cancel_token: CancellationToken | None = None,
+    ) -> list:
         queries = [
             f"{topic} AI tool review youtube 2025",
             f"{topic} viral demo youtube",
@@ -172,6 +307,7 @@ class YouTubeScout:
         videos = []
 
         for query in queries:
+            check_cancelled(cancel_token)
             try:
                 response = self.client.search(
                     query=query,
@@ -355,13 +491,14 @@ class YouTubeScout:
             f"{top_video.get('viral_signals', 0)}."
         )
 
-    def get_direct_video_url(self, topic: str) -> str:
+    def get_direct_video_url(self, topic: str, cancel_token: CancellationToken | None = None) -> str:
         queries = [
             f"{topic} tech demo site:pexels.com",
             f"{topic} viral video site:pixabay.com filetype:mp4",
         ]
 
         for query in queries:
+            check_cancelled(cancel_token)
             try:
                 response = self.client.search(
                     query=query,
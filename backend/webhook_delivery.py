@@ -0,0 +1,289 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any
+from urllib.parse import urlparse
+
+import requests
+
+from config import DATA_DIR
+
+logger = logging.getLogger("trendhijack.webhooks")
+
+SIGNING_SECRET = os.environ.get("WEBHOOK_SIGNING_SECRET", "").strip()
+MAX_ATTEMPTS = int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", "8"))
+BASE_BACKOFF_SECONDS = float(os.environ.get("WEBHOOK_BACKOFF_SECONDS", "10"))
+MAX_BACKOFF_SECONDS = 3600.0
+# A claimed delivery is retried by any worker if its sender dies mid-request.
+CLAIM_LEASE_SECONDS = 60.0
+REQUEST_TIMEOUT_SECONDS = 15
+# Callback URLs come from unauthenticated callers, so by default they may only
+# reach public addresses. Local development against a private receiver opts in.
+ALLOW_PRIVATE_TARGETS = os.environ.get("WEBHOOK_ALLOW_PRIVATE_TARGETS", "0") == "1"
+
+
+class UnsafeCallbackTarget(Exception):
+    pass
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return not (
+        ip.is_private
+        or ip.is_loopback
+        or ip.is_link_local
+        or ip.is_multicast
+        or ip.is_reserved
+        or ip.is_unspecified
+    )
+
+
+def check_callback_target(url: str) -> None:
+    """Resolve ``url``'s host and raise ``UnsafeCallbackTarget`` unless every address is public.
+
+    Loopback, link-local (cloud metadata), RFC1918 and other non-global
+    addresses are refused. ``socket.gaierror`` propagates for hosts that do not
+    resolve, which callers may treat as transient.
+    """
+    if ALLOW_PRIVATE_TARGETS:
+        return
+    parsed = urlparse(url)
+    host = parsed.hostname
+    if not host:
+        raise UnsafeCallbackTarget("callback_url must include a host")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    for *_, sockaddr in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP):
+        if not _is_public(str(sockaddr[0])):
+            raise UnsafeCallbackTarget(f"callback_url host {host} resolves to non-public address {sockaddr[0]}")
+
+
+def validate_callback_url(url: str) -> str | None:
+    """Return an error message when ``url`` cannot be used as a completion webhook."""
+    parsed = urlparse(url)
+    if parsed.scheme not in {"http", "https"}:
+        return "callback_url must be http or https"
+    if not parsed.netloc:
+        return "callback_url must include a host"
+    try:
+        parsed.port
+    except ValueError:
+        return "callback_url has an invalid port"
+    try:
+        check_callback_target(url)
+    except UnsafeCallbackTarget as exc:
+        return str(exc)
+    except OSError:
+        return "callback_url host could not be resolved"
+    return None
+
+
+def sign_payload(body: bytes, timestamp: str, secret: str = SIGNING_SECRET) -> str:
+    """HMAC-SHA256 over ``"<timestamp>.<body>"``, hex encoded."""
+    message = timestamp.encode("utf-8") + b"." + body
+    return hmac.new(secret.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+class WebhookDispatcher:
+    """Persistent outbound webhook queue with HMAC signing and exponential backoff.
+
+    Deliveries are rows in SQLite, so they survive restarts and any worker can
+    send them. A worker claims a due row by pushing its ``next_attempt_at``
+    forward by a short lease; if it crashes mid-send the row becomes due again.
+    """
+
+    def __init__(self, path: str | None = None, secret: str = SIGNING_SECRET) -> None:
+        self.path = path or os.path.join(DATA_DIR, "webhooks.sqlite3")
+        self.secret = secret
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._thread_lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS deliveries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS deliveries_due ON deliveries (status, next_attempt_at)")
+        if not self.secret:
+            logger.warning("WEBHOOK_SIGNING_SECRET is not set; outbound webhooks will be unsigned.")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def enqueue(self, job_id: str, url: str, event: str, payload: dict[str, Any]) -> int:
+        now = time.time()
+        status, error = "pending", None
+        try:
+            check_callback_target(url)
+        except UnsafeCallbackTarget as exc:
+            # The host may have been re-pointed since the job was accepted.
+            status, error = "failed", str(exc)
+            logger.error("Webhook for job %s refused: %s", job_id, exc)
+        except OSError:
+            pass  # Unresolvable for now; the delivery attempt re-checks and retries.
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO deliveries (job_id, event, url, payload, status, next_attempt_at, last_error, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, event, url, json.dumps(payload, default=str), status, now, error, now),
+            )
+            delivery_id = int(cursor.lastrowid)
+        if status != "pending":
+            return delivery_id
+        self.start()
+        self._wake.set()
+        return delivery_id
+
+    def start(self) -> None:
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="webhook-dispatcher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                sent = self.dispatch_due()
+            except Exception as exc:
+                logger.warning("Webhook dispatch loop error: %s", exc)
+                sent = 0
+            if not sent:
+                self._wake.wait(timeout=self._seconds_until_next_due())
+                self._wake.clear()
+
+    def _seconds_until_next_due(self) -> float:
+        with self._connect() as conn:
+            row = conn.execute("SELECT MIN(next_attempt_at) FROM deliveries WHERE status = 'pending'").fetchone()
+        if not row or row[0] is None:
+            return 30.0
+        return min(30.0, max(0.5, float(row[0]) - time.time()))
+
+    def dispatch_due(self, limit: int = 10) -> int:
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, job_id, event, url, payload, attempts, next_attempt_at FROM deliveries "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+
+        sent = 0
+        for delivery_id, job_id, event, url, payload, attempts, next_attempt_at in rows:
+            if not self._claim(delivery_id, next_attempt_at):
+                continue
+            self._deliver(delivery_id, job_id, event, url, payload, attempts)
+            sent += 1
+        return sent
+
+    def _claim(self, delivery_id: int, expected_next_attempt_at: float) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE deliveries SET next_attempt_at = ? "
+                "WHERE id = ? AND status = 'pending' AND next_attempt_at = ?",
+                (time.time() + CLAIM_LEASE_SECONDS, delivery_id, expected_next_attempt_at),
+            )
+            return cursor.rowcount == 1
+
+    def _deliver(self, delivery_id: int, job_id: str, event: str, url: str, payload: str, attempts: int) -> None:
+        body = payload.encode("utf-8")
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "TrendHijack-Webhooks/1.0",
+            "X-TrendHijack-Event": event,
+            "X-TrendHijack-Delivery": str(delivery_id),
+            "X-TrendHijack-Timestamp": timestamp,
+        }
+        if self.secret:
+            headers["X-TrendHijack-Signature"] = f"sha256={sign_payload(body, timestamp, self.secret)}"
+
+        error = None
+        permanent = False
+        try:
+            check_callback_target(url)
+            # Redirects could lead anywhere, including addresses the check above refuses.
+            response = requests.post(
+                url, data=body, headers=headers, timeout=REQUEST_TIMEOUT_SECONDS, allow_redirects=False
+            )
+            if not 200 <= response.status_code < 300:
+                error = f"HTTP {response.status_code}"
+        except UnsafeCallbackTarget as exc:
+            error = str(exc)
+            permanent = True
+        except (requests.RequestException, OSError) as exc:
+            error = str(exc)
+
+        attempts += 1
+        with self._connect() as conn:
+            if error is None:
+                conn.execute(
+                    "UPDATE deliveries SET status = 'delivered', attempts = ?, last_error = NULL WHERE id = ?",
+                    (attempts, delivery_id),
+                )
+                logger.info("Webhook %s for job %s delivered", delivery_id, job_id)
+            elif permanent or attempts >= MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE deliveries SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, error[:1000], delivery_id),
+                )
+                logger.error("Webhook %s for job %s failed permanently: %s", delivery_id, job_id, error)
+            else:
+                delay = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * (2 ** (attempts - 1)))
+                conn.execute(
+                    "UPDATE deliveries SET attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                    (attempts, error[:1000], time.time() + delay, delivery_id),
+                )
+                logger.warning(
+                    "Webhook %s for job %s attempt %s failed (%s); retrying in %.0fs",
+                    delivery_id,
+                    job_id,
+                    attempts,
+                    error,
+                    delay,
+                )
+
+    def deliveries_for(self, job_id: str) -> list[dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, event, status, attempts, last_error FROM deliveries WHERE job_id = ? ORDER BY id",
+                (job_id,),
+            ).fetchall()
+        return [
+            {"id": r[0], "event": r[1], "status": r[2], "attempts": r[3], "last_error": r[4]}
+            for r in rows
+        ]
+
+
+_DISPATCHER: WebhookDispatcher | None = None
+_DISPATCHER_LOCK = threading.Lock()
+
+
+def get_webhook_dispatcher() -> WebhookDispatcher:
+    global _DISPATCHER
+    with _DISPATCHER_LOCK:
+        if _DISPATCHER is None:
+            _DISPATCHER = WebhookDispatcher()
+        return _DISPATCHER
@@ -3,9 +3,22 @@ import json
 import time
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Any
 
 import requests
 
+from cancellation import (
+    CancellationToken,
+    Deadline,
+    check_cancelled,
+    deadline_allows,
+    sleep_or_cancel,
+    timeout_within,
+)
+
+# The recent-search endpoint only covers the last seven days.
+CACHE_RECENCY = "7d"
+
 
 @dataclass
 class Tweet:
@@ -32,7 +45,14 @@ class YutoriTwitterScout:
         self.headers = {"Authorization": f"Bearer {bearer_token}"}
         self.base_url = "https://api.twitter.com/2/tweets/search/recent"
 
-    def search_recent(self, query: str, topic: str, max_results: int = 20) -> list[Tweet]:
+    def search_recent(
+        self,
+        query: str,
+        topic: str,
+        max_results: int = 20,
+        cancel_token: CancellationToken | None = None,
+        deadline: Deadline | None = None,
+    ) -> list[Tweet]:
         params = {
             "query": f"{query} -is:retweet lang:en",
             "max_results": min(max_results, 100),
@@ -43,12 +63,16 @@ class YutoriTwitterScout:
 
         resp = None
         for attempt in range(2):
+            check_cancelled(cancel_token)
+            if deadline is not None and deadline.expired:
+                print("Warning: Twitter search skipped, discovery budget spent")
+                return []
             try:
                 resp = requests.get(
                     self.base_url,
                     headers=self.headers,
                     params=params,
-                    timeout=30,
+                    timeout=timeout_within(deadline, 30),
                 )
             except requests.RequestException as exc:
                 print(f"Warning: Twitter request failed: {exc}")
@@ -58,8 +82,11 @@ class YutoriTwitterScout:
                 break
 
             if resp.status_code == 429 and attempt == 0:
+                if not deadline_allows(deadline, 15):
+                    print("Rate limited, no budget left to wait")
+                    return []
                 print("Rate limited, waiting 15s")
-                time.sleep(15)
+                sleep_or_cancel(cancel_token, 15)
                 continue
 
             if resp.status_code == 401:
@@ -121,32 +148,45 @@ class YutoriTwitterScout:
         parsed_tweets.sort(key=lambda t: t.engagement, reverse=True)
         return parsed_tweets
 
-    def scout(self, topics: list[str], max_per_topic: int = 10) -> dict:
+    def scout(
+        self,
+        topics: list[str],
+        max_per_topic: int = 10,
+        cancel_token: CancellationToken | None = None,
+        deadline: Deadline | None = None,
+        cache: Any = None,
+    ) -> dict:
         all_tweets = []
         seen = set()
+        slices = []
 
         for topic in topics:
-            print(f"🐦 Twitter scouting: '{topic}'")
-            queries = [
-                f"{topic} AI viral",
-                f"{topic} CEO founder announcement",
-                f"{topic} developer review reaction",
-            ]
-
-            for query in queries:
-                tweets = self.search_recent(query=query, topic=topic, max_results=max_per_topic)
-
-                for tweet in tweets:
-                    if tweet.tweet_id in seen:
-                        continue
-                    seen.add(tweet.tweet_id)
-                    all_tweets.append(tweet)
-                    print(
-                        f"   ❤️ {tweet.likes}  🔁 {tweet.retweets}  💬 {tweet.replies} | "
-                        f"@{tweet.username}: {tweet.text[:80]}"
+            # One cached slice per topic holds the tweets of all of its queries.
+            cached = cache.get("twitter", topic, "twitter", CACHE_RECENCY) if cache is not None else None
+            if cached is not None:
+                print(f"🐦 Twitter topic '{topic}' served from discovery cache")
+                topic_tweets = [Tweet(**item) for item in cached["posts"]]
+                slices.append({"topic": topic, "cached": True, "fetched_at": cached["fetched_at"]})
+            else:
+                topic_tweets = self._scout_topic(topic, max_per_topic, cancel_token, deadline)
+                fetched_at = time.time()
+                # Partial topics (budget ran out mid-way) are not worth sharing.
+                complete = deadline is None or not deadline.expired
+                if cache is not None and topic_tweets and complete:
+                    fetched_at = cache.put(
+                        "twitter",
+                        topic,
+                        "twitter",
+                        CACHE_RECENCY,
+                        [dataclasses.asdict(tweet) for tweet in topic_tweets],
                     )
+                slices.append({"topic": topic, "cached": False, "fetched_at": fetched_at})
 
-                time.sleep(0.3)
+            for tweet in topic_tweets:
+                if tweet.tweet_id in seen:
+                    continue
+                seen.add(tweet.tweet_id)
+                all_tweets.append(tweet)
 
         all_tweets.sort(key=lambda t: t.engagement, reverse=True)
         top_tweets = all_tweets[:20]
@@ -159,6 +199,7 @@ class YutoriTwitterScout:
             "tweets": [dataclasses.asdict(t) for t in top_tweets],
             "top_tweet": dataclasses.asdict(top_tweets[0]) if top_tweets else None,
             "trend_summary": self.build_summary(top_tweets, topics),
+            "slices": slices,
         }
 
         with open("yutori_twitter_output.json", "w", encoding="utf-8") as file:
@@ -166,6 +207,42 @@ class YutoriTwitterScout:
 
         return result
 
+    def _scout_topic(
+        self,
+        topic: str,
+        max_per_topic: int,
+        cancel_token: CancellationToken | None,
+        deadline: Deadline | None,
+    ) -> list[Tweet]:
+        print(f"🐦 Twitter scouting: '{topic}'")
+        queries = [
+            f"{topic} AI viral",
+            f"{topic} CEO founder announcement",
+            f"{topic} developer review reaction",
+        ]
+
+        topic_tweets: list[Tweet] = []
+        for query in queries:
+            if deadline is not None and deadline.expired:
+                break
+            tweets = self.search_recent(
+                query=query,
+                topic=topic,
+                max_results=max_per_topic,
+                cancel_token=cancel_token,
+                deadline=deadline,
+            )
+
+            for tweet in tweets:
+                topic_tweets.append(tweet)
+                print(
+                    f"   ❤️ {tweet.likes}  🔁 {tweet.retweets}  💬 {tweet.replies} | "
+                    f"@{tweet.username}: {tweet.text[:80]}"
+                )
+
+            sleep_or_cancel(cancel_token, 0.3)
+        return topic_tweets
+
     def build_summary(self, tweets: list[Tweet], topics: list[str]) -> str:
         if not tweets:
             return f"No Twitter data found for {topics}."
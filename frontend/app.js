@@ -34,6 +34,19 @@ function setOutputText(value) {
 
 function setOutputHtml(html) {
   output.innerHTML = html;
+  // The cached copy can be evicted on the backend; fall back to the provider URL once.
+  output.querySelectorAll("video[data-fallback-src]").forEach((video) => {
+    video.addEventListener(
+      "error",
+      () => {
+        const fallback = video.dataset.fallbackSrc;
+        if (fallback && video.getAttribute("src") !== fallback) {
+          video.src = fallback;
+        }
+      },
+      { once: true }
+    );
+  });
 }
 
 function saveApiBase(base) {
@@ -168,6 +181,85 @@ function renderYutoriRaw(tweets) {
     .join("")}</ul>`;
 }
 
+function resolveMediaUrl(item) {
+  // Prefer the backend's cached copy (Range-capable, survives Kie URL expiry).
+  const mediaUrl = String((item && item.media_url) || "");
+  if (mediaUrl) {
+    return mediaUrl.startsWith("/") ? `${getApiBase()}${mediaUrl}` : mediaUrl;
+  }
+  return String((item && item.video_url) || "");
+}
+
+function videoTag(url, fallbackUrl) {
+  const fallback = fallbackUrl && fallbackUrl !== url ? ` data-fallback-src="${escapeHtml(fallbackUrl)}"` : "";
+  return `<video controls playsinline style="width: 100%; max-height: 520px;" src="${escapeHtml(url)}"${fallback}></video>`;
+}
+
+function renderVariations(variations) {
+  if (!Array.isArray(variations) || variations.length === 0) {
+    return "";
+  }
+
+  return `
+    <section class="panel">
+      <h3>Variations</h3>
+      ${variations
+        .map((item) => {
+          const brief = escapeHtml(item.brief || `Variation ${item.index ?? ""}`);
+          const url = resolveMediaUrl(item);
+          if (!url) {
+            return `<p><strong>${brief}</strong> - ${escapeHtml(item.error || item.status || "pending")}</p>`;
+          }
+          return `<p><strong>${brief}</strong></p>${videoTag(url, String(item.video_url || ""))}`;
+        })
+        .join("")}
+    </section>
+  `;
+}
+
+function renderPartial(partial) {
+  if (!partial || typeof partial !== "object") {
+    return "";
+  }
+
+  const sections = [];
+  if (partial.discovery) {
+    sections.push(`
+      <section class="panel">
+        <h3>Trend Summary</h3>
+        <p>${escapeHtml(partial.discovery.trend_summary || "")}</p>
+        ${renderShortlist(partial.discovery.shortlist || [])}
+      </section>
+    `);
+  }
+  if (partial.analysis) {
+    sections.push(`
+      <section class="panel">
+        <h3>Reka Brief</h3>
+        <pre>${escapeHtml(JSON.stringify(partial.analysis.director_brief || {}, null, 2))}</pre>
+      </section>
+    `);
+  }
+  if (partial.prompt) {
+    sections.push(`
+      <section class="panel">
+        <h3>Kling Prompt</h3>
+        <pre>${escapeHtml(partial.prompt.kling_prompt || "")}</pre>
+      </section>
+    `);
+  }
+  if (partial.generation && partial.generation.video_url) {
+    const safeUrl = escapeHtml(partial.generation.video_url);
+    sections.push(`
+      <section class="panel">
+        <h3>Video</h3>
+        <video controls playsinline style="width: 100%; max-height: 520px;" src="${safeUrl}"></video>
+      </section>
+    `);
+  }
+  return sections.join("");
+}
+
 function renderExplainSummary(explain) {
   if (!explain || typeof explain !== "object") {
     return "<p>No explain metadata.</p>";
@@ -206,6 +298,7 @@ function renderDone(job) {
   const directorBrief = analysis.director_brief || result.director_brief || {};
   const videoUrl = String(generation.video_url || result.video_url || "");
   const safeVideoUrl = escapeHtml(videoUrl);
+  const playbackUrl = result.media_url ? resolveMediaUrl(result) : videoUrl;
 
   const html = `
     <section class="panel">
@@ -242,9 +335,11 @@ function renderDone(job) {
       <pre>${escapeHtml(generation.prompt || result.kling_prompt || "")}</pre>
       <p><strong>Task ID:</strong> ${escapeHtml(generation.task_id || "")}</p>
       <p><strong>Video URL:</strong> ${videoUrl ? `<a href="${safeVideoUrl}" target="_blank" rel="noopener noreferrer">${safeVideoUrl}</a>` : "None"}</p>
-      ${videoUrl ? `<video controls playsinline style="width: 100%; max-height: 520px;" src="${safeVideoUrl}"></video>` : ""}
+      ${playbackUrl ? videoTag(playbackUrl, videoUrl) : ""}
     </section>
 
+    ${renderVariations(result.variations || job.variations)}
+
     <details class="panel">
       <summary>Explain</summary>
       ${renderExplainSummary(explain)}
@@ -270,6 +365,10 @@ function renderRunning(job) {
       <p>Message: ${escapeHtml(progress.message || "")}</p>
     </section>
 
+    ${renderPartial(job.partial)}
+
+    ${renderVariations(job.variations)}
+
     <details class="panel">
       <summary>Raw JSON</summary>
       <pre>${escapeHtml(JSON.stringify(job, null, 2))}</pre>
@@ -286,6 +385,8 @@ function renderError(job) {
       <p style="color:#b91c1c;"><strong>${escapeHtml(job.error || "Unknown error")}</strong></p>
     </section>
 
+    ${renderPartial(job.partial)}
+
     <details class="panel" open>
       <summary>Raw JSON</summary>
       <pre>${escapeHtml(JSON.stringify(job, null, 2))}</pre>
@@ -306,7 +407,7 @@ function renderJob(job) {
     return;
   }
 
-  if (job.status === "error" || job.status === "failed") {
+  if (job.status === "error" || job.status === "failed" || job.status === "cancelled") {
     renderError(job);
     return;
   }
@@ -341,12 +442,7 @@ async function pollJob(apiBase, jobId) {
 
     renderJob(data);
 
-    if (
-      data.status === "done" ||
-      data.status === "error" ||
-      data.status === "completed" ||
-      data.status === "failed"
-    ) {
+    if (isTerminalStatus(data.status)) {
       return;
     }
 
@@ -359,6 +455,70 @@ async function pollJob(apiBase, jobId) {
   }
 }
 
+function isTerminalStatus(status) {
+  return status === "done" || status === "error" || status === "completed" || status === "failed" || status === "cancelled";
+}
+
+function streamJob(apiBase, jobId) {
+  // Server-Sent Events push every progress change; EventSource reconnects with
+  // Last-Event-ID on its own. Fall back to polling if the stream is unavailable.
+  if (typeof EventSource === "undefined") {
+    return pollJob(apiBase, jobId);
+  }
+
+  return new Promise((resolve) => {
+    let job = null;
+    let receivedAny = false;
+    const source = new EventSource(`${apiBase}/api/job/${jobId}/events`);
+
+    const finish = () => {
+      source.close();
+      resolve();
+    };
+
+    source.addEventListener("snapshot", (event) => {
+      receivedAny = true;
+      job = JSON.parse(event.data);
+      renderJob(job);
+      if (isTerminalStatus(job.status)) {
+        finish();
+      }
+    });
+
+    source.addEventListener("progress", (event) => {
+      receivedAny = true;
+      const update = JSON.parse(event.data);
+      job = { ...(job || { id: jobId }), ...update };
+      renderJob(job);
+    });
+
+    source.addEventListener("variation", (event) => {
+      receivedAny = true;
+      const update = JSON.parse(event.data);
+      job = job || { id: jobId, status: "running" };
+      job.variations = [...(job.variations || []), update.variation];
+      renderJob(job);
+    });
+
+    source.addEventListener("partial", (event) => {
+      receivedAny = true;
+      const update = JSON.parse(event.data);
+      job = job || { id: jobId, status: "running" };
+      job.partial = { ...(job.partial || {}), [update.stage]: update.data };
+      renderJob(job);
+    });
+
+    source.onerror = () => {
+      // CLOSED means the server refused the stream (e.g. 503 when this worker
+      // already holds its cap of open streams); keep following the job by polling.
+      if (source.readyState === EventSource.CLOSED) {
+        source.close();
+        pollJob(apiBase, jobId).then(resolve);
+      }
+    };
+  });
+}
+
 runBtn.addEventListener("click", async () => {
   const brand = brandInput.value.trim();
   const competitor = competitorInput.value.trim();
@@ -394,7 +554,7 @@ runBtn.addEventListener("click", async () => {
       return;
     }
 
-    await pollJob(apiBase, data.job_id);
+    await streamJob(apiBase, data.job_id);
   } catch (error) {
     setOutputText({ error: error.message });
   }
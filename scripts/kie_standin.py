@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Kie jobs API, for exercising Kling callback mode.
+
+Usage:
+  python3 scripts/kie_standin.py --port 8090 --render-seconds 20
+  KLING_BASE_URL=http://localhost:8090 \
+  KLING_CALLBACK_URL=http://localhost:5050/api/kling/callback \
+  KIE_API_KEY=local python3 backend/app.py
+
+createTask returns a taskId immediately. After --render-seconds the task
+flips to success and, if the request carried callBackUrl, the stand-in POSTs
+the recordInfo-shaped payload there exactly like Kie does.
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SAMPLE_MP4_URL = "https://videos.pexels.com/video-files/3571264/3571264-hd_1920_1080_30fps.mp4"
+
+TASKS: dict[str, dict] = {}
+TASKS_LOCK = threading.Lock()
+
+
+def _record(task_id: str) -> dict:
+    with TASKS_LOCK:
+        task = dict(TASKS.get(task_id, {}))
+    if not task:
+        return {"taskId": task_id, "state": "fail", "failMsg": "unknown task"}
+    if time.time() < task["ready_at"]:
+        return {"taskId": task_id, "state": "waiting"}
+    return {
+        "taskId": task_id,
+        "state": "success",
+        "resultJson": json.dumps({"resultUrls": [SAMPLE_MP4_URL]}),
+    }
+
+
+def _deliver_callback(task_id: str, url: str, delay: float) -> None:
+    time.sleep(delay)
+    body = json.dumps({"code": 200, "msg": "success", "data": _record(task_id)}).encode("utf-8")
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            print(f"callback {task_id} -> {resp.status}")
+    except Exception as exc:
+        print(f"callback {task_id} failed: {exc}")
+
+
+class Handler(BaseHTTPRequestHandler):
+    render_seconds = 20.0
+
+    def _send(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:  # noqa: N802
+        if urlparse(self.path).path != "/api/v1/jobs/createTask":
+            self._send({"code": 404, "msg": "not found"}, 404)
+            return
+
+        length = int(self.headers.get("Content-Length", "0") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        task_id = f"standin-{uuid.uuid4().hex[:12]}"
+        with TASKS_LOCK:
+            TASKS[task_id] = {"ready_at": time.time() + self.render_seconds, "payload": payload}
+
+        callback_url = payload.get("callBackUrl")
+        if callback_url:
+            threading.Thread(
+                target=_deliver_callback,
+                args=(task_id, callback_url, self.render_seconds),
+                daemon=True,
+            ).start()
+
+        self._send({"code": 200, "msg": "success", "data": {"taskId": task_id}})
+
+    def do_GET(self) -> None:  # noqa: N802
+        parsed = urlparse(self.path)
+        if parsed.path != "/api/v1/jobs/recordInfo":
+            self._send({"code": 404, "msg": "not found"}, 404)
+            return
+        task_id = parse_qs(parsed.query).get("taskId", [""])[0]
+        self._send({"code": 200, "msg": "success", "data": _record(task_id)})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--render-seconds", type=float, default=20.0)
+    args = parser.parse_args()
+
+    Handler.render_seconds = args.render_seconds
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), Handler)
+    print(f"Kie stand-in listening on http://localhost:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()